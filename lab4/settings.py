@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +45,7 @@ INSTALLED_APPS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        'main.tokens.TokenAuthentication',
                 'rest_framework.authentication.BasicAuthentication',
 
         'rest_framework.authentication.SessionAuthentication',
@@ -53,7 +55,16 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Verified API tokens are cached per process. Revocations reach other
+# processes once their cached copy is API_TOKEN_CACHE_TTL seconds old.
+API_TOKEN_CACHE_SIZE = 1024
+API_TOKEN_CACHE_TTL = 60
+
 MIDDLEWARE = [
+    # First, so its timings include the rest of the middleware.
+    "main.metrics.MetricsMiddleware",
+    # Before anything that reads or changes the response body.
+    "main.compression.CompressionMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -61,8 +72,16 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "main.routers.ReplicaMiddleware",
 ]
 
+# Requests slower than SLOW_REQUEST_MS are logged with their SQL, for a
+# SLOW_REQUEST_SAMPLE_RATE share of them. /metrics serves Prometheus metrics
+# of this process to METRICS_ALLOWED_IPS only.
+SLOW_REQUEST_MS = 500
+SLOW_REQUEST_SAMPLE_RATE = 0.1
+METRICS_ALLOWED_IPS = ["127.0.0.1", "::1"]
+
 ROOT_URLCONF = "lab4.urls"
 
 TEMPLATES = [
@@ -87,17 +106,109 @@ WSGI_APPLICATION = "lab4.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# SQLITE_PROFILE picks "tuned" (default) or "stock". Tuned connections use
+# the write-ahead log, so readers never block the writer, fsync only at
+# checkpoints, keep a 64 MiB page cache and a 256 MiB memory map, wait up to
+# 20s for a busy database and are reused across requests. Their transactions
+# start with BEGIN IMMEDIATE, taking the write lock up front: a deferred
+# transaction that reads before writing fails with "database is locked" when
+# another writer got in first. Stock is the rollback journal with SQLite's
+# and Django's defaults, kept as a baseline for benchmark_sqlite.
+
+SQLITE_PROFILE = os.environ.get("SQLITE_PROFILE", "tuned")
+
+SQLITE_PROFILES = {
+    "stock": {
+        "OPTIONS": {"init_command": "PRAGMA journal_mode=DELETE"},
+    },
+    "tuned": {
+        "OPTIONS": {
+            "init_command": ";".join(
+                [
+                    "PRAGMA journal_mode=WAL",
+                    "PRAGMA synchronous=NORMAL",
+                    "PRAGMA cache_size=-65536",
+                    "PRAGMA mmap_size=268435456",
+                ]
+            ),
+            "transaction_mode": "IMMEDIATE",
+            # Seconds; sets SQLite's busy timeout.
+            "timeout": 20,
+        },
+        "CONN_MAX_AGE": 600,
+        "CONN_HEALTH_CHECKS": True,
+    },
+}
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
-    }
+        # A file rather than the default in-memory database, so tests that
+        # run several threads get separate connections to the same data.
+        "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
+        **SQLITE_PROFILES[SQLITE_PROFILE],
+    },
+}
+
+# DATABASE_REPLICA names a second SQLite file, kept up to date with
+# sync_replica or a replication tool. When set, GET requests read inventory
+# data from it and clients that wrote within REPLICA_PIN_SECONDS keep
+# reading from the primary. Unset, the replica alias is the primary file and
+# nothing is routed. Tests always get a separate replica file.
+DATABASE_REPLICA = os.environ.get("DATABASE_REPLICA")
+
+DATABASES["replica"] = {
+    "ENGINE": "django.db.backends.sqlite3",
+    "NAME": DATABASE_REPLICA or DATABASES["default"]["NAME"],
+    "TEST": {"NAME": BASE_DIR / "test_replica.sqlite3"},
+    **SQLITE_PROFILES[SQLITE_PROFILE],
+}
+
+DATABASE_ROUTERS = ["main.routers.ReplicaRouter"] if DATABASE_REPLICA else []
+
+REPLICA_PIN_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# CACHE_BACKEND picks local memory (default), a directory of files, or a
+# Redis server, e.g. a local stand-in during development.
+
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "locmem")
+CACHE_LOCATION = os.environ.get("CACHE_LOCATION")
+
+CACHES = {
+    "default": {
+        "locmem": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "inventory",
+            "OPTIONS": {"MAX_ENTRIES": 10000},
+        },
+        "file": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": CACHE_LOCATION or BASE_DIR / "cache",
+        },
+        "redis": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_LOCATION or "redis://127.0.0.1:6379",
+        },
+    }[CACHE_BACKEND]
 }
 
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
+# New passwords use the first hasher; the rest only verify older hashes.
+# A successful login rehashes a password stored with an older hasher or
+# work factor, so raising the work factor here upgrades users as they log in.
+PASSWORD_HASHERS = [
+    "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
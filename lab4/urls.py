@@ -27,6 +27,11 @@ from main.views import (
     WarehouseDetailView,
     WarehouseListView,
     WarehouseViewSet,
+    ProductViewSet,
+    InventoryViewSet,
+    StockMovementViewSet,
+    ReorderAlertViewSet,
+    ApiTokenViewSet,
     register,
     user_login,
     user_logout,
@@ -43,7 +48,15 @@ from main.views import (
     add_inventory,
     edit_inventory,
     delete_inventory,
+    search_api,
+    export_data,
+    transfer_api,
+    cache_stats_api,
+    autocomplete_api,
+    forecast_api,
 )
+from main import async_views
+from main.metrics import metrics_view
 from rest_framework.routers import DefaultRouter
 
 urlpatterns = [
@@ -76,14 +89,88 @@ urlpatterns = [
     path("products/", ProductListView.as_view(), name="product_list"),
     path("inventories/", InventoryListView.as_view(), name="inventory_list"),
     path("users/", UserListView.as_view(), name="user_list"),
+    path("export/<str:kind>/", export_data, name="export_data"),
+    path("metrics", metrics_view, name="metrics"),
 ]
 router = DefaultRouter()
 router.register(r"warehouses", WarehouseViewSet)
+router.register(r"products", ProductViewSet)
+router.register(r"inventory", InventoryViewSet)
+router.register(r"movements", StockMovementViewSet)
+router.register(r"reorder-alerts", ReorderAlertViewSet)
+router.register(r"tokens", ApiTokenViewSet)
 
 urlpatterns += [
     path("user/<int:pk>/", UserDetailView.as_view(), name="user_detail"),
     path("warehouse/<int:pk>/", WarehouseDetailView.as_view(), name="warehouse_detail"),
     path("product/<int:pk>/", ProductDetailView.as_view(), name="product_detail"),
     path("inventory/<int:pk>/", InventoryDetailView.as_view(), name="inventory_detail"),
+    path("api/search/", search_api, name="search_api"),
+    path("api/transfers/", transfer_api, name="transfer_api"),
+    path("api/cache/stats/", cache_stats_api, name="cache_stats_api"),
+    path("api/forecast/", forecast_api, name="forecast_api"),
+    path(
+        "api/autocomplete/<str:kind>/", autocomplete_api, name="autocomplete_api"
+    ),
     path("api/", include(router.urls)),
 ]
+
+# Async twins of the read-only pages and API endpoints, served under ASGI.
+urlpatterns += [
+    path(
+        "async/warehouses/",
+        async_views.warehouse_list,
+        name="async_warehouse_list",
+    ),
+    path("async/products/", async_views.product_list, name="async_product_list"),
+    path(
+        "async/inventories/",
+        async_views.inventory_list,
+        name="async_inventory_list",
+    ),
+    path(
+        "async/warehouse/<int:pk>/",
+        async_views.warehouse_detail,
+        name="async_warehouse_detail",
+    ),
+    path(
+        "async/product/<int:pk>/",
+        async_views.product_detail,
+        name="async_product_detail",
+    ),
+    path(
+        "async/inventory/<int:pk>/",
+        async_views.inventory_detail,
+        name="async_inventory_detail",
+    ),
+    path(
+        "async/api/warehouses/",
+        async_views.api_warehouse_list,
+        name="async_api_warehouse_list",
+    ),
+    path(
+        "async/api/warehouses/<int:pk>/",
+        async_views.api_warehouse_detail,
+        name="async_api_warehouse_detail",
+    ),
+    path(
+        "async/api/products/",
+        async_views.api_product_list,
+        name="async_api_product_list",
+    ),
+    path(
+        "async/api/products/<int:pk>/",
+        async_views.api_product_detail,
+        name="async_api_product_detail",
+    ),
+    path(
+        "async/api/inventory/",
+        async_views.api_inventory_list,
+        name="async_api_inventory_list",
+    ),
+    path(
+        "async/api/inventory/<int:pk>/",
+        async_views.api_inventory_detail,
+        name="async_api_inventory_detail",
+    ),
+]
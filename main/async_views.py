@@ -0,0 +1,356 @@
+# async_views.py
+# Async twins of the read-only pages and API endpoints, for ASGI deployments.
+# Queries go through the async ORM, so a request waiting on the database does
+# not hold a worker thread. Pages share their cache entries with the sync
+# views; writes stay on the sync views.
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.http import Http404, JsonResponse
+from django.shortcuts import aget_object_or_404, render
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from . import caching, forecast, snapshots
+from .filters import (
+    InvalidFilter,
+    filter_inventory,
+    filter_products,
+    filter_warehouses,
+)
+from .forms import InventoryFilterForm, ProductFilterForm, WarehouseFilterForm
+from .models import Inventory, Product, Warehouse
+from .pagination import (
+    KeysetPagination,
+    KeysetPaginationMixin,
+    ProductKeysetPagination,
+    WarehouseKeysetPagination,
+    akeyset_paginate,
+)
+from .serializers import (
+    InventoryAsOfSerializer,
+    InventorySerializer,
+    ProductSerializer,
+    WarehouseSerializer,
+)
+
+
+async def _authenticate(request):
+    # Templates read request.user, which would otherwise load the user again
+    # with a sync query.
+    request.user = await request.auser()
+    return request.user.is_authenticated
+
+
+def login_required(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if not await _authenticate(request):
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+class ApiError(Exception):
+    def __init__(self, detail, status):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
+
+
+async def _authenticate_api(request):
+    """
+    Authenticate with the API's configured classes, such as tokens, Basic
+    and sessions, the way DRF views do. Sets ``request.user`` and returns
+    None, or returns the error response.
+    """
+    authenticators = [auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    drf_request = Request(request, authenticators=authenticators)
+    detail = NotAuthenticated.default_detail
+    try:
+        # Authenticators may query the database, and only have sync APIs.
+        user = await sync_to_async(lambda: drf_request.user)()
+    except AuthenticationFailed as e:
+        user, detail = None, e.detail
+    if user is not None and user.is_authenticated:
+        request.user = user
+        return None
+    response = JsonResponse({"detail": detail}, status=403)
+    # As in DRF, a challenge from the first authenticator makes it a 401.
+    header = authenticators and authenticators[0].authenticate_header(drf_request)
+    if header:
+        response.status_code = 401
+        response["WWW-Authenticate"] = header
+    return response
+
+
+def api_view(view):
+    """GET endpoint authenticated and answering errors the way DRF does."""
+
+    @require_GET
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        denied = await _authenticate_api(request)
+        if denied is not None:
+            return denied
+        try:
+            return await view(request, *args, **kwargs)
+        except ApiError as e:
+            return JsonResponse(e.detail, status=e.status)
+
+    return wrapper
+
+
+def _as_of(request):
+    value = request.GET.get("as_of")
+    return snapshots.parse_as_of(value) if value else None
+
+
+async def _render(request, template, context):
+    # Forms look up the labels of selected choices while rendering.
+    return await sync_to_async(render)(request, template, context)
+
+
+async def _list_page(request, view_name, queryset, sort_key, dependencies):
+    """A cached keyset page, shared with the sync list view ``view_name``."""
+    page_size = KeysetPaginationMixin.paginate_by
+    cursor = request.GET.get("cursor")
+
+    async def build():
+        # Cached in the shape KeysetPaginationMixin.paginate_queryset returns.
+        page = await akeyset_paginate(queryset, sort_key, page_size, cursor)
+        return (None, page, page.object_list, page.has_other_pages())
+
+    try:
+        _, page, _, is_paginated = await caching.aread_through(
+            f"list.{view_name}",
+            (sorted(request.GET.lists()), page_size),
+            [(label, None) for label in dependencies],
+            build,
+        )
+    except ValueError:
+        raise Http404("Invalid cursor")
+    return {"page_obj": page, "is_paginated": is_paginated}
+
+
+@require_GET
+@login_required
+async def warehouse_list(request):
+    context = await _list_page(
+        request,
+        "WarehouseListView",
+        filter_warehouses(Warehouse.objects.all(), request.GET),
+        "name",
+        ("warehouse", "warehouse_usage"),
+    )
+    context["warehouses"] = context["page_obj"].object_list
+    context["filter_form"] = WarehouseFilterForm(request.GET)
+    return await _render(request, "warehouse_list.html", context)
+
+
+@require_GET
+@login_required
+async def product_list(request):
+    context = await _list_page(
+        request,
+        "ProductListView",
+        filter_products(Product.objects.all(), request.GET),
+        "name",
+        ("product",),
+    )
+    context["products"] = context["page_obj"].object_list
+    context["filter_form"] = ProductFilterForm(request.GET)
+    return await _render(request, "product_list.html", context)
+
+
+@require_GET
+@login_required
+async def inventory_list(request):
+    try:
+        queryset = filter_inventory(Inventory.objects.list_projection(), request.GET)
+        as_of = _as_of(request)
+    except ValueError as e:
+        raise Http404(str(e))
+    if as_of:
+        queryset = await snapshots.aas_of(queryset, as_of)
+    context = await _list_page(
+        request,
+        "InventoryListView",
+        queryset,
+        "id",
+        ("inventory", "warehouse", "product"),
+    )
+    context["inventories"] = context["page_obj"].object_list
+    context["filter_form"] = InventoryFilterForm(request.GET)
+    context["as_of"] = as_of
+    return await _render(request, "inventory_list.html", context)
+
+
+@require_GET
+@login_required
+async def warehouse_detail(request, pk):
+    try:
+        as_of = _as_of(request)
+    except ValueError as e:
+        raise Http404(str(e))
+
+    async def load():
+        warehouse = await aget_object_or_404(Warehouse, pk=pk)
+        inventories = Inventory.objects.list_projection().filter(warehouse=warehouse)
+        if as_of:
+            inventories = await snapshots.aas_of(inventories, as_of)
+            return warehouse, [inventory async for inventory in inventories]
+        inventories = [inventory async for inventory in inventories]
+        return warehouse, await sync_to_async(forecast.attach)(inventories)
+
+    warehouse, inventories = await caching.aread_through(
+        "warehouse_detail",
+        (pk, as_of),
+        [("warehouse", pk), ("product", None)],
+        load,
+    )
+    return await _render(
+        request,
+        "warehouse_detail.html",
+        {"warehouse": warehouse, "inventories": inventories, "as_of": as_of},
+    )
+
+
+@require_GET
+@login_required
+async def product_detail(request, pk):
+    async def load():
+        product = await aget_object_or_404(Product, pk=pk)
+        inventories = Inventory.objects.list_projection().filter(product=product)
+        inventories = [inventory async for inventory in inventories]
+        return product, await sync_to_async(forecast.attach)(inventories)
+
+    product, inventories = await caching.aread_through(
+        "product_detail", pk, [("product", pk), ("warehouse", None)], load
+    )
+    return await _render(
+        request,
+        "product_detail.html",
+        {"product": product, "inventories": inventories},
+    )
+
+
+@require_GET
+@login_required
+async def inventory_detail(request, pk):
+    inventory = await caching.aread_through(
+        "inventory_detail",
+        pk,
+        [],
+        lambda: aget_object_or_404(Inventory.objects.detail_projection(), pk=pk),
+        extra_deps=lambda inventory: [
+            ("warehouse", inventory.warehouse_id),
+            ("product", inventory.product_id),
+        ],
+    )
+    return await _render(request, "inventory_detail.html", {"inventory": inventory})
+
+
+def _page_size(request, pagination):
+    try:
+        size = int(request.GET[pagination.page_size_query_param])
+    except (KeyError, ValueError):
+        return pagination.page_size
+    return max(1, min(size, pagination.max_page_size))
+
+
+async def _api_page(request, queryset, serializer_class, pagination=KeysetPagination):
+    """A keyset page in the same shape as ``KeysetPagination`` responses."""
+    try:
+        page = await akeyset_paginate(
+            queryset,
+            pagination.sort_key,
+            _page_size(request, pagination),
+            request.GET.get(pagination.cursor_query_param),
+        )
+    except ValueError:
+        raise ApiError({"detail": "Invalid cursor"}, 404)
+
+    def link(cursor):
+        if cursor is None:
+            return None
+        url = request.build_absolute_uri()
+        return replace_query_param(url, pagination.cursor_query_param, cursor)
+
+    return JsonResponse(
+        {
+            "next": link(page.next_cursor),
+            "previous": link(page.previous_cursor),
+            "results": serializer_class(page.object_list, many=True).data,
+        }
+    )
+
+
+async def _api_object(queryset, pk, serializer_class):
+    try:
+        obj = await queryset.aget(pk=pk)
+    except queryset.model.DoesNotExist:
+        raise ApiError(
+            {"detail": f"No {queryset.model.__name__} matches the given query."}, 404
+        )
+    return JsonResponse(serializer_class(obj).data)
+
+
+@api_view
+async def api_warehouse_list(request):
+    return await _api_page(
+        request,
+        filter_warehouses(Warehouse.objects.all(), request.GET),
+        WarehouseSerializer,
+        WarehouseKeysetPagination,
+    )
+
+
+@api_view
+async def api_warehouse_detail(request, pk):
+    return await _api_object(Warehouse.objects.all(), pk, WarehouseSerializer)
+
+
+@api_view
+async def api_product_list(request):
+    # Same filters, validation and order as the sync product API.
+    form = ProductFilterForm(request.GET)
+    if not form.is_valid():
+        raise ApiError(form.errors, 400)
+    return await _api_page(
+        request,
+        filter_products(Product.objects.all(), request.GET),
+        ProductSerializer,
+        ProductKeysetPagination,
+    )
+
+
+@api_view
+async def api_product_detail(request, pk):
+    return await _api_object(Product.objects.all(), pk, ProductSerializer)
+
+
+@api_view
+async def api_inventory_list(request):
+    try:
+        queryset = filter_inventory(Inventory.objects.all(), request.GET)
+    except InvalidFilter as e:
+        raise ApiError(e.errors, 400)
+    try:
+        as_of = _as_of(request)
+    except ValueError as e:
+        raise ApiError({"as_of": [str(e)]}, 400)
+    if as_of:
+        queryset = await snapshots.aas_of(queryset, as_of)
+        return await _api_page(request, queryset, InventoryAsOfSerializer)
+    return await _api_page(request, queryset, InventorySerializer)
+
+
+@api_view
+async def api_inventory_detail(request, pk):
+    return await _api_object(Inventory.objects.all(), pk, InventorySerializer)
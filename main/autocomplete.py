@@ -0,0 +1,71 @@
+# autocomplete.py
+# Lazy choice fields for warehouses and products. Forms render only the
+# selected option; the rest come page by page from the autocomplete API.
+from django import forms
+from django.urls import reverse
+
+from .models import Product, Warehouse
+from .search import filter_matching
+
+# kind: (model, searched columns, fields loaded for labels)
+SOURCES = {
+    "products": (Product, ["name", "sku"], ["id", "name", "sku"]),
+    "warehouses": (Warehouse, ["name"], ["id", "name"]),
+}
+
+
+def label(obj):
+    if isinstance(obj, Product):
+        return f"{obj.name} ({obj.sku})"
+    return obj.name
+
+
+def choices(kind, text=""):
+    """Objects of ``kind`` whose searched columns start with the words in ``text``."""
+    model, columns, fields = SOURCES[kind]
+    queryset = model.objects.only(*fields)
+    if text.strip():
+        queryset = filter_matching(queryset, text, columns)
+    return queryset
+
+
+class AutocompleteSelect(forms.Select):
+    """A select that renders only its selected option; see autocomplete.js."""
+
+    class Media:
+        js = ["autocomplete.js"]
+
+    def __init__(self, kind, attrs=None):
+        super().__init__(attrs)
+        self.kind = kind
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context["widget"]["attrs"]["data-autocomplete"] = reverse(
+            "autocomplete_api", args=[self.kind]
+        )
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        ids = [v for v in value if str(v).isdigit()]
+        _, _, fields = SOURCES[self.kind]
+        selected = self.choices.queryset.only(*fields).filter(pk__in=ids)
+        options = self.choices
+        self.choices = [("", "---------")] + [(obj.pk, label(obj)) for obj in selected]
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = options
+
+
+class AutocompleteField(forms.ModelChoiceField):
+    """
+    A ``ModelChoiceField`` that never loads the whole table: rendering
+    fetches the selected row and validation is a single primary key lookup.
+    """
+
+    def __init__(self, kind, **kwargs):
+        model, _, _ = SOURCES[kind]
+        super().__init__(
+            queryset=model.objects.all(), widget=AutocompleteSelect(kind), **kwargs
+        )
@@ -0,0 +1,366 @@
+# bulk.py
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from . import caching, search, stock
+from .capacity import CapacityExceeded
+from .models import Inventory, Product, Warehouse
+from .serializers import (
+    InventoryBulkSerializer,
+    ProductBulkSerializer,
+    WarehouseBulkSerializer,
+)
+
+MAX_BULK_ITEMS = 10000
+BATCH_SIZE = 1000
+
+
+class BulkValidationError(Exception):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+class BulkHandler:
+    """
+    Validates a whole batch in one pass and writes it with bulk_create /
+    bulk_update inside a single transaction. Nothing is written if any item
+    fails validation.
+    """
+
+    model = None
+    serializer_class = None
+    # Natural key used for upserts, as model attribute names.
+    key_fields = ()
+    key_is_unique = False
+
+    def __init__(self):
+        self.errors = {}
+
+    @property
+    def fields(self):
+        return [
+            field.source
+            for field in self.serializer_class().fields.values()
+            if not field.read_only
+        ]
+
+    def add_error(self, index, field, message):
+        self.errors.setdefault(index, {}).setdefault(field, []).append(message)
+
+    def raise_errors(self):
+        if self.errors:
+            raise BulkValidationError(
+                [
+                    {"index": index, **errors}
+                    for index, errors in sorted(self.errors.items())
+                ]
+            )
+
+    def validate(self, items, partial=False):
+        rows = {}
+        for index, item in enumerate(items):
+            serializer = self.serializer_class(data=item, partial=partial)
+            if serializer.is_valid():
+                rows[index] = dict(serializer.validated_data)
+            else:
+                self.errors[index] = serializer.errors
+        self.check_relations(rows)
+        return rows
+
+    def check_relations(self, rows):
+        pass
+
+    def check_instances(self, changes):
+        """Validate ``{index: (row, instance)}`` for a bulk update."""
+        pass
+
+    def key(self, row):
+        return tuple(row[field] for field in self.key_fields)
+
+    def existing_keys(self, keys):
+        """Map natural keys that already exist to their primary key."""
+        return {}
+
+    def check_duplicate_keys(self, rows):
+        seen = {}
+        for index, row in rows.items():
+            if not all(field in row for field in self.key_fields):
+                continue
+            key = self.key(row)
+            if key in seen:
+                self.add_error(
+                    index,
+                    "non_field_errors",
+                    f"Duplicate of item {seen[key]} in this batch",
+                )
+            else:
+                seen[key] = index
+
+    def lock(self, queryset):
+        """Lock the rows a bulk write reads before changing; returns them."""
+        return queryset
+
+    def loaded(self, objects):
+        """Called with the current rows of a bulk update before they change."""
+        pass
+
+    def after_write(self, objects):
+        pass
+
+    def touch(self, objects):
+        # bulk_update() skips auto_now, so set updated_at by hand.
+        now = timezone.now()
+        for obj in objects:
+            obj.updated_at = now
+
+    def create(self, items, upsert=False):
+        rows = self.validate(items)
+        created, updated = [], []
+        # Lookups of existing rows share the transaction of the write, so
+        # what after_write() sees as "before" is still current.
+        with transaction.atomic():
+            if self.key_fields:
+                self.check_duplicate_keys(rows)
+                existing = self.existing_keys(
+                    {self.key(row) for row in rows.values()}
+                )
+                for index, row in rows.items():
+                    pk = existing.get(self.key(row))
+                    if pk is None:
+                        created.append(self.model(**row))
+                    elif upsert:
+                        updated.append(self.model(id=pk, **row))
+                    elif self.key_is_unique:
+                        self.add_error(index, self.key_fields[0], "Already exists")
+                    else:
+                        created.append(self.model(**row))
+            else:
+                created = [self.model(**row) for row in rows.values()]
+            self.raise_errors()
+
+            self.model.objects.bulk_create(created, batch_size=BATCH_SIZE)
+            if updated:
+                self.touch(updated)
+                self.model.objects.bulk_update(
+                    updated, [*self.fields, "updated_at"], batch_size=BATCH_SIZE
+                )
+            self.after_write(created + updated)
+        return {
+            "created": [obj.id for obj in created],
+            "updated": [obj.id for obj in updated],
+        }
+
+    def update(self, items):
+        ids = {}
+        for index, item in enumerate(items):
+            pk = item.get("id") if isinstance(item, dict) else None
+            if not isinstance(pk, int):
+                self.add_error(index, "id", "A numeric id is required")
+            else:
+                ids[index] = pk
+        rows = self.validate(items, partial=True)
+        with transaction.atomic():
+            objects = self.lock(
+                self.model.objects.filter(id__in=ids.values())
+            ).in_bulk()
+            self.loaded(objects.values())
+            for index, pk in ids.items():
+                if pk not in objects:
+                    self.add_error(index, "id", "Does not exist")
+            self.check_instances(
+                {
+                    index: (row, objects[ids[index]])
+                    for index, row in rows.items()
+                    if ids.get(index) in objects
+                }
+            )
+            if self.key_fields:
+                self.check_duplicate_keys(rows)
+                existing = self.existing_keys(
+                    {
+                        self.key(row)
+                        for row in rows.values()
+                        if all(field in row for field in self.key_fields)
+                    }
+                )
+                for index, row in rows.items():
+                    if not all(field in row for field in self.key_fields):
+                        continue
+                    pk = existing.get(self.key(row))
+                    if self.key_is_unique and pk is not None and pk != ids.get(index):
+                        self.add_error(index, self.key_fields[0], "Already exists")
+            self.raise_errors()
+
+            changed_fields = set()
+            for index, row in rows.items():
+                obj = objects[ids[index]]
+                for field, value in row.items():
+                    setattr(obj, field, value)
+                changed_fields.update(row)
+            updated = [objects[pk] for pk in ids.values()]
+            if changed_fields:
+                self.touch(updated)
+                self.model.objects.bulk_update(
+                    updated,
+                    [*sorted(changed_fields), "updated_at"],
+                    batch_size=BATCH_SIZE,
+                )
+            self.after_write(updated)
+        return {"updated": [obj.id for obj in updated]}
+
+    def delete(self, ids):
+        if not all(isinstance(pk, int) for pk in ids):
+            raise ValidationError({"ids": "Must be a list of numeric ids"})
+        with transaction.atomic():
+            _, deleted = self.model.objects.filter(id__in=ids).delete()
+        return {"deleted": deleted.get(self.model._meta.label, 0)}
+
+
+class WarehouseBulkHandler(BulkHandler):
+    model = Warehouse
+    serializer_class = WarehouseBulkSerializer
+
+    def check_instances(self, changes):
+        # The serializer has no instance in bulk, so it can only check that
+        # the capacity is positive.
+        for index, (row, warehouse) in changes.items():
+            if "capacity" in row and row["capacity"] < warehouse.used_capacity:
+                self.add_error(
+                    index,
+                    "capacity",
+                    f"Capacity cannot be below the {warehouse.used_capacity} "
+                    "units stored",
+                )
+
+    def after_write(self, objects):
+        search.index_objects(objects)
+        caching.bump_objects(objects)
+
+
+class ProductBulkHandler(BulkHandler):
+    model = Product
+    serializer_class = ProductBulkSerializer
+    key_fields = ("sku",)
+    key_is_unique = True
+
+    def existing_keys(self, keys):
+        skus = [sku for (sku,) in keys]
+        return {
+            (sku,): pk
+            for sku, pk in Product.objects.filter(sku__in=skus).values_list(
+                "sku", "id"
+            )
+        }
+
+    def after_write(self, objects):
+        search.index_objects(objects)
+        caching.bump_objects(objects)
+
+
+class InventoryBulkHandler(BulkHandler):
+    model = Inventory
+    serializer_class = InventoryBulkSerializer
+    key_fields = ("warehouse_id", "product_id")
+    key_is_unique = True
+
+    def __init__(self):
+        super().__init__()
+        # Balances before the write, so the ledger gets the deltas.
+        self.before = {}
+
+    def lock(self, queryset):
+        stock.lock_inventory(queryset)
+        return queryset
+
+    def loaded(self, objects):
+        self.before.update((obj.id, stock.state(obj)) for obj in objects)
+
+    def after_write(self, objects):
+        stock.record_changes(
+            [(self.before.get(obj.id), stock.state(obj)) for obj in objects],
+            reference="api",
+        )
+
+    def delete(self, ids):
+        if not all(isinstance(pk, int) for pk in ids):
+            raise ValidationError({"ids": "Must be a list of numeric ids"})
+        with transaction.atomic():
+            rows = list(
+                self.lock(Inventory.objects.filter(id__in=ids)).values_list(
+                    "warehouse_id", "product_id", "quantity"
+                )
+            )
+            Inventory.objects.filter(id__in=ids).delete()
+            stock.record_changes([(row, None) for row in rows], reference="api")
+        return {"deleted": len(rows)}
+
+    def check_relations(self, rows):
+        for field, model in (("warehouse_id", Warehouse), ("product_id", Product)):
+            ids = {row[field] for row in rows.values() if field in row}
+            found = set(model.objects.filter(id__in=ids).values_list("id", flat=True))
+            for index, row in rows.items():
+                if field in row and row[field] not in found:
+                    self.add_error(
+                        index, field[: -len("_id")], f"{model.__name__} does not exist"
+                    )
+
+    def existing_keys(self, keys):
+        if not keys:
+            return {}
+        candidates = self.lock(
+            Inventory.objects.filter(
+                warehouse_id__in={w for w, _ in keys},
+                product_id__in={p for _, p in keys},
+            )
+        ).values_list("warehouse_id", "product_id", "id", "quantity")
+        existing = {}
+        for w, p, pk, quantity in candidates:
+            if (w, p) in keys:
+                existing[(w, p)] = pk
+                self.before[pk] = (w, p, quantity)
+        return existing
+
+
+class BulkMixin:
+    """Adds ``<resource>/bulk/`` accepting arrays for POST, PATCH and DELETE."""
+
+    bulk_handler_class = None
+
+    @action(detail=False, methods=["post", "patch", "delete"], url_path="bulk")
+    def bulk(self, request):
+        data = request.data
+        if request.method == "DELETE" and isinstance(data, dict):
+            data = data.get("ids")
+        if not isinstance(data, list):
+            raise ValidationError({"error": "Expected a list of items"})
+        if len(data) > MAX_BULK_ITEMS:
+            raise ValidationError(
+                {"error": f"At most {MAX_BULK_ITEMS} items per request"}
+            )
+
+        handler = self.bulk_handler_class()
+        try:
+            if request.method == "POST":
+                upsert = request.query_params.get("upsert") in ("1", "true")
+                return Response(
+                    handler.create(data, upsert=upsert),
+                    status=status.HTTP_201_CREATED,
+                )
+            if request.method == "PATCH":
+                return Response(handler.update(data))
+            return Response(handler.delete(data))
+        except BulkValidationError as e:
+            # Raised directly rather than as a DRF ValidationError so item
+            # indexes stay integers in the response.
+            return Response({"errors": e.errors}, status=status.HTTP_400_BAD_REQUEST)
+        except CapacityExceeded as e:
+            raise ValidationError({"error": str(e)})
+        except IntegrityError:
+            # A concurrent write, or a partial update whose merged natural key
+            # collides with another row.
+            raise ValidationError({"error": "Conflicts with an existing row"})
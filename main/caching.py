@@ -0,0 +1,192 @@
+# caching.py
+# Read-through cache for list and detail pages. Every entry records the
+# versions of the objects and collections it was built from; signals and the
+# stock/bulk write paths bump those versions, which invalidates exactly the
+# entries that depended on them.
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import router, transaction
+
+from .models import Inventory
+
+# Bumped by bulk loads and repairs that touch everything.
+GLOBAL = ("all", None)
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _version_key(label, pk):
+    return f"v:{label}:{'*' if pk is None else pk}"
+
+
+def _new_version():
+    # Not 0: a version key evicted and recreated must never match a version
+    # recorded by an older entry.
+    return time.time_ns()
+
+
+def current_versions(deps):
+    keys = {_version_key(*dep): dep for dep in deps}
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, _new_version(), None)
+        found.update(cache.get_many(missing))
+    return {keys[key]: version for key, version in found.items()}
+
+
+async def acurrent_versions(deps):
+    keys = {_version_key(*dep): dep for dep in deps}
+    found = await cache.aget_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            await cache.aadd(key, _new_version(), None)
+        found.update(await cache.aget_many(missing))
+    return {keys[key]: version for key, version in found.items()}
+
+
+def bump(*deps):
+    """Invalidate entries depending on ``deps`` once the transaction commits."""
+
+    def apply():
+        for dep in deps:
+            key = _version_key(*dep)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, _new_version(), None)
+
+    transaction.on_commit(apply)
+
+
+def bump_objects(objects):
+    labels = {obj._meta.model_name for obj in objects}
+    bump(
+        *((obj._meta.model_name, obj.pk) for obj in objects),
+        *((label, None) for label in labels),
+    )
+
+
+def bump_inventory(pairs):
+    """Invalidate pages showing the balances of ``(warehouse_id, product_id)``."""
+    pairs = set(pairs)
+    if not pairs:
+        return
+    bump(
+        ("inventory", None),
+        ("warehouse_usage", None),
+        *(("warehouse", w) for w, _ in pairs),
+        *(("product", p) for _, p in pairs),
+    )
+
+
+def bump_all():
+    bump(GLOBAL)
+
+
+def _entry_key(name, params):
+    # Pages read from the replica are kept apart from primary reads: one
+    # built from a lagging replica must never reach a client pinned to the
+    # primary after writing.
+    alias = router.db_for_read(Inventory)
+    digest = hashlib.sha1(repr(params).encode()).hexdigest()
+    return f"c:{name}:{alias}:{digest}"
+
+
+def read_through(name, params, deps, build, extra_deps=None):
+    """
+    Return the cached value for ``name`` and ``params`` if none of its
+    dependencies changed, otherwise ``build()`` and store it. ``extra_deps``
+    may derive more dependencies from the built value, for objects whose
+    related rows are only known after loading them.
+    """
+    key = _entry_key(name, params)
+    deps = [GLOBAL, *deps]
+
+    entry = cache.get(key)
+    if entry is not None:
+        value, versions = entry
+        if current_versions(versions) == versions:
+            _count(name, "hits")
+            return value
+    _count(name, "misses")
+
+    # Versions are read before building, so a write that lands meanwhile
+    # leaves the entry already outdated rather than wrongly current.
+    versions = current_versions(deps)
+    value = build()
+    if extra_deps:
+        versions.update(current_versions(extra_deps(value)))
+    cache.set(key, (value, versions))
+    return value
+
+
+async def aread_through(name, params, deps, build, extra_deps=None):
+    """``read_through`` for async views; ``build`` returns an awaitable."""
+    key = _entry_key(name, params)
+    deps = [GLOBAL, *deps]
+
+    entry = await cache.aget(key)
+    if entry is not None:
+        value, versions = entry
+        if await acurrent_versions(versions) == versions:
+            _count(name, "hits")
+            return value
+    _count(name, "misses")
+
+    versions = await acurrent_versions(deps)
+    value = await build()
+    if extra_deps:
+        versions.update(await acurrent_versions(extra_deps(value)))
+    await cache.aset(key, (value, versions))
+    return value
+
+
+def _count(name, outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+        _stats[f"{name}.{outcome}"] += 1
+
+
+def stats():
+    with _stats_lock:
+        totals = dict(_stats)
+    per_view = {}
+    for key, count in totals.items():
+        if "." in key:
+            name, outcome = key.rsplit(".", 1)
+            per_view.setdefault(name, {"hits": 0, "misses": 0})[outcome] = count
+    return {
+        "hits": totals.get("hits", 0),
+        "misses": totals.get("misses", 0),
+        "views": per_view,
+    }
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+class CachedPageMixin:
+    """Caches the keyset page of a list view, keyed by its query string."""
+
+    cache_dependencies = ()
+
+    def paginate_queryset(self, queryset, page_size):
+        params = (sorted(self.request.GET.lists()), page_size)
+        return read_through(
+            f"list.{type(self).__name__}",
+            params,
+            [(label, None) for label in self.cache_dependencies],
+            lambda: super(CachedPageMixin, self).paginate_queryset(
+                queryset, page_size
+            ),
+        )
@@ -0,0 +1,71 @@
+# capacity.py
+# Warehouse.used_capacity is a running total of the inventory stored in each
+# warehouse. It is adjusted by the same transactions that change balances, so
+# showing utilization never needs a SUM() over inventory.
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .caching import bump_all
+from .models import Inventory, Warehouse
+
+
+class CapacityExceeded(Exception):
+    pass
+
+
+def use_capacity(deltas):
+    """
+    Apply ``{warehouse_id: delta}`` to the usage counters. Increases are only
+    applied if they fit, checked and written by one conditional UPDATE.
+    """
+    # Sorted so concurrent callers touch warehouses in the same order.
+    for warehouse_id, delta in sorted(deltas.items()):
+        if not delta:
+            continue
+        rows = Warehouse.objects.filter(id=warehouse_id)
+        if delta > 0:
+            rows = rows.filter(used_capacity__lte=F("capacity") - delta)
+        updated = rows.update(
+            used_capacity=F("used_capacity") + delta, updated_at=timezone.now()
+        )
+        if not updated and delta > 0:
+            raise CapacityExceeded(
+                f"Warehouse {warehouse_id} has no room for {delta} more units"
+            )
+
+
+def free_capacity(warehouse_ids):
+    """Map warehouse ids to how many more units each can take."""
+    return dict(
+        Warehouse.objects.filter(id__in=warehouse_ids)
+        .annotate(free=F("capacity") - F("used_capacity"))
+        .values_list("id", "free")
+    )
+
+
+def release_product(product):
+    """Give back the space held by a product's inventory before it is deleted."""
+    totals = (
+        Inventory.objects.filter(product=product)
+        .values_list("warehouse_id")
+        .annotate(total=Sum("quantity"))
+        .order_by()
+    )
+    use_capacity({warehouse_id: -total for warehouse_id, total in totals})
+
+
+def recompute_usage(warehouses=None):
+    """Rebuild the counters from scratch, e.g. after raw bulk loads."""
+    totals = (
+        Inventory.objects.filter(warehouse_id=OuterRef("id"))
+        .order_by()
+        .values("warehouse_id")
+        .annotate(total=Sum("quantity"))
+        .values("total")
+    )
+    warehouses = Warehouse.objects.all() if warehouses is None else warehouses
+    bump_all()
+    return warehouses.update(
+        used_capacity=Coalesce(Subquery(totals), 0), updated_at=timezone.now()
+    )
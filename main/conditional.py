@@ -0,0 +1,151 @@
+# conditional.py
+# Conditional GET support. Validators come from one small query over
+# updated_at, so a 304 is answered before any serializer or template runs.
+import hashlib
+from datetime import datetime
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.sha1(repr(parts).encode()).hexdigest())
+
+
+def _latest_related(relations):
+    return {
+        f"latest_{i}": Max(f"{relation}__updated_at")
+        for i, relation in enumerate(relations)
+    }
+
+
+def collection_state(queryset, relations=()):
+    """
+    Return ``(latest updated_at, row count)`` of ``queryset``, where the
+    latest change also covers the rows joined through ``relations``.
+    """
+    related = _latest_related(relations)
+    state = queryset.order_by().aggregate(
+        latest=Max("updated_at"), rows=Count("pk"), **related
+    )
+    latest = max(
+        (state[key] for key in ["latest", *related] if state[key] is not None),
+        default=None,
+    )
+    return latest, state["rows"]
+
+
+def respond(request, etag, last_modified, view):
+    """
+    Return 304 Not Modified if the request's validators match, otherwise the
+    response of ``view()``. Both carry the validators.
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = view()
+    if response.status_code in (200, 304):
+        response.headers["ETag"] = etag
+        if timestamp is not None:
+            response.headers["Last-Modified"] = http_date(timestamp)
+        # Clients must revalidate instead of guessing a freshness lifetime.
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+class ConditionalViewSetMixin:
+    """
+    Answers ``list`` and ``retrieve`` with 304 when nothing changed, including
+    the related objects nested into the response with ``?expand=``.
+    """
+
+    def expanded_relations(self):
+        return self.get_serializer_context().get("expand", ())
+
+    def list(self, request, *args, **kwargs):
+        latest, rows = collection_state(
+            self.filter_queryset(self.get_queryset()), self.expanded_relations()
+        )
+        etag = make_etag(
+            request.get_full_path(), request.accepted_media_type, latest, rows
+        )
+        return respond(
+            request,
+            etag,
+            latest,
+            lambda: super(ConditionalViewSetMixin, self).list(
+                request, *args, **kwargs
+            ),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = str(self.kwargs[self.lookup_url_kwarg or self.lookup_field])
+        latest = None
+        if pk.isdigit():
+            related = _latest_related(self.expanded_relations())
+            state = (
+                self.get_queryset()
+                .filter(pk=pk)
+                .annotate(**related)
+                .values_list("updated_at", *related)
+                .first()
+            )
+            latest = state and max(value for value in state if value is not None)
+        if latest is None:
+            # Let retrieve() produce its usual error.
+            return super().retrieve(request, *args, **kwargs)
+        etag = make_etag(pk, request.accepted_media_type, latest)
+        return respond(
+            request,
+            etag,
+            latest,
+            lambda: super(ConditionalViewSetMixin, self).retrieve(
+                request, *args, **kwargs
+            ),
+        )
+
+
+class ConditionalDetailMixin:
+    """
+    Answers GET with 304 when the page would not change. Views implement
+    ``conditional_state()``, returning a tuple of values that change with
+    the page, or ``None`` if the object does not exist.
+    """
+
+    def conditional_state(self):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        state = self.conditional_state()
+        if state is None:
+            return super().get(request, *args, **kwargs)
+        # Pages greet the logged in user, so each user gets their own tags.
+        user = request.user
+        etag = make_etag(user.pk, user.email, user.is_admin, *state)
+        last_modified = max(
+            (value for value in state if isinstance(value, datetime)), default=None
+        )
+        return respond(
+            request,
+            etag,
+            last_modified,
+            lambda: super(ConditionalDetailMixin, self).get(request, *args, **kwargs),
+        )
+
+
+def related_state(queryset, pk, *relations):
+    """
+    ``updated_at`` of the object ``pk`` in ``queryset`` plus, for each
+    relation path, the latest ``updated_at`` and row count across it.
+    """
+    aggregates = {}
+    for i, relation in enumerate(relations):
+        aggregates[f"latest_{i}"] = Max(f"{relation}__updated_at")
+        aggregates[f"rows_{i}"] = Count(relation)
+    return (
+        queryset.filter(pk=pk)
+        .annotate(**aggregates)
+        .values_list("updated_at", *aggregates)
+        .first()
+    )
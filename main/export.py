@@ -0,0 +1,122 @@
+# export.py
+import csv
+import json
+import zlib
+
+from .filters import (
+    InvalidFilter,
+    filter_inventory,
+    filter_products,
+    filter_warehouses,
+)
+from .forms import InventoryFilterForm, ProductFilterForm, WarehouseFilterForm
+from .models import Inventory, Product, Warehouse
+
+CHUNK_SIZE = 2000
+# Rows are joined into blocks of roughly this many bytes before being yielded,
+# so the response is not flushed once per row.
+BLOCK_SIZE = 64 * 1024
+
+# kind: (filter form of the list page, queryset builder, columns)
+EXPORTS = {
+    "inventory": (
+        InventoryFilterForm,
+        lambda params: filter_inventory(Inventory.objects.all(), params),
+        [
+            ("id", "id"),
+            ("warehouse_id", "warehouse_id"),
+            ("warehouse", "warehouse__name"),
+            ("product_id", "product_id"),
+            ("sku", "product__sku"),
+            ("product", "product__name"),
+            ("quantity", "quantity"),
+        ],
+    ),
+    "products": (
+        ProductFilterForm,
+        lambda params: filter_products(Product.objects.all(), params),
+        [
+            ("id", "id"),
+            ("sku", "sku"),
+            ("name", "name"),
+            ("description", "description"),
+            ("price", "price"),
+        ],
+    ),
+    "warehouses": (
+        WarehouseFilterForm,
+        lambda params: filter_warehouses(Warehouse.objects.all(), params),
+        [
+            ("id", "id"),
+            ("name", "name"),
+            ("location", "location"),
+            ("capacity", "capacity"),
+        ],
+    ),
+}
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def _rows(kind, params):
+    form_class, build_queryset, columns = EXPORTS[kind]
+    form = form_class(params)
+    if not form.is_valid():
+        raise InvalidFilter(form.errors)
+    # values_list keeps memory flat: no model instances, and the joins for
+    # warehouse/product names happen in the same query.
+    queryset = (
+        build_queryset(params)
+        .order_by("id")
+        .values_list(*(lookup for _, lookup in columns))
+    )
+    return [name for name, _ in columns], queryset.iterator(chunk_size=CHUNK_SIZE)
+
+
+def _lines(header, rows, fmt):
+    if fmt == "csv":
+        writer = csv.writer(_Echo())
+        yield writer.writerow(header)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(header, row)), default=str) + "\n"
+
+
+def _blocks(lines, compress):
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    block, size = [], 0
+    for line in lines:
+        block.append(line)
+        size += len(line)
+        if size >= BLOCK_SIZE:
+            data = "".join(block).encode()
+            yield compressor.compress(data) if compressor else data
+            block, size = [], 0
+    data = "".join(block).encode()
+    if compressor:
+        yield compressor.compress(data) + compressor.flush()
+    elif data:
+        yield data
+
+
+def stream(kind, params, fmt="csv", compress=False):
+    """
+    Return the export as an iterator of encoded byte blocks, optionally
+    gzip-compressed. The filters are checked with the list page's form
+    before anything is streamed; invalid ones raise ``InvalidFilter``.
+    """
+    header, rows = _rows(kind, params)
+    return _blocks(_lines(header, rows, fmt), compress)
+
+
+def filename(kind, fmt, compress=False):
+    return f"{kind}.{FORMATS[fmt][1]}" + (".gz" if compress else "")
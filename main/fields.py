@@ -0,0 +1,170 @@
+# fields.py
+# Sparse fieldsets for the API. ``?fields=id,quantity`` trims both the
+# response and the SELECT list to those fields, and ``?expand=warehouse``
+# nests the related object in place of its id, loaded in the same query with
+# a join. List responses are built straight from values() rows, which skips
+# creating a model instance and walking the serializer fields for each row.
+from types import SimpleNamespace
+
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+
+def parse_list(params, name):
+    return [part.strip() for part in params.get(name, "").split(",") if part.strip()]
+
+
+class SparseSerializerMixin:
+    """
+    Serializer mixin honouring ``fields`` and ``expand`` in the context.
+    ``expandable`` maps relation fields to the serializer nesting them, and
+    ``computed`` maps read-only model properties to the columns they read.
+    """
+
+    expandable = {}
+    computed = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Nested serializers get no context of their own, so they keep all
+        # their fields.
+        context = kwargs.get("context") or {}
+        if context.get("fields"):
+            for name in set(self.fields) - set(context["fields"]):
+                self.fields.pop(name)
+        for name in context.get("expand", ()):
+            if name in self.fields:
+                self.fields[name] = self.expandable[name](read_only=True)
+
+
+def columns(serializer, prefix=""):
+    """The ORM paths ``serializer`` reads, for only() and values()."""
+    paths = []
+    for name, field in serializer.fields.items():
+        if name in serializer.computed:
+            paths += [prefix + column for column in serializer.computed[name]]
+        elif isinstance(field, serializers.BaseSerializer):
+            paths += columns(field, f"{prefix}{field.source}__")
+        else:
+            paths.append(prefix + field.source)
+    return paths
+
+
+def _column(path, field):
+    def convert(row):
+        value = row[path]
+        return None if value is None else field.to_representation(value)
+
+    return convert
+
+
+def _foreign_key(path):
+    # values() already returns the related id.
+    return lambda row: row[path]
+
+
+def _property(getter, keys, field):
+    # Run the model property against just the columns it reads.
+    def convert(row):
+        return field.to_representation(
+            getter(SimpleNamespace(**{key: row[path] for key, path in keys}))
+        )
+
+    return convert
+
+
+def _converter(serializer, prefix=""):
+    """Build a function turning a values() row into ``serializer.data``."""
+    model = serializer.Meta.model
+    steps = []
+    for name, field in serializer.fields.items():
+        if name in serializer.computed:
+            keys = [(column, prefix + column) for column in serializer.computed[name]]
+            step = _property(getattr(model, name).fget, keys, field)
+        elif isinstance(field, serializers.BaseSerializer):
+            step = _converter(field, f"{prefix}{field.source}__")
+        elif isinstance(field, serializers.PrimaryKeyRelatedField):
+            step = _foreign_key(prefix + field.source)
+        else:
+            step = _column(prefix + field.source, field)
+        steps.append((name, step))
+    return lambda row: {name: step(row) for name, step in steps}
+
+
+def fast_data(serializer, rows):
+    """``serializer.data`` for a list of values() rows of ``columns()``."""
+    convert = _converter(serializer)
+    return [convert(row) for row in rows]
+
+
+class SparseFieldsMixin:
+    """
+    ViewSet mixin for ``?fields=`` and ``?expand=`` on reads. ``list`` serves
+    values() rows through ``fast_data``, unless ``fast_list`` is off.
+    """
+
+    fast_list = True
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.request and self.request.method == "GET":
+            context["fields"] = self.requested_fields()
+            context["expand"] = self.requested_expansions()
+        return context
+
+    def requested_fields(self):
+        fields = parse_list(self.request.query_params, "fields")
+        known = self.get_serializer_class()().fields
+        unknown = [name for name in fields if name not in known]
+        if unknown:
+            raise ValidationError({"fields": f"Unknown fields: {', '.join(unknown)}"})
+        return fields
+
+    def requested_expansions(self):
+        expand = parse_list(self.request.query_params, "expand")
+        expandable = self.get_serializer_class().expandable
+        unknown = [name for name in expand if name not in expandable]
+        if unknown:
+            raise ValidationError({"expand": f"Cannot expand: {', '.join(unknown)}"})
+        fields = parse_list(self.request.query_params, "fields")
+        return [name for name in expand if not fields or name in fields]
+
+    def sparse_columns(self, serializer):
+        """Columns to load: the serializer's plus the id and the sort key."""
+        paths = ["id", *columns(serializer)]
+        pagination = self.pagination_class
+        if pagination is not None and hasattr(pagination, "sort_key"):
+            paths.append(pagination.sort_key)
+        return list(dict.fromkeys(paths))
+
+    def sparse_queryset(self, queryset, serializer):
+        expand = serializer.context.get("expand")
+        if expand:
+            queryset = queryset.select_related(*expand)
+        model_fields = {f.name for f in queryset.model._meta.concrete_fields}
+        return queryset.only(
+            *(
+                path
+                for path in self.sparse_columns(serializer)
+                if path.split("__")[0] in model_fields
+            )
+        )
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request is None or self.request.method != "GET":
+            return queryset
+        return self.sparse_queryset(queryset, self.get_serializer())
+
+    def list(self, request, *args, **kwargs):
+        if not self.fast_list:
+            return super().list(request, *args, **kwargs)
+        serializer = self.get_serializer()
+        rows = self.filter_queryset(self.get_queryset()).values(
+            *self.sparse_columns(serializer)
+        )
+        page = self.paginate_queryset(rows)
+        if page is None:
+            return Response(fast_data(serializer, rows))
+        return self.get_paginated_response(fast_data(serializer, page))
@@ -0,0 +1,62 @@
+# filters.py
+# Query-string filters shared by the list views, the API and exports.
+from . import search
+
+
+class InvalidFilter(ValueError):
+    """A filter value that cannot be applied, with errors keyed by parameter."""
+
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def _id_param(params, name):
+    value = params.get(name)
+    if value and not str(value).isdigit():
+        raise InvalidFilter({name: ["Must be an id"]})
+    return value
+
+
+def filter_warehouses(queryset, params):
+    name = params.get("name")
+    location = params.get("location")
+
+    if name:
+        queryset = search.filter_matching(queryset, name, ["name"])
+    if location:
+        queryset = search.filter_matching(queryset, location, ["location"])
+    return queryset
+
+
+def filter_products(queryset, params):
+    name = params.get("name")
+    min_price = params.get("min_price")
+
+    if name:
+        queryset = search.filter_matching(queryset, name, ["name"])
+    if min_price:
+        queryset = queryset.filter(price__gte=min_price)
+    return queryset
+
+
+def filter_inventory(queryset, params):
+    warehouse = _id_param(params, "warehouse")
+    product = _id_param(params, "product")
+
+    if warehouse:
+        queryset = queryset.filter(warehouse=warehouse)
+    if product:
+        queryset = queryset.filter(product=product)
+    return queryset
+
+
+def filter_users(queryset, params):
+    email = params.get("email")
+    is_admin = params.get("is_admin")
+
+    if email:
+        queryset = queryset.filter(email__icontains=email)
+    if is_admin:
+        queryset = queryset.filter(is_admin=True)
+    return queryset
@@ -0,0 +1,130 @@
+# forecast.py
+# Demand forecasts for many (warehouse, product) series at once. Daily
+# outbound quantities are rebuilt from the movement ledger with one aggregate
+# query and held as a (series x day) NumPy array, so every statistic is a few
+# array operations however many series there are.
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import StockMovement
+from .reorder import OUTBOUND_KINDS
+
+HISTORY_DAYS = 56
+ALPHA = 0.3
+SHORT_WINDOW = 7
+LONG_WINDOW = 28
+# Above this many distinct ids the movement query is not narrowed with IN
+# lists; unmatched rows are dropped in NumPy instead.
+MAX_IN_LIST = 500
+
+
+def demand_matrix(rows, movements, days):
+    """
+    Scatter aggregated movements into a (len(rows) x days) float32 array.
+    ``rows`` is an int64 array of ``(inventory_id, warehouse_id, product_id,
+    quantity)`` and ``movements`` one of ``(warehouse_id, product_id,
+    day_index, outbound)``; movements for pairs not in ``rows`` are ignored.
+    """
+    demand = np.zeros((len(rows), days), dtype=np.float32)
+    if not len(rows) or not len(movements):
+        return demand
+    # Pairs are matched on a single int64 key, via a sort and a binary search.
+    width = int(max(rows[:, 2].max(), movements[:, 1].max())) + 1
+    keys = rows[:, 1] * width + rows[:, 2]
+    order = np.argsort(keys)
+    sorted_keys = keys[order]
+    wanted = movements[:, 0] * width + movements[:, 1]
+    position = np.minimum(np.searchsorted(sorted_keys, wanted), len(keys) - 1)
+    found = (sorted_keys[position] == wanted) & (movements[:, 2] < days)
+    demand[order[position[found]], movements[found, 2]] = movements[found, 3]
+    return demand
+
+
+def compute(quantity, demand, alpha=ALPHA):
+    """
+    Moving averages, exponentially smoothed demand and days of cover for
+    every series. ``demand`` holds one row per series, oldest day first.
+    """
+    days = demand.shape[1]
+    # Simple exponential smoothing seeded with the first day is a weighted
+    # sum of the history, so it is one matrix-vector product.
+    weights = alpha * (1 - alpha) ** np.arange(days - 1, -1, -1, dtype=np.float64)
+    weights[0] = (1 - alpha) ** (days - 1)
+    smoothed = demand @ weights.astype(np.float32)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cover = np.where(smoothed > 0, quantity / smoothed, np.inf)
+    return {
+        "average_7": demand[:, -SHORT_WINDOW:].mean(axis=1),
+        "average_28": demand[:, -LONG_WINDOW:].mean(axis=1),
+        "smoothed": smoothed,
+        "days_of_cover": cover,
+    }
+
+
+def _movements(rows, days, today):
+    start = today - timedelta(days=days - 1)
+    queryset = StockMovement.objects.filter(
+        created_at__gte=timezone.make_aware(datetime.combine(start, time.min)),
+        kind__in=OUTBOUND_KINDS,
+        quantity__lt=0,
+    )
+    warehouse_ids = set(rows[:, 1].tolist())
+    product_ids = set(rows[:, 2].tolist())
+    if len(warehouse_ids) <= MAX_IN_LIST:
+        queryset = queryset.filter(warehouse_id__in=warehouse_ids)
+    if len(product_ids) <= MAX_IN_LIST:
+        queryset = queryset.filter(product_id__in=product_ids)
+    aggregated = list(
+        queryset.annotate(day=TruncDate("created_at"))
+        .order_by()
+        .values("warehouse_id", "product_id", "day")
+        .annotate(outbound=-Sum("quantity"))
+        .values_list("warehouse_id", "product_id", "day", "outbound")
+    )
+    if not aggregated:
+        return np.zeros((0, 4), dtype=np.int64)
+    warehouse, product, day, outbound = zip(*aggregated)
+    day_index = (
+        np.array(day, dtype="datetime64[D]") - np.datetime64(start, "D")
+    ).astype(np.int64)
+    return np.column_stack([warehouse, product, day_index, outbound]).astype(np.int64)
+
+
+def forecast(rows, days=HISTORY_DAYS, alpha=ALPHA, today=None):
+    """
+    Forecast each inventory row in ``rows``, an iterable of
+    ``(inventory_id, warehouse_id, product_id, quantity)`` tuples. Returns
+    ``{inventory_id: {...}}`` with rounded statistics; ``days_of_cover`` is
+    ``None`` when there was no demand.
+    """
+    rows = np.array(list(rows), dtype=np.int64).reshape(-1, 4)
+    if not len(rows):
+        return {}
+    today = today or timezone.localdate()
+    demand = demand_matrix(rows, _movements(rows, days, today), days)
+    stats = compute(rows[:, 3].astype(np.float32), demand, alpha)
+    results = {}
+    for i, inventory_id in enumerate(rows[:, 0].tolist()):
+        cover = float(stats["days_of_cover"][i])
+        results[inventory_id] = {
+            "average_7": round(float(stats["average_7"][i]), 2),
+            "average_28": round(float(stats["average_28"][i]), 2),
+            "smoothed": round(float(stats["smoothed"][i]), 2),
+            "days_of_cover": None if np.isinf(cover) else round(cover, 1),
+        }
+    return results
+
+
+def attach(inventories, **kwargs):
+    """Set ``.forecast`` on loaded inventory objects."""
+    results = forecast(
+        ((i.id, i.warehouse_id, i.product_id, i.quantity) for i in inventories),
+        **kwargs,
+    )
+    for inventory in inventories:
+        inventory.forecast = results.get(inventory.id)
+    return inventories
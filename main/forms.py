@@ -1,5 +1,6 @@
 # forms.py
 from django import forms
+from .autocomplete import AutocompleteField
 from .models import MyUser, Warehouse, Product, Inventory
 
 
@@ -28,6 +29,15 @@ class WarehouseForm(forms.ModelForm):
         model = Warehouse
         fields = ["name", "location", "capacity"]
 
+    def clean_capacity(self):
+        capacity = self.cleaned_data["capacity"]
+        if capacity < self.instance.used_capacity:
+            raise forms.ValidationError(
+                f"Capacity cannot be below the {self.instance.used_capacity} "
+                "units stored"
+            )
+        return capacity
+
 
 class ProductForm(forms.ModelForm):
     class Meta:
@@ -36,9 +46,28 @@ class ProductForm(forms.ModelForm):
 
 
 class InventoryForm(forms.ModelForm):
+    warehouse = AutocompleteField("warehouses")
+    product = AutocompleteField("products")
+
     class Meta:
         model = Inventory
-        fields = ["warehouse", "product", "quantity"]
+        fields = ["warehouse", "product", "quantity", "reorder_point", "safety_stock"]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Optional, so a form that leaves them out keeps the current values.
+        for name in ("reorder_point", "safety_stock"):
+            self.fields[name].required = False
+
+    def clean_reorder_point(self):
+        return self.current_if_empty("reorder_point")
+
+    def clean_safety_stock(self):
+        return self.current_if_empty("safety_stock")
+
+    def current_if_empty(self, name):
+        value = self.cleaned_data[name]
+        return getattr(self.instance, name) if value is None else value
 
 
 class WarehouseFilterForm(forms.Form):
@@ -52,8 +81,11 @@ class ProductFilterForm(forms.Form):
 
 
 class InventoryFilterForm(forms.Form):
-    warehouse = forms.ModelChoiceField(queryset=Warehouse.objects.all(), required=False)
-    product = forms.ModelChoiceField(queryset=Product.objects.all(), required=False)
+    warehouse = AutocompleteField("warehouses", required=False)
+    product = AutocompleteField("products", required=False)
+    as_of = forms.CharField(
+        required=False, label="As of", help_text="YYYY-MM-DD or an ISO datetime"
+    )
 
 
 class UserFilterForm(forms.Form):
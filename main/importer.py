@@ -0,0 +1,152 @@
+# importer.py
+import csv
+import time
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import capacity, stock
+from .models import Inventory, Product, Warehouse
+
+CHUNK_SIZE = 5000
+REQUIRED_COLUMNS = ("sku", "warehouse", "quantity")
+AMBIGUOUS = object()
+
+
+def _warehouse_map():
+    mapping = {}
+    for pk, name in Warehouse.objects.values_list("id", "name").iterator():
+        mapping[name] = AMBIGUOUS if name in mapping else pk
+    return mapping
+
+
+def _existing(keys):
+    """
+    Map (warehouse_id, product_id) pairs of one chunk to their inventory id
+    and current quantity. The rows stay locked until the transaction ends,
+    so the quantities read are still current when the chunk is written.
+    """
+    candidates = Inventory.objects.filter(
+        warehouse_id__in={w for w, _ in keys},
+        product_id__in={p for _, p in keys},
+    )
+    stock.lock_inventory(candidates)
+    return {
+        (w, p): (pk, q)
+        for w, p, pk, q in candidates.values_list(
+            "warehouse_id", "product_id", "id", "quantity"
+        )
+        if (w, p) in keys
+    }
+
+
+@transaction.atomic
+def _write_chunk(chunk, reject):
+    existing = _existing(chunk.keys())
+
+    # Whole warehouses whose net change would not fit are rejected up front;
+    # use_capacity() still enforces the limit atomically when writing.
+    usage = {}
+    for (w, p), (quantity, _, _) in chunk.items():
+        usage[w] = usage.get(w, 0) + quantity - existing.get((w, p), (None, 0))[1]
+    free = capacity.free_capacity(usage.keys())
+    full = {w for w, delta in usage.items() if delta > 0 and delta > free.get(w, 0)}
+    for (w, p), (_, line_number, row) in list(chunk.items()):
+        if w in full:
+            reject(line_number, row, "Warehouse capacity exceeded")
+            del chunk[(w, p)]
+    chunk = {key: quantity for key, (quantity, _, _) in chunk.items()}
+
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    updates = [
+        (quantity, now, existing[key][0])
+        for key, quantity in chunk.items()
+        if key in existing and existing[key][1] != quantity
+    ]
+    changes = [
+        ((*key, existing[key][1]) if key in existing else None, (*key, quantity))
+        for key, quantity in chunk.items()
+    ]
+    creates = [
+        Inventory(warehouse_id=w, product_id=p, quantity=quantity)
+        for (w, p), quantity in chunk.items()
+        if (w, p) not in existing
+    ]
+    table = connection.ops.quote_name(Inventory._meta.db_table)
+    if updates:
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"UPDATE {table} SET quantity = %s, updated_at = %s WHERE id = %s",
+                updates,
+            )
+    Inventory.objects.bulk_create(creates, batch_size=1000)
+    stock.record_changes(changes, reference="import")
+    return len(creates), len(updates)
+
+
+def import_inventory(lines, chunk_size=CHUNK_SIZE, on_reject=None):
+    """
+    Upsert ``Inventory.quantity`` from a stock snapshot CSV with ``sku``,
+    ``warehouse`` (name) and ``quantity`` columns.
+
+    ``lines`` is any iterable of text lines, so files are read as a stream.
+    Lookup maps for SKUs and warehouse names are built once up front; rows
+    that cannot be resolved are passed to ``on_reject(line_number, row,
+    reason)`` and skipped. Returns throughput stats.
+    """
+    started = time.perf_counter()
+    reader = csv.DictReader(lines)
+    missing = [c for c in REQUIRED_COLUMNS if c not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+    products = dict(Product.objects.values_list("sku", "id").iterator())
+    warehouses = _warehouse_map()
+    stats = {"rows": 0, "created": 0, "updated": 0, "rejected": 0}
+
+    def reject(line_number, row, reason):
+        stats["rejected"] += 1
+        if on_reject:
+            on_reject(line_number, row, reason)
+
+    chunk = {}
+    for row in reader:
+        stats["rows"] += 1
+        line_number = reader.line_num
+        product_id = products.get((row["sku"] or "").strip())
+        warehouse_id = warehouses.get((row["warehouse"] or "").strip())
+        if product_id is None:
+            reject(line_number, row, "Unknown sku")
+            continue
+        if warehouse_id is None:
+            reject(line_number, row, "Unknown warehouse")
+            continue
+        if warehouse_id is AMBIGUOUS:
+            reject(line_number, row, "Ambiguous warehouse name")
+            continue
+        try:
+            quantity = int(row["quantity"])
+        except (TypeError, ValueError):
+            reject(line_number, row, "Quantity must be a whole number")
+            continue
+        if quantity < 0:
+            reject(line_number, row, "Quantity must not be negative")
+            continue
+
+        # A later line for the same pair replaces the earlier one.
+        chunk[(warehouse_id, product_id)] = (quantity, line_number, row)
+        if len(chunk) >= chunk_size:
+            created, updated = _write_chunk(chunk, reject)
+            stats["created"] += created
+            stats["updated"] += updated
+            chunk = {}
+    if chunk:
+        created, updated = _write_chunk(chunk, reject)
+        stats["created"] += created
+        stats["updated"] += updated
+
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    stats["rows_per_second"] = (
+        round(stats["rows"] / stats["seconds"]) if stats["seconds"] else stats["rows"]
+    )
+    return stats
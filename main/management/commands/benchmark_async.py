@@ -0,0 +1,219 @@
+import asyncio
+import io
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from main.models import MyUser
+
+SYNC_PATHS = [
+    "/warehouses/",
+    "/inventories/",
+    "/api/warehouses/",
+    "/api/inventory/",
+]
+ASYNC_PATHS = [
+    "/async/warehouses/",
+    "/async/inventories/",
+    "/async/api/warehouses/",
+    "/async/api/inventory/",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares throughput and latency of the sync views behind lab4/wsgi.py, "
+        "served by a pool of worker threads, with the async views behind "
+        "lab4/asgi.py on one event loop, under concurrent closed-loop clients. "
+        "The applications are called in-process, without a network server."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="WSGI worker threads; waiting clients queue for a free one",
+        )
+        parser.add_argument(
+            "--cold",
+            action="store_true",
+            help="Give every request a unique query string to bypass the page cache",
+        )
+        parser.add_argument("--user", default="benchmark@example.com")
+
+    def handle(self, *args, **options):
+        from lab4.asgi import application as asgi_app
+        from lab4.wsgi import application as wsgi_app
+
+        user = MyUser.objects.filter(email=options["user"]).first()
+        if user is None:
+            user = MyUser.objects.create_user(options["user"], "benchmark")
+        client = Client()
+        client.force_login(user)
+        session = client.cookies[settings.SESSION_COOKIE_NAME].value
+        cookie = f"{settings.SESSION_COOKIE_NAME}={session}"
+
+        for label, run, paths in (
+            ("WSGI", self.run_wsgi, SYNC_PATHS),
+            ("ASGI", self.run_asgi, ASYNC_PATHS),
+        ):
+            app = wsgi_app if label == "WSGI" else asgi_app
+            targets = self.targets(paths, options)
+            # One untimed pass warms imports, templates and the page cache.
+            run(app, [next(targets) for _ in paths], cookie, options, 1)
+            started = time.perf_counter()
+            results = run(
+                app,
+                [next(targets) for _ in range(options["requests"])],
+                cookie,
+                options,
+                options["concurrency"],
+            )
+            self.report(label, results, time.perf_counter() - started)
+
+    def targets(self, paths, options):
+        serial = count()
+        while True:
+            for path in paths:
+                query = f"_={next(serial)}" if options["cold"] else ""
+                yield path, query
+
+    def report(self, label, results, elapsed):
+        latencies = sorted(latency for _, latency in results)
+        errors = sum(1 for status, _ in results if status >= 400)
+        if errors == len(results):
+            raise CommandError(f"Every {label} request failed; is the data set up?")
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+        self.stdout.write(self.style.MIGRATE_HEADING(label))
+        self.stdout.write(
+            f"  {len(results)} requests in {elapsed:.2f}s "
+            f"({len(results) / elapsed:,.0f} req/s), {errors} errors"
+        )
+        self.stdout.write(
+            f"  latency p50 {percentile(0.5):.1f} ms, p99 {percentile(0.99):.1f} ms"
+        )
+
+    def run_wsgi(self, app, targets, cookie, options, concurrency):
+        # Clients hand requests to a fixed pool of worker threads, which
+        # serves them first come first served like a threaded server's
+        # accept queue, so latency includes the wait for a free worker.
+        pending = iter(targets)
+        lock = threading.Lock()
+        results = []
+
+        with ThreadPoolExecutor(options["workers"]) as workers:
+
+            def client():
+                while True:
+                    with lock:
+                        target = next(pending, None)
+                    if target is None:
+                        return
+                    started = time.perf_counter()
+                    status = workers.submit(
+                        self.call_wsgi, app, *target, cookie
+                    ).result()
+                    with lock:
+                        results.append((status, time.perf_counter() - started))
+
+            threads = [threading.Thread(target=client) for _ in range(concurrency)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return results
+
+    def call_wsgi(self, app, path, query, cookie):
+        environ = {
+            "REQUEST_METHOD": "GET",
+            "PATH_INFO": path,
+            "QUERY_STRING": query,
+            "SCRIPT_NAME": "",
+            "SERVER_NAME": "localhost",
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "HTTP_HOST": "localhost",
+            "HTTP_COOKIE": cookie,
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": io.BytesIO(),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        statuses = []
+
+        def start_response(status, headers, exc_info=None):
+            statuses.append(int(status.split()[0]))
+
+        body = app(environ, start_response)
+        try:
+            for _ in body:
+                pass
+        finally:
+            if hasattr(body, "close"):
+                body.close()
+        return statuses[0]
+
+    def run_asgi(self, app, targets, cookie, options, concurrency):
+        async def main():
+            pending = iter(targets)
+            results = []
+
+            async def client():
+                for target in pending:
+                    started = time.perf_counter()
+                    status = await self.call_asgi(app, *target, cookie)
+                    results.append((status, time.perf_counter() - started))
+
+            await asyncio.gather(*(client() for _ in range(concurrency)))
+            return results
+
+        return asyncio.run(main())
+
+    async def call_asgi(self, app, path, query, cookie):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [(b"host", b"localhost"), (b"cookie", cookie.encode())],
+            "server": ("localhost", 80),
+            "client": ("127.0.0.1", 0),
+        }
+        received = False
+        statuses = []
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            # The client never disconnects; Django cancels this once it has
+            # sent the response.
+            await asyncio.Future()
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                statuses.append(message["status"])
+
+        await app(scope, receive, send)
+        return statuses[0]
@@ -0,0 +1,62 @@
+import base64
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from main import tokens
+from main.models import MyUser
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares requests per second of API calls authenticated with HTTP "
+        "Basic (a password hash per request) and with an API token, with the "
+        "verified-token cache cold and warm."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=20)
+        parser.add_argument("--user", default="benchmark@example.com")
+        parser.add_argument("--password", default="benchmark")
+
+    def handle(self, *args, **options):
+        user = MyUser.objects.filter(email=options["user"]).first()
+        if user is None:
+            user = MyUser.objects.create_user(options["user"], options["password"])
+        basic = base64.b64encode(
+            f"{options['user']}:{options['password']}".encode()
+        ).decode()
+        token, key = tokens.issue(user, "benchmark_auth")
+        client = Client(SERVER_NAME="localhost")
+        url = reverse("api-root")
+
+        cases = [
+            ("Basic", f"Basic {basic}", False),
+            ("Token, cold cache", f"Token {key}", True),
+            ("Token, warm cache", f"Token {key}", False),
+        ]
+        # Basic requests are all slow; keep the slow-request log quiet.
+        try:
+            with override_settings(SLOW_REQUEST_SAMPLE_RATE=0):
+                for label, header, cold in cases:
+                    self.measure(client, url, label, header, cold, options["requests"])
+        finally:
+            token.delete()
+
+    def measure(self, client, url, label, header, cold, requests):
+        client.get(url, HTTP_AUTHORIZATION=header)  # Warm-up.
+        started = time.perf_counter()
+        for _ in range(requests):
+            if cold:
+                tokens.verified.clear()
+            response = client.get(url, HTTP_AUTHORIZATION=header)
+            if response.status_code != 200:
+                raise CommandError(f"{label}: HTTP {response.status_code}")
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{label:<20} {requests / elapsed:>10,.1f} req/s "
+            f"({elapsed / requests * 1000:.2f} ms per request)"
+        )
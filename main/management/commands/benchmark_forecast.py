@@ -0,0 +1,88 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from main import forecast
+from main.models import Inventory
+
+
+class Command(BaseCommand):
+    help = (
+        "Times the vectorized forecast on synthetic series, or with --database "
+        "on every inventory row in the database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--series", type=int, default=1_000_000)
+        parser.add_argument("--days", type=int, default=forecast.HISTORY_DAYS)
+        parser.add_argument(
+            "--density",
+            type=float,
+            default=0.3,
+            help="Share of series-days with any outbound movement",
+        )
+        parser.add_argument("--chunk-size", type=int, default=200_000)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--database", action="store_true")
+
+    def handle(self, *args, **options):
+        if options["database"]:
+            self.run_database(options)
+        else:
+            self.run_synthetic(options)
+
+    def run_synthetic(self, options):
+        rng = np.random.default_rng(options["seed"])
+        total, days = options["series"], options["days"]
+        scatter = compute = 0.0
+        for start in range(0, total, options["chunk_size"]):
+            count = min(options["chunk_size"], total - start)
+            # One warehouse per 1000 products, like the grid setup_test_data walks.
+            ids = np.arange(start, start + count, dtype=np.int64)
+            rows = np.column_stack(
+                [ids, ids // 1000, ids, rng.integers(0, 500, count)]
+            )
+            picked = rng.random((count, days)) < options["density"]
+            series, day = np.nonzero(picked)
+            movements = np.column_stack(
+                [
+                    rows[series, 1],
+                    rows[series, 2],
+                    day,
+                    rng.integers(1, 20, len(series)),
+                ]
+            )
+
+            started = time.perf_counter()
+            demand = forecast.demand_matrix(rows, movements, days)
+            scatter += time.perf_counter() - started
+            started = time.perf_counter()
+            forecast.compute(rows[:, 3].astype(np.float32), demand)
+            compute += time.perf_counter() - started
+
+        self.stdout.write(f"{total:,} series x {days} days")
+        self.stdout.write(f"  scatter movements: {scatter:.2f}s")
+        self.stdout.write(f"  statistics:        {compute:.2f}s")
+        self.stdout.write(
+            f"  total:             {scatter + compute:.2f}s "
+            f"({total / (scatter + compute):,.0f} series/s)"
+        )
+
+    def run_database(self, options):
+        rows = Inventory.objects.order_by("id").values_list(
+            "id", "warehouse_id", "product_id", "quantity"
+        )
+        total, started = 0, time.perf_counter()
+        chunk = []
+        for row in rows.iterator(chunk_size=options["chunk_size"]):
+            chunk.append(row)
+            if len(chunk) >= options["chunk_size"]:
+                total += len(forecast.forecast(chunk, days=options["days"]))
+                chunk = []
+        total += len(forecast.forecast(chunk, days=options["days"]))
+        elapsed = time.perf_counter() - started
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(
+            f"{total:,} inventory rows forecast in {elapsed:.2f}s ({rate:,.0f} rows/s)"
+        )
@@ -0,0 +1,84 @@
+import gzip
+import io
+import time
+
+import brotli
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from main import compression, fields
+from main.models import Inventory
+from main.renderers import (
+    ColumnarJSONParser,
+    ColumnarJSONRenderer,
+    MessagePackParser,
+    MessagePackRenderer,
+)
+from main.serializers import InventorySerializer
+
+FORMATS = [
+    ("json", JSONRenderer(), JSONParser()),
+    ("msgpack", MessagePackRenderer(), MessagePackParser()),
+    ("columnar", ColumnarJSONRenderer(), ColumnarJSONParser()),
+]
+ENCODINGS = [
+    ("identity", lambda body: body, lambda body: body),
+    ("gzip", lambda body: gzip.compress(body, 6), gzip.decompress),
+    (
+        "br",
+        lambda body: brotli.compress(body, quality=compression.BROTLI_QUALITY),
+        brotli.decompress,
+    ),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares payload size and encode/decode time of the API formats, "
+        "plain and compressed, on an inventory list from the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10_000)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument(
+            "--expand", action="store_true", help="Nest warehouse and product"
+        )
+
+    def handle(self, *args, **options):
+        context = {"expand": ["warehouse", "product"] if options["expand"] else []}
+        serializer = InventorySerializer(context=context)
+        queryset = Inventory.objects.order_by("id").select_related(*context["expand"])
+        rows = queryset.values(*fields.columns(serializer))[: options["rows"]]
+        data = fields.fast_data(serializer, rows)
+        if not data:
+            raise CommandError("No inventory rows; run setup_test_data first.")
+
+        self.stdout.write(
+            f"{len(data)} rows{' with expansions' if options['expand'] else ''}\n"
+            f"{'format':<20}{'bytes':>12}{'encode ms':>12}{'decode ms':>12}"
+        )
+        for name, renderer, parser in FORMATS:
+            for encoding, compress, decompress in ENCODINGS:
+
+                def encode():
+                    return compress(renderer.render(data))
+
+                def decode(body):
+                    return parser.parse(io.BytesIO(decompress(body)))
+
+                encode_time, body = self.best(encode, options["repeat"])
+                decode_time, _ = self.best(lambda: decode(body), options["repeat"])
+                self.stdout.write(
+                    f"{name + ' + ' + encoding:<20}{len(body):>12,}"
+                    f"{encode_time * 1000:>12.1f}{decode_time * 1000:>12.1f}"
+                )
+
+    def best(self, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = run()
+            timings.append(time.perf_counter() - started)
+        return min(timings), result
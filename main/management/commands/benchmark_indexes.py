@@ -0,0 +1,118 @@
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from types import SimpleNamespace
+
+from django.apps import apps as global_apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.migrations.executor import MigrationExecutor
+
+from main.models import Inventory, Product, Warehouse
+
+# The last migration before the inventory constraint and indexes.
+OLD_SCHEMA = ("main", "0006_updated_at")
+MODELS = ("Inventory", "Product", "Warehouse")
+
+
+class Command(BaseCommand):
+    help = (
+        "Shows query plans and timings of the main inventory lookups with the "
+        "current schema and with the schema from before 0007. Both run on a "
+        "scratch copy of the configured database, which is migrated back; the "
+        "configured database is only read. SQLite only."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=200)
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("The before/after comparison uses SQLite DDL.")
+        sample = Inventory.objects.order_by("id").first()
+        product = Product.objects.order_by("-price").first()
+        warehouse = Warehouse.objects.order_by("id").first()
+        if sample is None:
+            raise CommandError("No inventory rows; run setup_test_data first.")
+
+        # Queries get their models passed in, so the old schema is read
+        # through its historical models rather than the current ones.
+        queries = {
+            "pair lookup": lambda m: m.Inventory.objects.filter(
+                warehouse_id=sample.warehouse_id, product_id=sample.product_id
+            ),
+            "stock of a product": lambda m: m.Inventory.objects.filter(
+                product_id=sample.product_id
+            ).order_by("warehouse_id"),
+            "warehouse contents": lambda m: m.Inventory.objects.filter(
+                warehouse_id=sample.warehouse_id
+            ).order_by("product_id"),
+            "products by min price": lambda m: m.Product.objects.filter(
+                price__gte=product.price
+            ),
+            "warehouses at a location": lambda m: m.Warehouse.objects.filter(
+                location=warehouse.location
+            ),
+        }
+
+        with self.scratch_copy():
+            after = self.measure(queries, options["repeat"])
+            before = self.measure_old_schema(queries, options["repeat"])
+
+        for name in queries:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for label, results in (("before", before), ("after", after)):
+                elapsed, plan = results[name]
+                self.stdout.write(f"  {label}: {elapsed * 1000:.3f} ms/query")
+                for line in plan.splitlines():
+                    self.stdout.write(f"    {line}")
+
+    @contextmanager
+    def scratch_copy(self):
+        connection.ensure_connection()
+        with tempfile.TemporaryDirectory() as scratch:
+            path = str(Path(scratch) / "indexes.sqlite3")
+            target = sqlite3.connect(path)
+            try:
+                # The backup API copies a consistent snapshot, WAL included.
+                connection.connection.backup(target)
+            finally:
+                target.close()
+            names = {}
+            for alias in ("default", "replica"):
+                names[alias] = connections[alias].settings_dict["NAME"]
+                connections[alias].close()
+                connections[alias].settings_dict["NAME"] = path
+            try:
+                yield
+            finally:
+                for alias, name in names.items():
+                    connections[alias].close()
+                    connections[alias].settings_dict["NAME"] = name
+
+    def measure_old_schema(self, queries, repeat):
+        # SQLite can only rebuild tables with foreign key checks off. The
+        # copy is thrown away afterwards, so the migration is not undone.
+        executor = MigrationExecutor(connection)
+        connection.disable_constraint_checking()
+        try:
+            executor.migrate([OLD_SCHEMA])
+        finally:
+            connection.enable_constraint_checking()
+        old_apps = executor.loader.project_state(OLD_SCHEMA).apps
+        return self.measure(queries, repeat, old_apps)
+
+    def measure(self, queries, repeat, apps=global_apps):
+        models = SimpleNamespace(
+            **{name: apps.get_model("main", name) for name in MODELS}
+        )
+        results = {}
+        for name, build in queries.items():
+            plan = build(models).explain()
+            started = time.perf_counter()
+            for _ in range(repeat):
+                list(build(models))
+            results[name] = ((time.perf_counter() - started) / repeat, plan)
+        return results
@@ -0,0 +1,652 @@
+import io
+import json
+import re
+import time
+from collections import namedtuple
+from datetime import timedelta
+from itertools import count
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from django.utils import timezone
+
+from main.models import Inventory, MyUser, Product, StockMovement, Warehouse
+
+# Inventory rows at each scale, over a warehouse x product grid.
+SCALES = {
+    "1k": {"warehouses": 10, "products": 100, "inventories": 1_000},
+    "100k": {"warehouses": 100, "products": 1_000, "inventories": 100_000},
+    "1m": {"warehouses": 200, "products": 5_000, "inventories": 1_000_000},
+}
+# Routes left out on purpose: they end the session, need uploads or rewrite
+# every row, or belong to the admin.
+UNMEASURED = {
+    "logout": "ends the benchmark session",
+    "register": "creates users through the public form",
+    "login": "authenticates with a password, measured by the auth backend",
+    "inventory-import-csv": "needs a CSV upload; see import_inventory",
+    "reorderalert-evaluate": "rewrites every alert; see evaluate_reorder_points",
+    "warehouse-bulk": "batch writes; sized per request",
+    "product-bulk": "batch writes; sized per request",
+    "inventory-bulk": "batch writes; sized per request",
+    "apitoken-detail": "only accepts DELETE, which revokes the token",
+}
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries')
+
+# ``prepare``, if set, is called before each request and returns its path and
+# data, for writes that need a fresh object every time.
+Case = namedtuple(
+    "Case", "name route method path data prepare", defaults=("GET", "", None, None)
+)
+
+
+def _word(text):
+    """A word from ``text`` to filter on, as users would type it."""
+    return next((w for w in text.split() if w.isalpha() and len(w) > 2), text[:3])
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds deterministic datasets at each --scale into their own SQLite "
+        "files and measures latency, throughput and query counts of every "
+        "route. Results are written as JSON; with --baseline, fails if a "
+        "route got slower than --threshold or runs more queries. Writes are "
+        "rolled back, so repeated runs see the same data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scale", action="append", choices=list(SCALES), help="Default: 1k"
+        )
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--data-dir", default=settings.BASE_DIR / "benchmarks")
+        parser.add_argument(
+            "--reseed", action="store_true", help="Rebuild existing dataset files"
+        )
+        parser.add_argument(
+            "--output", default=settings.BASE_DIR / "benchmark-results.json"
+        )
+        parser.add_argument("--baseline", help="Earlier results to compare with")
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.25,
+            help="Allowed relative p50 slowdown before failing",
+        )
+        parser.add_argument("--route", action="append", help="Only these routes")
+
+    def handle(self, *args, **options):
+        results = {
+            "meta": {
+                "seed": options["seed"],
+                "repeat": options["repeat"],
+                "sqlite_profile": settings.SQLITE_PROFILE,
+                "started": timezone.now().isoformat(),
+            },
+            "scales": {},
+        }
+        # Measure the views, not the page cache in front of them, and keep
+        # the slow-request log out of the report.
+        dummy = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+        with override_settings(CACHES=dummy, SLOW_REQUEST_SAMPLE_RATE=0):
+            for scale in options["scale"] or ["1k"]:
+                self.use_dataset(scale, options)
+                results["scales"][scale] = self.measure(scale, options)
+
+        with open(options["output"], "w") as f:
+            json.dump(results, f, indent=2)
+        self.stdout.write(f"Results written to {options['output']}")
+        if options["baseline"]:
+            self.compare(results, options)
+
+    def use_dataset(self, scale, options):
+        data_dir = Path(options["data_dir"])
+        data_dir.mkdir(exist_ok=True)
+        path = str(data_dir / f"{scale}-seed{options['seed']}.sqlite3")
+        # Point both aliases at the dataset, the way the test runner swaps in
+        # its test database.
+        for alias in ("default", "replica"):
+            connections[alias].close()
+            connections[alias].settings_dict["NAME"] = path
+            settings.DATABASES[alias]["NAME"] = path
+
+        call_command("migrate", verbosity=0)
+        if options["reseed"] or not Warehouse.objects.exists():
+            self.stdout.write(f"Seeding {scale}...")
+            call_command(
+                "setup_test_data",
+                seed=options["seed"],
+                chunk_size=50_000,
+                stdout=self.stdout if options["verbosity"] > 1 else io.StringIO(),
+                **SCALES[scale],
+            )
+
+    def measure(self, scale, options):
+        user = MyUser.objects.filter(email="benchmark@example.com").first()
+        if user is None:
+            user = MyUser.objects.create_user(
+                "benchmark@example.com", "benchmark", is_admin=True
+            )
+        client = Client(SERVER_NAME="localhost")
+        client.force_login(user)
+
+        results = {}
+        cases = self.cases(user)
+        if options["route"]:
+            cases = [case for case in cases if case.route in options["route"]]
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{scale}: {len(cases)} cases"))
+        with transaction.atomic():
+            for case in cases:
+                results[case.name] = self.run_case(client, case, options["repeat"])
+                self.stdout.write(
+                    f"  {case.name:<45} p50 {results[case.name]['p50_ms']:8.2f} ms"
+                    f"  {results[case.name]['queries']:>4} queries"
+                )
+            transaction.set_rollback(True)
+
+        covered = {case.route for case in cases}
+        return {
+            "cases": results,
+            "not_measured": {
+                name: UNMEASURED.get(name, "no case defined")
+                for name in sorted(self.route_names() - covered)
+                if not options["route"]
+            },
+        }
+
+    def run_case(self, client, case, repeat):
+        latencies, queries, status = [], 0, None
+        for i in range(repeat + 1):
+            path, data = case.prepare() if case.prepare else (case.path, case.data)
+            started = time.perf_counter()
+            if case.method == "POST" and isinstance(data, (list, dict)) and (
+                case.route.endswith("api") or case.route.startswith("transfer")
+            ):
+                response = client.post(
+                    path, json.dumps(data), content_type="application/json"
+                )
+            elif case.method == "POST":
+                response = client.post(path, data or {})
+            else:
+                response = client.get(path, data or {})
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+            elapsed = time.perf_counter() - started
+            if i == 0:
+                continue  # Warm-up: imports, templates, first connection.
+            latencies.append(elapsed * 1000)
+            status = response.status_code
+            match = SERVER_TIMING_QUERIES.search(response.get("Server-Timing", ""))
+            queries = max(queries, int(match.group(1)) if match else 0)
+        if status >= 400:
+            raise CommandError(f"{case.name} answered {status}")
+
+        latencies.sort()
+        return {
+            "route": case.route,
+            "status": status,
+            "p50_ms": latencies[len(latencies) // 2],
+            "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+            "mean_ms": sum(latencies) / len(latencies),
+            "throughput_rps": len(latencies) / (sum(latencies) / 1000),
+            "queries": queries,
+        }
+
+    def route_names(self):
+        def walk(patterns, namespace=None):
+            for pattern in patterns:
+                if isinstance(pattern, URLResolver):
+                    if pattern.namespace != "admin":
+                        yield from walk(pattern.url_patterns, pattern.namespace)
+                elif isinstance(pattern, URLPattern) and pattern.name and not namespace:
+                    yield pattern.name
+
+        return set(walk(get_resolver().url_patterns))
+
+    def cases(self, user):
+        warehouse = Warehouse.objects.order_by("id").first()
+        product = Product.objects.order_by("id").first()
+        inventory = Inventory.objects.select_related("warehouse").order_by("id").first()
+        target = Warehouse.objects.exclude(id=inventory.warehouse_id).order_by("id")[0]
+        movement = StockMovement.objects.order_by("id").first()
+        yesterday = str(timezone.localdate() - timedelta(days=1))
+        serial = count()
+
+        def unique(prefix):
+            return f"{prefix}-{next(serial)}"
+
+        def fresh_warehouse():
+            return Warehouse.objects.create(
+                name=unique("Bench"), location="Bench", capacity=1000
+            )
+
+        def fresh_product():
+            return Product.objects.create(
+                name=unique("Bench"), description="", price=1, sku=unique("BENCH")
+            )
+
+        def fresh_inventory():
+            return Inventory.objects.create(
+                warehouse=fresh_warehouse(), product=product, quantity=0
+            )
+
+        warehouse_form = {
+            "name": warehouse.name,
+            "location": warehouse.location,
+            "capacity": warehouse.capacity,
+        }
+        product_form = {
+            "name": product.name,
+            "description": product.description,
+            "price": product.price,
+            "sku": product.sku,
+        }
+        inventory_form = {
+            "warehouse": inventory.warehouse_id,
+            "product": inventory.product_id,
+            "quantity": inventory.quantity,
+        }
+        w, p, i = {"pk": warehouse.id}, {"pk": product.id}, {"pk": inventory.id}
+
+        cases = [
+            Case("home", "home", path=reverse("home")),
+            Case("warehouse_list", "warehouse_list", path=reverse("warehouse_list")),
+            Case(
+                "warehouse_list?name",
+                "warehouse_list",
+                path=reverse("warehouse_list"),
+                data={"name": _word(warehouse.name)},
+            ),
+            Case(
+                "warehouse_list?location",
+                "warehouse_list",
+                path=reverse("warehouse_list"),
+                data={"location": _word(warehouse.location)},
+            ),
+            Case("product_list", "product_list", path=reverse("product_list")),
+            Case(
+                "product_list?name",
+                "product_list",
+                path=reverse("product_list"),
+                data={"name": _word(product.name)},
+            ),
+            Case(
+                "product_list?min_price",
+                "product_list",
+                path=reverse("product_list"),
+                data={"min_price": "500"},
+            ),
+            Case("inventory_list", "inventory_list", path=reverse("inventory_list")),
+            Case(
+                "inventory_list?warehouse",
+                "inventory_list",
+                path=reverse("inventory_list"),
+                data={"warehouse": warehouse.id},
+            ),
+            Case(
+                "inventory_list?product",
+                "inventory_list",
+                path=reverse("inventory_list"),
+                data={"product": product.id},
+            ),
+            Case(
+                "inventory_list?as_of",
+                "inventory_list",
+                path=reverse("inventory_list"),
+                data={"as_of": yesterday},
+            ),
+            Case("user_list", "user_list", path=reverse("user_list")),
+            Case(
+                "user_list?email",
+                "user_list",
+                path=reverse("user_list"),
+                data={"email": "bench"},
+            ),
+            Case(
+                "user_list?is_admin",
+                "user_list",
+                path=reverse("user_list"),
+                data={"is_admin": "on"},
+            ),
+            Case(
+                "warehouse_detail",
+                "warehouse_detail",
+                path=reverse("warehouse_detail", kwargs=w),
+            ),
+            Case(
+                "product_detail",
+                "product_detail",
+                path=reverse("product_detail", kwargs=p),
+            ),
+            Case(
+                "inventory_detail",
+                "inventory_detail",
+                path=reverse("inventory_detail", kwargs=i),
+            ),
+            Case(
+                "user_detail",
+                "user_detail",
+                path=reverse("user_detail", kwargs={"pk": user.id}),
+            ),
+            Case("add_user", "add_user", path=reverse("add_user")),
+            Case("add_warehouse", "add_warehouse", path=reverse("add_warehouse")),
+            Case("add_product", "add_product", path=reverse("add_product")),
+            Case("add_inventory", "add_inventory", path=reverse("add_inventory")),
+            Case(
+                "add_user POST",
+                "add_user",
+                "POST",
+                prepare=lambda: (
+                    reverse("add_user"),
+                    {
+                        "email": f"{unique('bench')}@example.com",
+                        "password": "benchmark",
+                    },
+                ),
+            ),
+            Case(
+                "add_warehouse POST",
+                "add_warehouse",
+                "POST",
+                prepare=lambda: (
+                    reverse("add_warehouse"),
+                    {**warehouse_form, "name": unique("Bench")},
+                ),
+            ),
+            Case(
+                "add_product POST",
+                "add_product",
+                "POST",
+                prepare=lambda: (
+                    reverse("add_product"),
+                    {**product_form, "sku": unique("BENCH")},
+                ),
+            ),
+            Case(
+                "add_inventory POST",
+                "add_inventory",
+                "POST",
+                prepare=lambda: (
+                    reverse("add_inventory"),
+                    {**inventory_form, "warehouse": fresh_warehouse().id},
+                ),
+            ),
+            Case(
+                "edit_user",
+                "edit_user",
+                path=reverse("edit_user", kwargs={"user_id": user.id}),
+            ),
+            Case(
+                "edit_warehouse",
+                "edit_warehouse",
+                path=reverse("edit_warehouse", kwargs={"warehouse_id": warehouse.id}),
+            ),
+            Case(
+                "edit_product",
+                "edit_product",
+                path=reverse("edit_product", kwargs={"product_id": product.id}),
+            ),
+            Case(
+                "edit_inventory",
+                "edit_inventory",
+                path=reverse("edit_inventory", kwargs={"inventory_id": inventory.id}),
+            ),
+            Case(
+                "edit_warehouse POST",
+                "edit_warehouse",
+                "POST",
+                reverse("edit_warehouse", kwargs={"warehouse_id": warehouse.id}),
+                warehouse_form,
+            ),
+            Case(
+                "edit_product POST",
+                "edit_product",
+                "POST",
+                reverse("edit_product", kwargs={"product_id": product.id}),
+                product_form,
+            ),
+            Case(
+                "edit_inventory POST",
+                "edit_inventory",
+                "POST",
+                reverse("edit_inventory", kwargs={"inventory_id": inventory.id}),
+                inventory_form,
+            ),
+            Case(
+                "delete_user",
+                "delete_user",
+                path=reverse("delete_user", kwargs={"user_id": user.id}),
+            ),
+            Case(
+                "delete_warehouse",
+                "delete_warehouse",
+                path=reverse("delete_warehouse", kwargs={"warehouse_id": warehouse.id}),
+            ),
+            Case(
+                "delete_product",
+                "delete_product",
+                path=reverse("delete_product", kwargs={"product_id": product.id}),
+            ),
+            Case(
+                "delete_inventory",
+                "delete_inventory",
+                path=reverse("delete_inventory", kwargs={"inventory_id": inventory.id}),
+            ),
+            Case(
+                "delete_user POST",
+                "delete_user",
+                "POST",
+                prepare=lambda: (
+                    reverse(
+                        "delete_user",
+                        kwargs={
+                            "user_id": MyUser.objects.create_user(
+                                f"{unique('bench')}@example.com", "benchmark"
+                            ).id
+                        },
+                    ),
+                    None,
+                ),
+            ),
+            Case(
+                "delete_warehouse POST",
+                "delete_warehouse",
+                "POST",
+                prepare=lambda: (
+                    reverse(
+                        "delete_warehouse",
+                        kwargs={"warehouse_id": fresh_warehouse().id},
+                    ),
+                    None,
+                ),
+            ),
+            Case(
+                "delete_product POST",
+                "delete_product",
+                "POST",
+                prepare=lambda: (
+                    reverse(
+                        "delete_product", kwargs={"product_id": fresh_product().id}
+                    ),
+                    None,
+                ),
+            ),
+            Case(
+                "delete_inventory POST",
+                "delete_inventory",
+                "POST",
+                prepare=lambda: (
+                    reverse(
+                        "delete_inventory",
+                        kwargs={"inventory_id": fresh_inventory().id},
+                    ),
+                    None,
+                ),
+            ),
+            Case(
+                "export warehouses",
+                "export_data",
+                path=reverse("export_data", kwargs={"kind": "warehouses"}),
+            ),
+            Case(
+                "export inventory?warehouse",
+                "export_data",
+                path=reverse("export_data", kwargs={"kind": "inventory"}),
+                data={"warehouse": warehouse.id},
+            ),
+            Case("metrics", "metrics", path=reverse("metrics")),
+            Case("api-root", "api-root", path=reverse("api-root")),
+            Case("/api/warehouses/", "warehouse-list", path=reverse("warehouse-list")),
+            Case(
+                "/api/warehouses/?name",
+                "warehouse-list",
+                path=reverse("warehouse-list"),
+                data={"name": _word(warehouse.name)},
+            ),
+            Case(
+                "/api/warehouses/<pk>/",
+                "warehouse-detail",
+                path=reverse("warehouse-detail", kwargs=w),
+            ),
+            Case("/api/products/", "product-list", path=reverse("product-list")),
+            Case(
+                "/api/products/?fields",
+                "product-list",
+                path=reverse("product-list"),
+                data={"fields": "id,name,sku"},
+            ),
+            Case(
+                "/api/products/<pk>/",
+                "product-detail",
+                path=reverse("product-detail", kwargs=p),
+            ),
+            Case("/api/inventory/", "inventory-list", path=reverse("inventory-list")),
+            Case(
+                "/api/inventory/?expand",
+                "inventory-list",
+                path=reverse("inventory-list"),
+                data={"expand": "warehouse,product"},
+            ),
+            Case(
+                "/api/inventory/?format=msgpack",
+                "inventory-list",
+                path=reverse("inventory-list"),
+                data={"format": "msgpack"},
+            ),
+            Case(
+                "/api/inventory/?format=columnar",
+                "inventory-list",
+                path=reverse("inventory-list"),
+                data={"format": "columnar"},
+            ),
+            Case(
+                "/api/inventory/<pk>/",
+                "inventory-detail",
+                path=reverse("inventory-detail", kwargs=i),
+            ),
+            Case(
+                "/api/inventory/?as_of",
+                "inventory-list",
+                path=reverse("inventory-list"),
+                data={"as_of": yesterday, "warehouse": warehouse.id},
+            ),
+            Case(
+                "/api/movements/",
+                "stockmovement-list",
+                path=reverse("stockmovement-list"),
+            ),
+            Case(
+                "/api/movements/<pk>/",
+                "stockmovement-detail",
+                path=reverse("stockmovement-detail", kwargs={"pk": movement.id}),
+            ),
+            Case("/api/tokens/", "apitoken-list", path=reverse("apitoken-list")),
+            Case(
+                "/api/reorder-alerts/",
+                "reorderalert-list",
+                path=reverse("reorderalert-list"),
+            ),
+            Case(
+                "/api/search/",
+                "search_api",
+                path=reverse("search_api"),
+                data={"q": _word(product.name)},
+            ),
+            Case(
+                "/api/forecast/?warehouse",
+                "forecast_api",
+                path=reverse("forecast_api"),
+                data={"warehouse": warehouse.id},
+            ),
+            Case(
+                "/api/autocomplete/products/",
+                "autocomplete_api",
+                path=reverse("autocomplete_api", kwargs={"kind": "products"}),
+                data={"q": _word(product.name)},
+            ),
+            Case(
+                "/api/cache/stats/",
+                "cache_stats_api",
+                path=reverse("cache_stats_api"),
+            ),
+            Case(
+                "/api/transfers/ POST",
+                "transfer_api",
+                "POST",
+                reverse("transfer_api"),
+                {
+                    "product": inventory.product_id,
+                    "from_warehouse": inventory.warehouse_id,
+                    "to_warehouse": target.id,
+                    "quantity": 1,
+                },
+            ),
+        ]
+        async_kwargs = {
+            "async_warehouse_detail": w,
+            "async_product_detail": p,
+            "async_inventory_detail": i,
+            "async_api_warehouse_detail": w,
+            "async_api_product_detail": p,
+            "async_api_inventory_detail": i,
+        }
+        for name in sorted(self.route_names()):
+            if name.startswith("async_"):
+                path = reverse(name, kwargs=async_kwargs.get(name))
+                cases.append(Case(name, name, path=path))
+        return cases
+
+    def compare(self, results, options):
+        with open(options["baseline"]) as f:
+            baseline = json.load(f)
+        regressions = []
+        for scale, measured in results["scales"].items():
+            before = baseline.get("scales", {}).get(scale, {}).get("cases", {})
+            for name, now in measured["cases"].items():
+                then = before.get(name)
+                if then is None:
+                    continue
+                if now["queries"] > then["queries"]:
+                    regressions.append(
+                        f"{scale} {name}: {then['queries']} -> {now['queries']} queries"
+                    )
+                # Sub-millisecond differences are noise, whatever the ratio.
+                limit = then["p50_ms"] * (1 + options["threshold"])
+                if now["p50_ms"] > limit and now["p50_ms"] - then["p50_ms"] > 1:
+                    regressions.append(
+                        f"{scale} {name}: p50 {then['p50_ms']:.2f} -> "
+                        f"{now['p50_ms']:.2f} ms"
+                    )
+        if regressions:
+            raise CommandError(
+                "Regressions against the baseline:\n  " + "\n  ".join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
@@ -0,0 +1,75 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main import fields
+from main.models import Inventory, Product
+from main.serializers import InventorySerializer, ProductSerializer
+
+CASES = [
+    ("products", Product, ProductSerializer, {}),
+    ("inventory", Inventory, InventorySerializer, {}),
+    (
+        "inventory ?fields=id,quantity",
+        Inventory,
+        InventorySerializer,
+        {"fields": ["id", "quantity"]},
+    ),
+    (
+        "inventory ?expand=warehouse,product",
+        Inventory,
+        InventorySerializer,
+        {"expand": ["warehouse", "product"]},
+    ),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the API's two list paths on rows from the database: model "
+        "instances through ModelSerializer, and values() rows through "
+        "fields.fast_data. Times include the query."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=10_000)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        if not Inventory.objects.exists():
+            raise CommandError("No inventory rows; run setup_test_data first.")
+        for label, model, serializer_class, context in CASES:
+            serializer = serializer_class(context=context)
+            queryset = model.objects.order_by("id")
+            expand = context.get("expand")
+            if expand:
+                queryset = queryset.select_related(*expand)
+            columns = ["id", *fields.columns(serializer)]
+            model_fields = {f.name for f in model._meta.concrete_fields}
+            only = [c for c in columns if c.split("__")[0] in model_fields]
+
+            def instances():
+                rows = list(queryset.only(*only)[: options["rows"]])
+                return serializer_class(rows, many=True, context=context).data
+
+            def values():
+                rows = queryset.values(*columns)[: options["rows"]]
+                return fields.fast_data(serializer, rows)
+
+            slow, count = self.best(instances, options["repeat"])
+            fast, _ = self.best(values, options["repeat"])
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{label} ({count} rows)"))
+            self.stdout.write(
+                f"  ModelSerializer  {slow * 1000:8.1f} ms  "
+                f"({count / slow:,.0f} rows/s)\n"
+                f"  values() path    {fast * 1000:8.1f} ms  "
+                f"({count / fast:,.0f} rows/s), {slow / fast:.1f}x faster"
+            )
+
+    def best(self, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            data = run()
+            timings.append(time.perf_counter() - started)
+        return min(timings), len(data)
@@ -0,0 +1,190 @@
+import json
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connections
+from django.test import Client
+from django.urls import reverse
+
+from main.models import Inventory, MyUser
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures write throughput under contention: concurrent threads post "
+        "the edit_inventory form for a small set of hot rows. Each SQLite "
+        "profile from settings.SQLITE_PROFILES runs in its own process, on a "
+        "fresh scratch copy of the configured database, which is left as it is."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--writes", type=int, default=100, help="Per thread")
+        parser.add_argument("--rows", type=int, default=20, help="Hot rows edited")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--profile",
+            action="append",
+            choices=sorted(settings.SQLITE_PROFILES),
+            help="Profiles to compare, in order; defaults to all of them",
+        )
+        parser.add_argument(
+            "--run", action="store_true", help="Measure the current profile only"
+        )
+        parser.add_argument(
+            "--database",
+            help="With --run, the scratch copy of the database to write to",
+        )
+
+    def handle(self, *args, **options):
+        if options["run"]:
+            self.use_database(options["database"])
+            self.stdout.write(json.dumps(self.measure(options)))
+            return
+
+        arguments = [
+            f"--threads={options['threads']}",
+            f"--writes={options['writes']}",
+            f"--rows={options['rows']}",
+            f"--seed={options['seed']}",
+        ]
+        with tempfile.TemporaryDirectory() as scratch:
+            for profile in options["profile"] or sorted(settings.SQLITE_PROFILES):
+                # A fresh copy each time, so every profile starts from the
+                # same rows.
+                path = Path(scratch) / f"{profile}.sqlite3"
+                self.copy_database(path)
+                process = subprocess.run(
+                    [
+                        sys.executable,
+                        str(settings.BASE_DIR / "manage.py"),
+                        "benchmark_sqlite",
+                        "--run",
+                        f"--database={path}",
+                        *arguments,
+                    ],
+                    env={**os.environ, "SQLITE_PROFILE": profile},
+                    capture_output=True,
+                    text=True,
+                )
+                if process.returncode:
+                    raise CommandError(process.stderr)
+                self.report(profile, json.loads(process.stdout.splitlines()[-1]))
+
+    def copy_database(self, path):
+        connection = connections["default"]
+        connection.ensure_connection()
+        target = sqlite3.connect(path)
+        try:
+            # The backup API copies a consistent snapshot, WAL included.
+            connection.connection.backup(target)
+        finally:
+            target.close()
+
+    def use_database(self, path):
+        if not path:
+            raise CommandError("--run needs --database, a scratch copy to write to.")
+        configured = Path(settings.DATABASES["default"]["NAME"])
+        if Path(path).resolve() == configured.resolve():
+            raise CommandError("Refusing to write to the configured database.")
+        for alias in ("default", "replica"):
+            connections[alias].close()
+            connections[alias].settings_dict["NAME"] = path
+            settings.DATABASES[alias]["NAME"] = path
+
+    def report(self, profile, result):
+        self.stdout.write(self.style.MIGRATE_HEADING(profile))
+        self.stdout.write(
+            f"  {result['saved']} of {result['attempts']} writes saved in "
+            f"{result['elapsed']:.2f}s ({result['saved'] / result['elapsed']:,.0f}"
+            f"/s), {result['locked']} 'database is locked' errors, "
+            f"{result['rejected']} rejected by the form, {result['failed']} failed"
+        )
+        self.stdout.write(
+            f"  latency p50 {result['p50']:.1f} ms, p99 {result['p99']:.1f} ms"
+        )
+
+    def measure(self, options):
+        rows = list(
+            Inventory.objects.order_by("id").values(
+                "id", "warehouse_id", "product_id", "quantity"
+            )[: options["rows"]]
+        )
+        if not rows:
+            raise CommandError("No inventory rows; run setup_test_data first.")
+        user = MyUser.objects.filter(email="benchmark@example.com").first()
+        if user is None:
+            user = MyUser.objects.create_user("benchmark@example.com", "benchmark")
+        clients = []
+        for _ in range(options["threads"]):
+            client = Client(SERVER_NAME="localhost")
+            client.force_login(user)
+            clients.append(client)
+        close_old_connections()
+
+        lock = threading.Lock()
+        latencies = []
+        outcomes = {"saved": 0, "rejected": 0, "locked": 0, "failed": 0}
+
+        def writer(client, seed):
+            rng = random.Random(seed)
+            for _ in range(options["writes"]):
+                row = rng.choice(rows)
+                data = {
+                    "warehouse": row["warehouse_id"],
+                    "product": row["product_id"],
+                    "quantity": row["quantity"] + rng.randint(0, 1),
+                }
+                url = reverse("edit_inventory", args=[row["id"]])
+                started = time.perf_counter()
+                # The test client skips the request signals that open and
+                # close connections, so run them as a server would.
+                close_old_connections()
+                try:
+                    response = client.post(url, data)
+                    outcome = {302: "saved", 200: "rejected"}.get(
+                        response.status_code, "failed"
+                    )
+                except OperationalError as e:
+                    if "locked" not in str(e):
+                        raise
+                    outcome = "locked"
+                finally:
+                    close_old_connections()
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+                    outcomes[outcome] += 1
+            connections.close_all()
+
+        threads = [
+            threading.Thread(target=writer, args=(client, options["seed"] + i))
+            for i, client in enumerate(clients)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+        return {
+            "attempts": len(latencies),
+            "elapsed": elapsed,
+            "p50": percentile(0.5),
+            "p99": percentile(0.99),
+            **outcomes,
+        }
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from main import stock
+
+
+class Command(BaseCommand):
+    help = (
+        "Merges inventory rows sharing a warehouse and product by summing their "
+        "quantities. Run before migrating to the unique constraint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Only count the duplicates"
+        )
+
+    def handle(self, *args, **options):
+        pairs, removed = stock.merge_duplicates(
+            chunk_size=options["chunk_size"], dry_run=options["dry_run"]
+        )
+        if not pairs:
+            self.stdout.write(self.style.SUCCESS("No duplicate inventory rows."))
+        elif options["dry_run"]:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"{pairs} pairs have duplicates; {removed} rows would be merged."
+                )
+            )
+        else:
+            message = f"Merged {removed} duplicate rows into {pairs} pairs."
+            self.stdout.write(self.style.SUCCESS(message))
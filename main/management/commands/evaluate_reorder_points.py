@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from main import reorder
+
+
+class Command(BaseCommand):
+    help = "Recomputes the low-stock alerts from reorder points and recent demand"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--window-days",
+            type=int,
+            default=reorder.WINDOW_DAYS,
+            help="How many days of movements to average demand over",
+        )
+        parser.add_argument(
+            "--cover-days",
+            type=int,
+            default=reorder.COVER_DAYS,
+            help="How many days of demand a suggested order should cover",
+        )
+
+    def handle(self, *args, **options):
+        count = reorder.evaluate(options["window_days"], options["cover_days"])
+        self.stdout.write(self.style.SUCCESS(f"{count} pairs are low on stock."))
@@ -0,0 +1,51 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main import export
+from main.filters import InvalidFilter
+
+
+class Command(BaseCommand):
+    help = "Streams inventory, products or warehouses to CSV or NDJSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=sorted(export.EXPORTS))
+        parser.add_argument("--format", choices=sorted(export.FORMATS), default="csv")
+        parser.add_argument("--gzip", action="store_true")
+        parser.add_argument("--output", help="File to write to, defaults to stdout")
+        parser.add_argument("--warehouse", help="Only rows for this warehouse id")
+        parser.add_argument("--product", help="Only rows for this product id")
+        parser.add_argument("--name")
+        parser.add_argument("--location")
+        parser.add_argument("--min-price", dest="min_price")
+
+    def handle(self, *args, **options):
+        params = {
+            key: options[key]
+            for key in ("warehouse", "product", "name", "location", "min_price")
+            if options[key]
+        }
+        started = time.perf_counter()
+        try:
+            blocks = export.stream(
+                options["kind"], params, options["format"], options["gzip"]
+            )
+        except InvalidFilter as e:
+            raise CommandError(
+                "; ".join(
+                    f"{name}: {' '.join(errors)}" for name, errors in e.errors.items()
+                )
+            )
+        out = open(options["output"], "wb") if options["output"] else sys.stdout.buffer
+        written = 0
+        try:
+            for block in blocks:
+                out.write(block)
+                written += len(block)
+        finally:
+            if options["output"]:
+                out.close()
+        elapsed = time.perf_counter() - started
+        self.stderr.write(f"Wrote {written:,} bytes in {elapsed:.2f}s")
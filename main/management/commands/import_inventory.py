@@ -0,0 +1,48 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main import importer
+
+
+class Command(BaseCommand):
+    help = "Upserts inventory quantities from a sku,warehouse,quantity CSV file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--chunk-size", type=int, default=importer.CHUNK_SIZE)
+        parser.add_argument(
+            "--rejects",
+            default="rejected.csv",
+            help="Where to write rows that could not be imported",
+        )
+
+    def handle(self, *args, **options):
+        with open(options["path"], newline="", encoding="utf-8-sig") as source, open(
+            options["rejects"], "w", newline=""
+        ) as rejects:
+            writer = csv.writer(rejects)
+            writer.writerow(["line", "sku", "warehouse", "quantity", "reason"])
+
+            def on_reject(line_number, row, reason):
+                writer.writerow(
+                    [line_number, row["sku"], row["warehouse"], row["quantity"], reason]
+                )
+
+            try:
+                stats = importer.import_inventory(
+                    source, options["chunk_size"], on_reject
+                )
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{stats['rows']} rows in {stats['seconds']}s "
+                f"({stats['rows_per_second']:,} rows/s): "
+                f"{stats['created']} created, {stats['updated']} updated, "
+                f"{stats['rejected']} rejected"
+            )
+        )
+        if stats["rejected"]:
+            self.stdout.write(f"Rejected rows written to {options['rejects']}")
@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from main import tokens
+from main.models import MyUser
+
+
+class Command(BaseCommand):
+    help = (
+        "Issues an API token for a user, e.g. for a scanner. The key is "
+        "printed once; only its digest is stored. Revoke it with "
+        "DELETE /api/tokens/<id>/."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("email")
+        parser.add_argument("--name", default="")
+        parser.add_argument("--days", type=int, help="Expire after this many days")
+
+    def handle(self, *args, **options):
+        user = MyUser.objects.filter(email=options["email"]).first()
+        if user is None:
+            raise CommandError(f"No user {options['email']}")
+        expires_at = None
+        if options["days"]:
+            expires_at = timezone.now() + timedelta(days=options["days"])
+        token, key = tokens.issue(user, options["name"], expires_at)
+        self.stdout.write(f"Token {token.id} for {user}: {key}")
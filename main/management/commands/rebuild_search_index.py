@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from main import search
+from main.models import Product, Warehouse
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the full-text search index for products and warehouses"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=5000)
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        if not search.is_available():
+            self.stdout.write("Full-text search needs SQLite FTS5, nothing to do.")
+            return
+        total = search.rebuild([Product, Warehouse], options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} rows."))
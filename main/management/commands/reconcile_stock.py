@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from main import stock
+
+
+class Command(BaseCommand):
+    help = "Recomputes inventory balances from the stock movement ledger"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fix", action="store_true", help="Overwrite drifted balances"
+        )
+        parser.add_argument("--chunk-size", type=int, default=5000)
+        parser.add_argument(
+            "--show", type=int, default=20, help="How many drifted pairs to list"
+        )
+
+    def handle(self, *args, **options):
+        drift = stock.reconcile(options["fix"], options["chunk_size"])
+        if not drift:
+            self.stdout.write(self.style.SUCCESS("All balances match the ledger."))
+            return
+
+        for warehouse_id, product_id, balance, total in drift[: options["show"]]:
+            balance = "missing" if balance is None else balance
+            self.stdout.write(
+                f"  warehouse {warehouse_id}, product {product_id}: "
+                f"balance {balance}, ledger {total}"
+            )
+        message = f"{len(drift)} balances drifted from the ledger"
+        if options["fix"]:
+            self.stdout.write(self.style.SUCCESS(f"{message}, fixed."))
+        else:
+            self.stdout.write(self.style.WARNING(f"{message}. Run with --fix."))
@@ -1,33 +1,195 @@
-# Create test data
-from main.factories import InventoryFactory, ProductFactory, WarehouseFactory
-from main.models import Inventory, Product, Warehouse
+import math
+import random
+import time
 
-warehouse = WarehouseFactory()
-product = ProductFactory()
-inventory = InventoryFactory(warehouse=warehouse, product=product)
-
-
-from django.db import transaction
 from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from faker import Faker
 
-
-NUM_WAREHOUSES = 5
-NUM_PRODUCTS = 10
-NUM_INVENTORIES = 15
+from main import capacity, search, stock
+from main.models import (
+    Inventory,
+    InventorySnapshot,
+    InventorySnapshotRow,
+    Product,
+    ReorderAlert,
+    StockMovement,
+    Warehouse,
+)
 
 
 class Command(BaseCommand):
     help = "Generates test data"
 
-    @transaction.atomic
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument("--warehouses", type=int, default=5)
+        parser.add_argument("--products", type=int, default=10)
+        parser.add_argument("--inventories", type=int, default=15)
+        parser.add_argument("--seed", type=int, default=None)
+        parser.add_argument("--chunk-size", type=int, default=10000)
+        parser.add_argument(
+            "--no-search-index",
+            action="store_true",
+            help="Skip rebuilding the full-text search index afterwards",
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.fake = Faker()
+        self.fake.seed_instance(options["seed"])
+        # Faker is slow per call, so draw small pools once and combine them.
+        self.companies = [self.fake.company() for _ in range(500)]
+        self.cities = [self.fake.city() for _ in range(500)]
+        self.phrases = [self.fake.catch_phrase() for _ in range(2000)]
+        self.paragraphs = [self.fake.paragraph() for _ in range(200)]
+        chunk_size = options["chunk_size"]
+        # Leave each warehouse room for its share of inventory rows, which
+        # hold 500 units on average.
+        self.capacity_scale = max(
+            1, options["inventories"] // max(1, options["warehouses"])
+        )
+
         self.stdout.write("Deleting old data...")
-        models = [Warehouse, Product, Inventory]
-        for m in models:
-            m.objects.all().delete()
+        # Children first: _raw_delete() skips cascades.
+        with transaction.atomic():
+            for m in [
+                InventorySnapshotRow,
+                InventorySnapshot,
+                ReorderAlert,
+                StockMovement,
+                Inventory,
+                Product,
+                Warehouse,
+            ]:
+                m.objects.all()._raw_delete(m.objects.db)
 
         self.stdout.write("Creating new data...")
+        self.create(
+            Warehouse,
+            ["name", "location", "capacity", "used_capacity"],
+            options["warehouses"],
+            chunk_size,
+            self.warehouses,
+        )
+        self.create(
+            Product,
+            ["name", "description", "price", "sku"],
+            options["products"],
+            chunk_size,
+            self.products,
+        )
+        warehouse_ids = list(Warehouse.objects.values_list("id", flat=True))
+        product_ids = list(Product.objects.values_list("id", flat=True))
+        pairs = len(warehouse_ids) * len(product_ids)
+        if pairs:
+            # Walk the warehouse x product grid with a stride coprime to its
+            # size, which visits every pair at most once without a seen-set.
+            stride = self.rng.randrange(1, pairs) if pairs > 1 else 1
+            while math.gcd(stride, pairs) != 1:
+                stride += 1
+            offset = self.rng.randrange(pairs)
+            self.create(
+                Inventory,
+                [
+                    "warehouse_id",
+                    "product_id",
+                    "quantity",
+                    "reorder_point",
+                    "safety_stock",
+                ],
+                min(options["inventories"], pairs),
+                chunk_size,
+                lambda start, count: self.inventories(
+                    start, count, warehouse_ids, product_ids, stride, offset
+                ),
+            )
+
+        with transaction.atomic():
+            stock.record_opening_balances()
+            capacity.recompute_usage()
+
+        if not options["no_search_index"]:
+            with transaction.atomic():
+                search.rebuild([Product, Warehouse], chunk_size)
+
+    def create(self, model, columns, total, chunk_size, build):
+        # Plain executemany over tuples skips model instantiation and
+        # bulk_create's per-object bookkeeping, which dominates at this scale.
+        quote = connection.ops.quote_name
+        columns = [*columns, "updated_at"]
+        # Columns not generated here get their model defaults, so a new NOT
+        # NULL field with a default does not break the insert.
+        defaults = [
+            field
+            for field in model._meta.concrete_fields
+            if not field.primary_key
+            and field.column not in columns
+            and field.has_default()
+        ]
+        columns += [field.column for field in defaults]
+        extra = tuple(
+            field.get_db_prep_save(field.get_default(), connection)
+            for field in defaults
+        )
+        sql = "INSERT INTO %s (%s) VALUES (%s)" % (
+            quote(model._meta.db_table),
+            ", ".join(quote(c) for c in columns),
+            ", ".join(["%s"] * len(columns)),
+        )
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        started = time.perf_counter()
+        for start in range(0, total, chunk_size):
+            count = min(chunk_size, total - start)
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(
+                    sql, [(*row, now, *extra) for row in build(start, count)]
+                )
+        elapsed = time.perf_counter() - started
+        rate = total / elapsed if elapsed else 0
+        self.stdout.write(
+            f"  {model.__name__}: {total} rows in {elapsed:.2f}s ({rate:,.0f} rows/s)"
+        )
+
+    def warehouses(self, start, count):
+        rng = self.rng
+        return [
+            (
+                f"{rng.choice(self.companies)} #{start + i}",
+                rng.choice(self.cities),
+                rng.randint(1000, 10000) * self.capacity_scale,
+                0,
+            )
+            for i in range(count)
+        ]
+
+    def products(self, start, count):
+        rng = self.rng
+        return [
+            (
+                rng.choice(self.phrases),
+                rng.choice(self.paragraphs),
+                rng.randint(10, 1000),
+                f"{start + i:07d}",
+            )
+            for i in range(count)
+        ]
 
-        warehouses = WarehouseFactory.create_batch(5)
-        products = ProductFactory.create_batch(10)
-        inventories = InventoryFactory.create_batch(15)
+    def inventories(self, start, count, warehouse_ids, product_ids, stride, offset):
+        rng = self.rng
+        pairs = len(warehouse_ids) * len(product_ids)
+        width = len(warehouse_ids)
+        rows = []
+        for i in range(start, start + count):
+            product, warehouse = divmod((offset + i * stride) % pairs, width)
+            reorder_point = rng.randint(0, 100)
+            rows.append(
+                (
+                    warehouse_ids[warehouse],
+                    product_ids[product],
+                    rng.randint(0, 1000),
+                    reorder_point,
+                    reorder_point // 5,
+                )
+            )
+        return rows
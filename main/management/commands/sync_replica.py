@@ -0,0 +1,26 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from main.routers import PRIMARY, REPLICA
+
+
+class Command(BaseCommand):
+    help = (
+        "Copies the primary SQLite database over the DATABASE_REPLICA file "
+        "with SQLite's online backup, for a local stand-in replica."
+    )
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICA:
+            raise CommandError("DATABASE_REPLICA is not set.")
+        primary = connections[PRIMARY]
+        primary.ensure_connection()
+        target = sqlite3.connect(connections[REPLICA].settings_dict["NAME"])
+        try:
+            primary.connection.backup(target)
+        finally:
+            target.close()
+        self.stdout.write(self.style.SUCCESS("Replica is up to date."))
@@ -0,0 +1,28 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from main import snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        "Snapshots the inventory balances at the close of each day from --from "
+        "to --to, both defaulting to yesterday. Run it daily, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="first", type=date.fromisoformat)
+        parser.add_argument("--to", dest="last", type=date.fromisoformat)
+
+    def handle(self, *args, **options):
+        yesterday = timezone.localdate() - timedelta(days=1)
+        last = options["last"] or yesterday
+        first = options["first"] or last
+        if last > yesterday:
+            raise CommandError("Only days that are over can be snapshotted.")
+        for snapshot in snapshots.take_range(first, last):
+            self.stdout.write(
+                f"{snapshot.day}: {snapshot.row_count} non-zero balances"
+            )
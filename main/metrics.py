@@ -0,0 +1,249 @@
+# metrics.py
+# Per-request instrumentation. Every database connection gets an execute
+# wrapper that times its queries into the collector of the current request,
+# held in a context variable so queries from async views' worker threads are
+# counted too. The middleware turns each request into a Server-Timing header,
+# Prometheus metrics per view and, for a sample of slow requests, a log entry
+# with their SQL.
+import contextvars
+import heapq
+import logging
+import random
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+logger = logging.getLogger(__name__)
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Slow-request log entries list at most this many of the slowest queries,
+# with their parameters cut to this many characters.
+LOGGED_QUERIES = 10
+LOGGED_PARAMS = 200
+
+_collector = contextvars.ContextVar("query_collector", default=None)
+
+
+def _fingerprint(params):
+    try:
+        return hash(tuple(params) if isinstance(params, list) else params)
+    except TypeError:
+        return hash(repr(params))
+
+
+def _summary(params, many):
+    if many:
+        # Batches are not kept, and may be iterators already consumed.
+        return "(executemany)"
+    text = repr(params)
+    if len(text) > LOGGED_PARAMS:
+        text = text[:LOGGED_PARAMS] + "..."
+    return text
+
+
+class Collector:
+    """
+    Running totals for one request's queries. Repeats are spotted by hash,
+    and only the slowest statements are kept with their SQL, for the
+    slow-request log, so big batches cost no memory here.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.db_time = 0.0
+        self.duplicates = 0
+        self.seen = set()
+        # Heap of (duration, sequence, sql, params summary).
+        self.slowest = []
+        self.lock = threading.Lock()
+
+    def add(self, sql, params, duration, many=False):
+        key = None if many else hash((sql, _fingerprint(params)))
+        with self.lock:
+            self.count += 1
+            self.db_time += duration
+            if key in self.seen:
+                self.duplicates += 1
+            elif key is not None:
+                self.seen.add(key)
+            if len(self.slowest) < LOGGED_QUERIES:
+                heapq.heappush(
+                    self.slowest, (duration, self.count, sql, _summary(params, many))
+                )
+            elif duration > self.slowest[0][0]:
+                heapq.heapreplace(
+                    self.slowest, (duration, self.count, sql, _summary(params, many))
+                )
+
+
+def _record(execute, sql, params, many, context):
+    collector = _collector.get()
+    if collector is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        collector.add(sql, params, time.perf_counter() - started, many)
+
+
+def instrument(connection):
+    """Install the query timer on ``connection``; called as it connects."""
+    if _record not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record)
+
+
+class Registry:
+    """Prometheus metrics for this process, keyed by view name."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.buckets = {}
+        self.durations = Counter()
+        self.requests = Counter()
+        self.queries = Counter()
+        self.db_time = Counter()
+        self.duplicates = Counter()
+
+    def observe(self, view, duration, collector):
+        with self.lock:
+            counts = self.buckets.setdefault(view, [0] * len(BUCKETS))
+            for i, bound in enumerate(BUCKETS):
+                if duration <= bound:
+                    counts[i] += 1
+            self.durations[view] += duration
+            self.requests[view] += 1
+            self.queries[view] += collector.count
+            self.db_time[view] += collector.db_time
+            self.duplicates[view] += collector.duplicates
+
+    def render(self):
+        with self.lock:
+            lines = [
+                "# HELP http_request_duration_seconds Time spent in views.",
+                "# TYPE http_request_duration_seconds histogram",
+            ]
+            for view in sorted(self.requests):
+                label = f'view="{_escape(view)}"'
+                for bound, count in zip(BUCKETS, self.buckets[view]):
+                    lines.append(
+                        f'http_request_duration_seconds_bucket{{{label},le="{bound}"}}'
+                        f" {count}"
+                    )
+                lines += [
+                    f'http_request_duration_seconds_bucket{{{label},le="+Inf"}}'
+                    f" {self.requests[view]}",
+                    f"http_request_duration_seconds_sum{{{label}}}"
+                    f" {self.durations[view]:.6f}",
+                    f"http_request_duration_seconds_count{{{label}}}"
+                    f" {self.requests[view]}",
+                ]
+            for name, help_text, values in (
+                ("db_queries_total", "SQL queries run.", self.queries),
+                ("db_duration_seconds_total", "Time spent in SQL.", self.db_time),
+                (
+                    "db_duplicate_queries_total",
+                    "Queries repeating an earlier one in the same request.",
+                    self.duplicates,
+                ),
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                for view in sorted(values):
+                    lines.append(f'{name}{{view="{_escape(view)}"}} {values[view]:g}')
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+registry = Registry()
+
+
+class MetricsMiddleware:
+    """
+    Times each request and its queries. Streaming responses are measured
+    until the response is returned, not until the last chunk is sent.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        collector = Collector()
+        token = _collector.set(collector)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _collector.reset(token)
+        return self.finish(request, response, collector, started)
+
+    async def __acall__(self, request):
+        collector = Collector()
+        token = _collector.set(collector)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _collector.reset(token)
+        return self.finish(request, response, collector, started)
+
+    def finish(self, request, response, collector, started):
+        duration = time.perf_counter() - started
+        match = request.resolver_match
+        view = match.view_name if match else "<unresolved>"
+        registry.observe(view, duration, collector)
+
+        response["Server-Timing"] = (
+            f"total;dur={duration * 1000:.1f}, "
+            f'db;dur={collector.db_time * 1000:.1f};desc="{collector.count} '
+            f'queries, {collector.duplicates} duplicates"'
+        )
+        if (
+            duration * 1000 >= settings.SLOW_REQUEST_MS
+            and random.random() < settings.SLOW_REQUEST_SAMPLE_RATE
+        ):
+            self.log_slow(request, view, duration, collector)
+        return response
+
+    def log_slow(self, request, view, duration, collector):
+        slowest = sorted(collector.slowest, reverse=True)
+        logger.warning(
+            "Slow request %s %s (%s): %.1f ms, %d queries in %.1f ms, "
+            "%d duplicates\n%s",
+            request.method,
+            request.get_full_path(),
+            view,
+            duration * 1000,
+            collector.count,
+            collector.db_time * 1000,
+            collector.duplicates,
+            "\n".join(
+                f"  {q_duration * 1000:.1f} ms: {sql} {params}"
+                for q_duration, _, sql, params in slowest
+            ),
+        )
+
+
+def metrics_view(request):
+    """Prometheus text exposition, only for METRICS_ALLOWED_IPS."""
+    if request.META.get("REMOTE_ADDR") not in settings.METRICS_ALLOWED_IPS:
+        raise Http404
+    return HttpResponse(
+        registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,53 @@
+from django.db import migrations
+
+# The index as it was first created; main.search may change later, so its
+# SQL is copied here rather than imported.
+TABLE = "main_search_index"
+CREATE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+    "kind UNINDEXED, name, description, sku, location, "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+INSERT_SQL = (
+    f"INSERT OR REPLACE INTO {TABLE}(rowid, kind, name, description, sku, location) "
+    "VALUES (%s, %s, %s, %s, %s, %s)"
+)
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(CREATE_SQL)
+    Product = apps.get_model("main", "Product")
+    Warehouse = apps.get_model("main", "Warehouse")
+    # rowid is id * 2 plus 0 for products and 1 for warehouses.
+    rows = [
+        (pk * 2, "product", name, description, sku, "")
+        for pk, name, description, sku in Product.objects.values_list(
+            "id", "name", "description", "sku"
+        ).iterator()
+    ]
+    rows += [
+        (pk * 2 + 1, "warehouse", name, "", "", location)
+        for pk, name, location in Warehouse.objects.values_list(
+            "id", "name", "location"
+        ).iterator()
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(INSERT_SQL, rows)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
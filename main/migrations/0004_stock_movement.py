@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def record_opening_balances(apps, schema_editor):
+    # Existing balances predate the ledger, so seed it with one opening
+    # adjustment per inventory row to keep reconciliation meaningful.
+    schema_editor.execute(
+        "INSERT INTO main_stockmovement "
+        "(warehouse_id, product_id, kind, quantity, reference, note, created_at) "
+        "SELECT warehouse_id, product_id, 'adjustment', quantity, 'opening', '', %s "
+        "FROM main_inventory WHERE quantity != 0",
+        [timezone.now()],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0003_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('receipt', 'Receipt'), ('shipment', 'Shipment'), ('transfer', 'Transfer'), ('adjustment', 'Adjustment')], max_length=20)),
+                ('quantity', models.IntegerField()),
+                ('reference', models.CharField(blank=True, max_length=100)),
+                ('note', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='main.product')),
+                ('warehouse', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='main.warehouse')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['warehouse', 'product', 'created_at'], name='movement_pair_created_idx'), models.Index(fields=['created_at'], name='movement_created_idx')],
+            },
+        ),
+        migrations.RunPython(record_opening_balances, migrations.RunPython.noop),
+    ]
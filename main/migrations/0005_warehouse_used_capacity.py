@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:55
+
+from django.db import migrations, models
+
+
+def compute_usage(apps, schema_editor):
+    schema_editor.execute(
+        "UPDATE main_warehouse SET used_capacity = COALESCE(("
+        "SELECT SUM(quantity) FROM main_inventory "
+        "WHERE main_inventory.warehouse_id = main_warehouse.id), 0)"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0004_stock_movement'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='warehouse',
+            name='used_capacity',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(compute_usage, migrations.RunPython.noop),
+    ]
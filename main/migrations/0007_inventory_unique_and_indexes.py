@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+from django.utils import timezone
+
+
+def merge_duplicates(apps, schema_editor):
+    # The unique constraint below fails on existing duplicates, so rows
+    # sharing a pair are merged into the oldest one, summing quantities.
+    # Large tables should run ``manage.py dedupe_inventory`` first, in
+    # chunks, while the app is up; this pass then finds nothing left to do.
+    Inventory = apps.get_model("main", "Inventory")
+    duplicates = list(
+        Inventory.objects.order_by()
+        .values("warehouse_id", "product_id")
+        .annotate(rows=Count("id"), keep=Min("id"), total=Sum("quantity"))
+        .filter(rows__gt=1)
+        .values_list("warehouse_id", "product_id", "keep", "total")
+    )
+    for warehouse_id, product_id, keep, total in duplicates:
+        Inventory.objects.filter(id=keep).update(
+            quantity=total, updated_at=timezone.now()
+        )
+        Inventory.objects.filter(
+            warehouse_id=warehouse_id, product_id=product_id
+        ).exclude(id=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0006_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='inventory',
+            constraint=models.UniqueConstraint(fields=('warehouse', 'product'), name='inventory_warehouse_product_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='inventory',
+            index=models.Index(fields=['product', 'warehouse'], name='inventory_product_wh_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price'], name='product_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='warehouse',
+            index=models.Index(fields=['location'], name='warehouse_location_idx'),
+        ),
+        migrations.AlterField(
+            model_name='inventory',
+            name='product',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='main.product'),
+        ),
+        migrations.AlterField(
+            model_name='inventory',
+            name='warehouse',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='main.warehouse'),
+        ),
+    ]
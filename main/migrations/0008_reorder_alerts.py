@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_inventory_unique_and_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventory',
+            name='reorder_point',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='inventory',
+            name='safety_stock',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='ReorderAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField()),
+                ('reorder_point', models.PositiveIntegerField()),
+                ('safety_stock', models.PositiveIntegerField()),
+                ('daily_demand', models.FloatField()),
+                ('suggested_quantity', models.IntegerField()),
+                ('created_at', models.DateTimeField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='main.product')),
+                ('warehouse', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='alerts', to='main.warehouse')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-suggested_quantity', 'id'], name='alert_suggested_idx')],
+                'constraints': [models.UniqueConstraint(fields=('warehouse', 'product'), name='alert_warehouse_product_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0008_reorder_alerts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventorySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('taken_at', models.DateTimeField(db_index=True)),
+                ('row_count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='InventorySnapshotRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.IntegerField()),
+                ('product', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.product')),
+                ('snapshot', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='rows', to='main.inventorysnapshot')),
+                ('warehouse', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='main.warehouse')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('snapshot', 'warehouse', 'product'), name='snapshot_row_pair_uniq')],
+            },
+        ),
+    ]
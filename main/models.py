@@ -44,25 +44,225 @@ class Warehouse(models.Model):
     name = models.CharField(max_length=255)
     location = models.CharField(max_length=255)
     capacity = models.IntegerField()
+    # Sum of inventory quantities, maintained incrementally by capacity.py.
+    used_capacity = models.IntegerField(default=0, editable=False)
+    # Bumped by every write, including counter updates; see conditional.py.
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["name", "id"], name="warehouse_name_id_idx"),
+            models.Index(fields=["location"], name="warehouse_location_idx"),
+        ]
 
     def __str__(self):
         return self.name
 
+    @property
+    def free_capacity(self):
+        return self.capacity - self.used_capacity
+
+    @property
+    def utilization(self):
+        if self.capacity <= 0:
+            return 0
+        return round(100 * self.used_capacity / self.capacity, 1)
+
 
 class Product(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
     sku = models.CharField(max_length=100, unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["name", "id"], name="product_name_id_idx"),
+            models.Index(fields=["price"], name="product_price_idx"),
+        ]
 
     def __str__(self):
         return self.name
 
 
+class InventoryQuerySet(models.QuerySet):
+    def list_projection(self):
+        # Rows rendered in list/detail tables only show names and quantity.
+        return self.select_related("warehouse", "product").only(
+            "id",
+            "quantity",
+            "warehouse__id",
+            "warehouse__name",
+            "product__id",
+            "product__name",
+        )
+
+    def detail_projection(self):
+        return self.select_related("warehouse", "product")
+
+    def id_projection(self):
+        return self.only("id")
+
+
 class Inventory(models.Model):
-    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE)
-    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    # The unique (warehouse, product) and the (product, warehouse) indexes
+    # lead with each foreign key, so single-column FK indexes are redundant.
+    warehouse = models.ForeignKey(Warehouse, on_delete=models.CASCADE, db_index=False)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, db_index=False)
     quantity = models.IntegerField()
+    # Alert once quantity drops to reorder_point; 0 turns alerts off. Safety
+    # stock is kept on top of the expected demand when ordering more.
+    reorder_point = models.PositiveIntegerField(default=0)
+    safety_stock = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = InventoryQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["warehouse", "product"],
+                name="inventory_warehouse_product_uniq",
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["product", "warehouse"], name="inventory_product_wh_idx"
+            )
+        ]
 
     def __str__(self):
         return f"{self.product.name} in {self.warehouse.name}"
+
+
+class StockMovement(models.Model):
+    RECEIPT = "receipt"
+    SHIPMENT = "shipment"
+    TRANSFER = "transfer"
+    ADJUSTMENT = "adjustment"
+    KIND_CHOICES = [
+        (RECEIPT, "Receipt"),
+        (SHIPMENT, "Shipment"),
+        (TRANSFER, "Transfer"),
+        (ADJUSTMENT, "Adjustment"),
+    ]
+
+    warehouse = models.ForeignKey(
+        Warehouse, on_delete=models.CASCADE, related_name="movements"
+    )
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="movements"
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # Signed change to the (warehouse, product) balance.
+    quantity = models.IntegerField()
+    reference = models.CharField(max_length=100, blank=True)
+    note = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["warehouse", "product", "created_at"],
+                name="movement_pair_created_idx",
+            ),
+            models.Index(fields=["created_at"], name="movement_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} of {self.quantity} ({self.reference})"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Stock movements are append-only")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Stock movements are append-only")
+
+
+class ReorderAlert(models.Model):
+    """A low-stock pair, as found by the last run of reorder.evaluate()."""
+
+    warehouse = models.ForeignKey(
+        Warehouse, on_delete=models.CASCADE, db_index=False, related_name="alerts"
+    )
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, related_name="alerts"
+    )
+    quantity = models.IntegerField()
+    reorder_point = models.PositiveIntegerField()
+    safety_stock = models.PositiveIntegerField()
+    # Average outbound units per day over the evaluation window.
+    daily_demand = models.FloatField()
+    suggested_quantity = models.IntegerField()
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["warehouse", "product"], name="alert_warehouse_product_uniq"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["-suggested_quantity", "id"], name="alert_suggested_idx"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.product} in {self.warehouse}: order {self.suggested_quantity}"
+
+
+class InventorySnapshot(models.Model):
+    """Every non-zero balance at the close of ``day``, kept as snapshot rows."""
+
+    day = models.DateField(unique=True)
+    # Movements created at or before this moment are in the snapshot.
+    taken_at = models.DateTimeField(db_index=True)
+    row_count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"Snapshot of {self.day} ({self.row_count} balances)"
+
+
+class InventorySnapshotRow(models.Model):
+    # Narrow rows without zero balances; the unique index serves the lookups.
+    snapshot = models.ForeignKey(
+        InventorySnapshot, on_delete=models.CASCADE, db_index=False, related_name="rows"
+    )
+    warehouse = models.ForeignKey(
+        Warehouse, on_delete=models.CASCADE, db_index=False, related_name="+"
+    )
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE, db_index=False, related_name="+"
+    )
+    quantity = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["snapshot", "warehouse", "product"],
+                name="snapshot_row_pair_uniq",
+            )
+        ]
+
+
+class ApiToken(models.Model):
+    """
+    A revocable API credential. Only the SHA-256 digest of the key is kept;
+    keys are random, so a fast hash is enough and lookups use its index.
+    """
+
+    user = models.ForeignKey(MyUser, on_delete=models.CASCADE, related_name="tokens")
+    name = models.CharField(max_length=100, blank=True)
+    digest = models.CharField(max_length=64, unique=True)
+    # The start of the key, so users can tell their tokens apart.
+    prefix = models.CharField(max_length=8)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    revoked_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.prefix}... ({self.name or self.user})"
@@ -0,0 +1,181 @@
+# pagination.py
+import base64
+import json
+
+from django.db.models import Q
+from django.http import Http404
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        sort_value, pk, reverse = json.loads(base64.urlsafe_b64decode(cursor))
+        return sort_value, int(pk), bool(reverse)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def _sort_value(obj, sort_key):
+    # Rows are model instances, or dicts from values().
+    if isinstance(obj, dict):
+        value = obj[sort_key]
+    else:
+        value = obj
+        for part in sort_key.split("__"):
+            value = getattr(value, part)
+    return value if isinstance(value, (int, str)) else str(value)
+
+
+def _seek(queryset, sort_key, page_size, cursor):
+    reverse = False
+    if cursor:
+        sort_value, pk, reverse = decode_cursor(cursor)
+        if sort_key == "id":
+            seek = Q(id__lt=pk) if reverse else Q(id__gt=pk)
+        else:
+            op = "lt" if reverse else "gt"
+            seek = Q(**{f"{sort_key}__{op}": sort_value}) | Q(
+                **{sort_key: sort_value, f"id__{op}": pk}
+            )
+        queryset = queryset.filter(seek)
+
+    ordering = [sort_key, "id"] if sort_key != "id" else ["id"]
+    if reverse:
+        ordering = ["-" + field for field in ordering]
+    return queryset.order_by(*ordering)[: page_size + 1], reverse
+
+
+def _page(rows, sort_key, page_size, cursor, reverse):
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if reverse:
+        rows.reverse()
+
+    def cursor_for(obj, backwards):
+        return encode_cursor(
+            [_sort_value(obj, sort_key), _sort_value(obj, "id"), backwards]
+        )
+
+    next_cursor = previous_cursor = None
+    if rows:
+        if has_more or reverse:
+            next_cursor = cursor_for(rows[-1], False)
+        if cursor and (has_more or not reverse):
+            previous_cursor = cursor_for(rows[0], True)
+    return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+def keyset_paginate(queryset, sort_key, page_size, cursor=None):
+    """
+    Seek on (sort_key, id) instead of using OFFSET, so every page costs the
+    same index range scan no matter how deep it is.
+    """
+    queryset, reverse = _seek(queryset, sort_key, page_size, cursor)
+    return _page(list(queryset), sort_key, page_size, cursor, reverse)
+
+
+async def akeyset_paginate(queryset, sort_key, page_size, cursor=None):
+    """``keyset_paginate`` for async views, fetching with the async ORM."""
+    queryset, reverse = _seek(queryset, sort_key, page_size, cursor)
+    rows = [obj async for obj in queryset]
+    return _page(rows, sort_key, page_size, cursor, reverse)
+
+
+class KeysetPaginationMixin:
+    """ListView mixin that replaces Django's OFFSET paginator."""
+
+    paginate_by = 50
+    sort_key = "id"
+    cursor_param = "cursor"
+
+    def paginate_queryset(self, queryset, page_size):
+        cursor = self.request.GET.get(self.cursor_param)
+        try:
+            page = keyset_paginate(queryset, self.sort_key, page_size, cursor)
+        except ValueError:
+            raise Http404("Invalid cursor")
+        return (None, page, page.object_list, page.has_other_pages())
+
+
+class KeysetPagination(BasePagination):
+    page_size = 50
+    max_page_size = 500
+    sort_key = "id"
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        cursor = request.query_params.get(self.cursor_query_param)
+        try:
+            self.page = keyset_paginate(
+                queryset, self.sort_key, self.get_page_size(request), cursor
+            )
+        except ValueError:
+            raise NotFound("Invalid cursor")
+        return self.page.object_list
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_link(self.page.next_cursor),
+                "previous": self.get_link(self.page.previous_cursor),
+                "results": data,
+            }
+        )
+
+
+class WarehouseKeysetPagination(KeysetPagination):
+    sort_key = "name"
+
+
+class ProductKeysetPagination(KeysetPagination):
+    sort_key = "name"
+
+
+class AutocompletePagination(KeysetPagination):
+    page_size = 20
+    max_page_size = 100
+    sort_key = "name"
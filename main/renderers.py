@@ -0,0 +1,113 @@
+# renderers.py
+# Compact formats for the warehouse, product and inventory API, picked by
+# the Accept or Content-Type header, or by ?format=msgpack / ?format=columnar.
+# MessagePack is binary JSON. Columnar JSON turns a list of rows into one
+# array per field, so each field name is sent once rather than once per row.
+from datetime import date, datetime, time
+from decimal import Decimal
+
+import msgpack
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.settings import api_settings
+
+
+def _msgpack_default(value):
+    # Serializers already emit strings for these; other responses may not.
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    raise TypeError(f"Cannot encode {type(value).__name__} as MessagePack")
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=_msgpack_default)
+
+
+class MessagePackParser(BaseParser):
+    media_type = "application/msgpack"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, msgpack.UnpackException) as e:
+            raise ParseError(f"MessagePack parse error - {e}")
+
+
+def to_columns(rows):
+    """
+    ``[{"id": 1, "name": "a"}, ...]`` as ``{"id": [1, ...], "name": ["a", ...]}``.
+    Nested objects, such as expanded relations, become nested column sets.
+    """
+    if not rows:
+        return {}
+    columns = {name: [row[name] for row in rows] for name in rows[0]}
+    for name, values in columns.items():
+        if isinstance(values[0], dict):
+            columns[name] = to_columns(values)
+    return columns
+
+
+def to_rows(columns):
+    """The inverse of ``to_columns``."""
+    columns = {
+        name: to_rows(values) if isinstance(values, dict) else values
+        for name, values in columns.items()
+    }
+    if len({len(values) for values in columns.values()}) > 1:
+        raise ValueError("Columns differ in length")
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+class ColumnarJSONRenderer(JSONRenderer):
+    """
+    Lists, and the ``results`` of a page, are rendered column-wise; single
+    objects and errors are rendered as plain JSON.
+    """
+
+    media_type = "application/vnd.columnar+json"
+    format = "columnar"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, list):
+            data = to_columns(data)
+        elif isinstance(data, dict) and isinstance(data.get("results"), list):
+            data = {**data, "results": to_columns(data["results"])}
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+class ColumnarJSONParser(JSONParser):
+    """Reads a column set as a list of rows, for the bulk endpoints."""
+
+    media_type = "application/vnd.columnar+json"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        data = super().parse(stream, media_type, parser_context)
+        if not isinstance(data, dict):
+            raise ParseError("Expected an object of columns")
+        try:
+            return to_rows(data)
+        except (TypeError, ValueError) as e:
+            raise ParseError(f"Columnar parse error - {e}")
+
+
+RENDERER_CLASSES = [
+    *api_settings.DEFAULT_RENDERER_CLASSES,
+    MessagePackRenderer,
+    ColumnarJSONRenderer,
+]
+PARSER_CLASSES = [
+    *api_settings.DEFAULT_PARSER_CLASSES,
+    MessagePackParser,
+    ColumnarJSONParser,
+]
@@ -0,0 +1,90 @@
+# reorder.py
+# Low-stock evaluation. Demand, thresholds and order suggestions for every
+# pair are computed by the database in one INSERT ... SELECT, so a run costs
+# the same few statements however many pairs there are.
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import (
+    DateTimeField,
+    F,
+    FloatField,
+    OuterRef,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Cast, Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Inventory, ReorderAlert, StockMovement
+
+WINDOW_DAYS = 30
+COVER_DAYS = 14
+# Movements that take stock out of a warehouse for good or to another one.
+OUTBOUND_KINDS = [StockMovement.SHIPMENT, StockMovement.TRANSFER]
+ALERT_COLUMNS = [
+    "warehouse_id",
+    "product_id",
+    "quantity",
+    "reorder_point",
+    "safety_stock",
+    "daily_demand",
+    "suggested_quantity",
+    "created_at",
+]
+
+
+def low_stock(window_days=WINDOW_DAYS, cover_days=COVER_DAYS, now=None):
+    """
+    Inventory rows at or below their reorder point, annotated with
+    ``daily_demand`` (outbound units per day over the last ``window_days``)
+    and ``suggested_quantity``: enough to cover ``cover_days`` of demand, and
+    never less than the reorder point, plus safety stock, minus what is on
+    hand.
+    """
+    now = now or timezone.now()
+    outbound = (
+        StockMovement.objects.filter(
+            warehouse_id=OuterRef("warehouse_id"),
+            product_id=OuterRef("product_id"),
+            created_at__gte=now - timedelta(days=window_days),
+            kind__in=OUTBOUND_KINDS,
+            quantity__lt=0,
+        )
+        .order_by()
+        .values("warehouse_id", "product_id")
+        .annotate(total=Sum("quantity"))
+        .values("total")
+    )
+    # Integer ceiling division keeps the arithmetic in plain SQL.
+    covered = (F("outbound") * cover_days + window_days - 1) / window_days
+    return (
+        Inventory.objects.filter(reorder_point__gt=0, quantity__lte=F("reorder_point"))
+        .annotate(outbound=-Coalesce(Subquery(outbound), 0))
+        .annotate(
+            daily_demand=Cast("outbound", FloatField()) / window_days,
+            suggested_quantity=Greatest("reorder_point", covered)
+            + F("safety_stock")
+            - F("quantity"),
+        )
+    )
+
+
+def evaluate(window_days=WINDOW_DAYS, cover_days=COVER_DAYS):
+    """Replace all alerts with the current low-stock pairs. Returns their count."""
+    rows = low_stock(window_days, cover_days).values_list(
+        *ALERT_COLUMNS[:-1],
+        Value(timezone.now(), output_field=DateTimeField()),
+    )
+    select, params = rows.query.sql_with_params()
+    quote = connection.ops.quote_name
+    table = quote(ReorderAlert._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table}")
+        cursor.execute(
+            f"INSERT INTO {table} ({', '.join(quote(c) for c in ALERT_COLUMNS)}) "
+            f"{select}",
+            params,
+        )
+        return cursor.rowcount
@@ -0,0 +1,96 @@
+# routers.py
+# Read-replica routing. GET and HEAD requests read inventory data from the
+# replica; writes, and reads anywhere else (form posts, commands, background
+# jobs), use the primary. A client that wrote recently is pinned to the
+# primary for REPLICA_PIN_SECONDS so it always sees its own writes.
+import contextvars
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import router
+
+PRIMARY = "default"
+REPLICA = "replica"
+PIN_COOKIE = "db_pin"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_read_from = contextvars.ContextVar("read_from", default=PRIMARY)
+
+
+def is_enabled():
+    return any(isinstance(r, ReplicaRouter) for r in router.routers)
+
+
+class ReplicaRouter:
+    """
+    Routes the inventory models. Users, API tokens, sessions and the rest
+    stay on the primary: credentials must never lag behind a revocation.
+    """
+
+    unrouted = ("myuser", "apitoken")
+
+    def _routed(self, model):
+        return (
+            model._meta.app_label == "main"
+            and model._meta.model_name not in self.unrouted
+        )
+
+    def db_for_read(self, model, **hints):
+        if self._routed(model):
+            return _read_from.get()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data.
+        return True
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        token = _read_from.set(self.alias_for(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_from.reset(token)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        token = _read_from.set(self.alias_for(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _read_from.reset(token)
+        return self.pin(request, response)
+
+    def alias_for(self, request):
+        if (
+            is_enabled()
+            and request.method in SAFE_METHODS
+            and PIN_COOKIE not in request.COOKIES
+        ):
+            return REPLICA
+        return PRIMARY
+
+    def pin(self, request, response):
+        if is_enabled() and request.method not in SAFE_METHODS:
+            response.set_cookie(
+                PIN_COOKIE,
+                "1",
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
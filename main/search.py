@@ -0,0 +1,141 @@
+# search.py
+import re
+from functools import reduce
+from operator import or_
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+TABLE = "main_search_index"
+KINDS = {"product": 0, "warehouse": 1}
+# bm25() weights, in column order: kind, name, description, sku, location.
+WEIGHTS = (0.0, 10.0, 1.0, 5.0, 2.0)
+
+CREATE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+    "kind UNINDEXED, name, description, sku, location, "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+UPSERT_SQL = (
+    f"INSERT OR REPLACE INTO {TABLE}(rowid, kind, name, description, sku, location) "
+    "VALUES (%s, %s, %s, %s, %s, %s)"
+)
+
+
+def is_available():
+    return connection.vendor == "sqlite"
+
+
+def _rowid(kind, object_id):
+    # Packing the kind into the rowid keeps upserts and deletes a primary key
+    # lookup instead of a scan over the UNINDEXED kind column.
+    return object_id * len(KINDS) + KINDS[kind]
+
+
+def _row(kind, obj):
+    if kind == "product":
+        return (_rowid(kind, obj.id), kind, obj.name, obj.description, obj.sku, "")
+    return (_rowid(kind, obj.id), kind, obj.name, "", "", obj.location)
+
+
+def kind_of(obj):
+    return obj._meta.model_name
+
+
+def index_objects(objects):
+    if not is_available():
+        return
+    rows = [_row(kind_of(obj), obj) for obj in objects]
+    with connection.cursor() as cursor:
+        cursor.executemany(UPSERT_SQL, rows)
+
+
+def unindex_object(obj):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {TABLE} WHERE rowid = %s", [_rowid(kind_of(obj), obj.id)]
+        )
+
+
+def build_match(text, columns=None):
+    """
+    Turn free text into an FTS5 expression: every word must match as a prefix,
+    optionally restricted to the given columns.
+    """
+    terms = re.findall(r"\w+", text)
+    if not terms:
+        return None
+    expression = " AND ".join(f'"{term}"*' for term in terms)
+    if columns:
+        return "{%s}: (%s)" % (" ".join(columns), expression)
+    return expression
+
+
+def ids_subquery(kind, text, columns=None):
+    """SQL and params selecting matching object ids, for use with ``id__in``."""
+    match = build_match(text, columns)
+    if match is None:
+        return None
+    sql = (
+        f"SELECT rowid / {len(KINDS)} FROM {TABLE} "
+        f"WHERE {TABLE} MATCH %s AND kind = %s"
+    )
+    return sql, [match, kind]
+
+
+def filter_matching(queryset, text, columns):
+    """
+    Restrict ``queryset`` to rows whose ``columns`` match ``text``, falling back
+    to ``icontains`` when the database has no FTS5 index.
+    """
+    if not is_available():
+        lookups = [Q(**{f"{column}__icontains": text}) for column in columns]
+        return queryset.filter(reduce(or_, lookups))
+    subquery = ids_subquery(kind_of(queryset.model), text, columns)
+    if subquery is None:
+        return queryset
+    return queryset.filter(id__in=RawSQL(*subquery))
+
+
+def search(text, kind=None, limit=20):
+    """Return ``(kind, id, score)`` tuples ordered best match first."""
+    match = build_match(text)
+    if match is None or not is_available():
+        return []
+    weights = ", ".join(str(w) for w in WEIGHTS)
+    sql = (
+        f"SELECT kind, rowid / {len(KINDS)}, bm25({TABLE}, {weights}) AS score "
+        f"FROM {TABLE} WHERE {TABLE} MATCH %s"
+    )
+    params = [match]
+    if kind:
+        sql += " AND kind = %s"
+        params.append(kind)
+    sql += " ORDER BY score LIMIT %s"
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def rebuild(models, chunk_size=5000):
+    if not is_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(CREATE_SQL)
+        cursor.execute(f"DELETE FROM {TABLE}")
+    total = 0
+    for model in models:
+        batch = []
+        for obj in model.objects.order_by().iterator(chunk_size=chunk_size):
+            batch.append(obj)
+            if len(batch) >= chunk_size:
+                index_objects(batch)
+                total += len(batch)
+                batch = []
+        index_objects(batch)
+        total += len(batch)
+    return total
@@ -1,7 +1,147 @@
 from rest_framework import serializers
-from .models import Warehouse
+from . import forecast, reorder
+from .fields import SparseSerializerMixin
+from .models import ApiToken, Warehouse, Product, Inventory, ReorderAlert, StockMovement
+
+class WarehouseSerializer(SparseSerializerMixin, serializers.ModelSerializer):
+    utilization = serializers.FloatField(read_only=True)
+    computed = {'utilization': ('capacity', 'used_capacity')}
 
-class WarehouseSerializer(serializers.ModelSerializer):
     class Meta:
         model = Warehouse
-        fields = ['id', 'name', 'location', 'capacity']
\ No newline at end of file
+        fields = [
+            'id', 'name', 'location', 'capacity', 'used_capacity', 'utilization',
+        ]
+        read_only_fields = ['used_capacity']
+
+    def validate_capacity(self, value):
+        if self.instance and value < self.instance.used_capacity:
+            raise serializers.ValidationError(
+                f"Capacity cannot be below the {self.instance.used_capacity} "
+                "units stored"
+            )
+        return value
+
+
+class ProductSerializer(SparseSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Product
+        fields = ['id', 'name', 'description', 'price', 'sku']
+
+
+class InventorySerializer(SparseSerializerMixin, serializers.ModelSerializer):
+    expandable = {'warehouse': WarehouseSerializer, 'product': ProductSerializer}
+
+    class Meta:
+        model = Inventory
+        fields = [
+            'id', 'warehouse', 'product', 'quantity', 'reorder_point',
+            'safety_stock',
+        ]
+
+
+class InventoryAsOfSerializer(SparseSerializerMixin, serializers.ModelSerializer):
+    quantity = serializers.IntegerField(source='quantity_as_of')
+    expandable = InventorySerializer.expandable
+
+    class Meta:
+        model = Inventory
+        fields = ['id', 'warehouse', 'product', 'quantity']
+
+
+# Bulk item serializers only do field-level validation. Foreign keys and
+# uniqueness are checked for the whole batch at once in bulk.py instead of
+# with one query per item.
+class WarehouseBulkSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Warehouse
+        fields = ['name', 'location', 'capacity']
+
+    def validate_capacity(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Capacity must be a positive number")
+        return value
+
+
+class ProductBulkSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Product
+        fields = ['name', 'description', 'price', 'sku']
+        extra_kwargs = {'sku': {'validators': []}}
+
+
+class InventoryBulkSerializer(serializers.ModelSerializer):
+    warehouse = serializers.IntegerField(source='warehouse_id')
+    product = serializers.IntegerField(source='product_id')
+
+    class Meta:
+        model = Inventory
+        fields = ['warehouse', 'product', 'quantity']
+
+
+class StockMovementSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StockMovement
+        fields = [
+            'id', 'warehouse', 'product', 'kind', 'quantity', 'reference', 'note',
+            'created_at',
+        ]
+        read_only_fields = ['created_at']
+
+    def validate(self, data):
+        kind, quantity = data['kind'], data['quantity']
+        if kind == StockMovement.TRANSFER:
+            raise serializers.ValidationError(
+                {"kind": "Transfers are recorded in pairs by the transfer service"}
+            )
+        if quantity == 0:
+            raise serializers.ValidationError({"quantity": "Must not be zero"})
+        if kind in (StockMovement.RECEIPT, StockMovement.SHIPMENT) and quantity < 0:
+            raise serializers.ValidationError(
+                {"quantity": "Receipts and shipments take a positive quantity"}
+            )
+        if kind == StockMovement.SHIPMENT:
+            data['quantity'] = -quantity
+        return data
+
+
+class ReorderAlertSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ReorderAlert
+        fields = [
+            'id', 'warehouse', 'product', 'quantity', 'reorder_point',
+            'safety_stock', 'daily_demand', 'suggested_quantity', 'created_at',
+        ]
+
+
+class EvaluateReorderSerializer(serializers.Serializer):
+    window_days = serializers.IntegerField(min_value=1, default=reorder.WINDOW_DAYS)
+    cover_days = serializers.IntegerField(min_value=1, default=reorder.COVER_DAYS)
+
+
+class ForecastParamsSerializer(serializers.Serializer):
+    days = serializers.IntegerField(
+        min_value=forecast.LONG_WINDOW, max_value=366, default=forecast.HISTORY_DAYS
+    )
+    alpha = serializers.FloatField(min_value=0.01, max_value=1, default=forecast.ALPHA)
+
+
+class TransferSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    from_warehouse = serializers.IntegerField()
+    to_warehouse = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+    def validate(self, data):
+        if data['from_warehouse'] == data['to_warehouse']:
+            raise serializers.ValidationError(
+                {"to_warehouse": "Must differ from from_warehouse"}
+            )
+        return data
+
+
+class ApiTokenSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ApiToken
+        fields = ['id', 'name', 'prefix', 'created_at', 'expires_at', 'revoked_at']
+        read_only_fields = ['prefix', 'created_at', 'revoked_at']
@@ -0,0 +1,56 @@
+# signals.py
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import caching, capacity, metrics, search, tokens
+from .models import ApiToken, Inventory, MyUser, Product, Warehouse
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Warehouse)
+def update_search_index(sender, instance, **kwargs):
+    search.index_objects([instance])
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Warehouse)
+def remove_from_search_index(sender, instance, **kwargs):
+    search.unindex_object(instance)
+
+
+@receiver(pre_delete, sender=Product)
+def release_capacity(sender, instance, **kwargs):
+    capacity.release_product(instance)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Warehouse)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Warehouse)
+def invalidate_object(sender, instance, **kwargs):
+    caching.bump_objects([instance])
+
+
+@receiver(post_save, sender=Inventory)
+@receiver(post_delete, sender=Inventory)
+def invalidate_inventory(sender, instance, **kwargs):
+    caching.bump_inventory([(instance.warehouse_id, instance.product_id)])
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    metrics.instrument(connection)
+
+
+@receiver(post_save, sender=ApiToken)
+@receiver(post_delete, sender=ApiToken)
+def forget_token(sender, instance, **kwargs):
+    tokens.verified.evict(token_id=instance.id)
+
+
+@receiver(post_save, sender=MyUser)
+@receiver(post_delete, sender=MyUser)
+def forget_user_tokens(sender, instance, **kwargs):
+    # Deactivated users lose API access at once, not when the cache expires.
+    tokens.verified.evict(user_id=instance.pk)
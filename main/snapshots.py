@@ -0,0 +1,144 @@
+# snapshots.py
+# Point-in-time balances. A snapshot holds every non-zero balance at the close
+# of a day and is built from the previous snapshot plus that day's movements,
+# so taking one reads one day of the ledger. Balances at any moment are the
+# nearest earlier snapshot plus the movements after it, looked up per pair on
+# the (warehouse, product, created_at) index instead of scanning the history.
+from datetime import datetime, time, timedelta
+
+from django.db import connection, transaction
+from django.db.models import IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import InventorySnapshot, InventorySnapshotRow, StockMovement
+from .stock import ledger_total
+
+
+def close_of(day):
+    return timezone.make_aware(datetime.combine(day, time.max))
+
+
+def parse_as_of(value):
+    """
+    Parse an ``as_of`` parameter: a date means the close of that day, a
+    datetime that moment. Raises ValueError for anything else.
+    """
+    try:
+        day = parse_date(value)
+        moment = None if day else parse_datetime(value)
+    except ValueError:
+        day = moment = None
+    if day:
+        return close_of(day)
+    if moment is None:
+        raise ValueError(f"Invalid as_of {value!r}; use YYYY-MM-DD or an ISO datetime")
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _taken_before(moment):
+    return InventorySnapshot.objects.filter(taken_at__lte=moment).order_by(
+        "-taken_at"
+    )
+
+
+def nearest(moment):
+    """The latest snapshot taken at or before ``moment``, or ``None``."""
+    return _taken_before(moment).first()
+
+
+async def anearest(moment):
+    return await _taken_before(moment).afirst()
+
+
+def balance_as_of(moment, snapshot=None):
+    """
+    Expression for the balance of the outer row's (warehouse, product) pair
+    at ``moment``, given ``snapshot`` from ``nearest(moment)``.
+    """
+    if snapshot is None:
+        return ledger_total(created_at__lte=moment)
+    base = InventorySnapshotRow.objects.filter(
+        snapshot=snapshot,
+        warehouse_id=OuterRef("warehouse_id"),
+        product_id=OuterRef("product_id"),
+    ).values("quantity")[:1]
+    return Coalesce(Subquery(base), Value(0), output_field=IntegerField()) + (
+        ledger_total(created_at__gt=snapshot.taken_at, created_at__lte=moment)
+    )
+
+
+def _with_balances(queryset, moment, snapshot):
+    return queryset.annotate(
+        quantity_as_of=balance_as_of(moment, snapshot)
+    ).exclude(quantity_as_of=0)
+
+
+def as_of(queryset, moment):
+    """
+    Annotate inventory rows with ``quantity_as_of``, their balance at
+    ``moment``, keeping only the pairs that held stock then. Pairs whose
+    inventory row has since been deleted are not listed.
+    """
+    return _with_balances(queryset, moment, nearest(moment))
+
+
+async def aas_of(queryset, moment):
+    return _with_balances(queryset, moment, await anearest(moment))
+
+
+def take(day):
+    """
+    Snapshot the balances at the close of ``day``, replacing any earlier
+    snapshot of it. Only finished days can be taken, as later movements would
+    otherwise fall before ``taken_at``. Returns the snapshot.
+    """
+    if day >= timezone.localdate():
+        raise ValueError("Only days that are over can be snapshotted")
+    taken_at = close_of(day)
+    adapt = connection.ops.adapt_datetimefield_value
+    quote = connection.ops.quote_name
+    with transaction.atomic():
+        InventorySnapshotRow.objects.filter(snapshot__day=day).delete()
+        InventorySnapshot.objects.filter(day=day).delete()
+        previous = nearest(taken_at)
+        snapshot = InventorySnapshot.objects.create(day=day, taken_at=taken_at)
+
+        parts = [
+            "SELECT warehouse_id, product_id, quantity "
+            f"FROM {quote(StockMovement._meta.db_table)} "
+            "WHERE created_at <= %s"
+        ]
+        params = [adapt(taken_at)]
+        if previous:
+            parts[0] += " AND created_at > %s"
+            params.append(adapt(previous.taken_at))
+            parts.append(
+                "SELECT warehouse_id, product_id, quantity "
+                f"FROM {quote(InventorySnapshotRow._meta.db_table)} "
+                "WHERE snapshot_id = %s"
+            )
+            params.append(previous.id)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {quote(InventorySnapshotRow._meta.db_table)} "
+                "(snapshot_id, warehouse_id, product_id, quantity) "
+                "SELECT %s, warehouse_id, product_id, SUM(quantity) "
+                f"FROM ({' UNION ALL '.join(parts)}) AS balances "
+                "GROUP BY warehouse_id, product_id HAVING SUM(quantity) != 0",
+                [snapshot.id, *params],
+            )
+            snapshot.row_count = cursor.rowcount
+        snapshot.save(update_fields=["row_count"])
+    return snapshot
+
+
+def take_range(first, last):
+    """Snapshot every day from ``first`` to ``last``, oldest first."""
+    day = first
+    while day <= last:
+        yield take(day)
+        day += timedelta(days=1)
@@ -0,0 +1,78 @@
+// autocomplete.js
+// Turns every <select data-autocomplete="url"> into a search box whose
+// options are fetched page by page while typing.
+(function () {
+    function setup(select) {
+        var input = document.createElement("input");
+        input.type = "search";
+        input.placeholder = "Type to search...";
+        var more = document.createElement("button");
+        more.type = "button";
+        more.textContent = "More results";
+        more.hidden = true;
+        select.parentNode.insertBefore(input, select);
+        select.parentNode.insertBefore(more, select.nextSibling);
+
+        var next = null;
+        var timer = null;
+        var request = 0;
+
+        function load(url, append) {
+            var current = ++request;
+            fetch(url, {
+                credentials: "same-origin",
+                headers: { Accept: "application/json" },
+            })
+                .then(function (response) {
+                    return response.json();
+                })
+                .then(function (data) {
+                    if (current !== request) {
+                        return;
+                    }
+                    if (!append) {
+                        // Keep the empty choice and the current selection.
+                        Array.from(select.options).forEach(function (option) {
+                            if (option.value && !option.selected) {
+                                option.remove();
+                            }
+                        });
+                    }
+                    data.results.forEach(function (item) {
+                        var value = String(item.id);
+                        if (select.querySelector('option[value="' + value + '"]')) {
+                            return;
+                        }
+                        select.add(new Option(item.text, value));
+                    });
+                    next = data.next;
+                    more.hidden = !next;
+                });
+        }
+
+        function search() {
+            var url = new URL(select.dataset.autocomplete, window.location.href);
+            url.searchParams.set("q", input.value);
+            load(url, false);
+        }
+
+        input.addEventListener("input", function () {
+            clearTimeout(timer);
+            timer = setTimeout(search, 250);
+        });
+        select.addEventListener("focus", function () {
+            if (select.options.length <= 2 && !next) {
+                search();
+            }
+        }, { once: true });
+        more.addEventListener("click", function () {
+            if (next) {
+                load(next, true);
+            }
+        });
+    }
+
+    document.addEventListener("DOMContentLoaded", function () {
+        document.querySelectorAll("select[data-autocomplete]").forEach(setup);
+    });
+})();
@@ -0,0 +1,337 @@
+# stock.py
+# Every change to Inventory.quantity goes through here so the StockMovement
+# ledger and the balances stay in step.
+import uuid
+from contextlib import contextmanager
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Exists, F, Min, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .caching import bump_inventory
+from .capacity import recompute_usage, use_capacity
+from .models import Inventory, StockMovement
+
+
+class InsufficientStock(Exception):
+    pass
+
+
+def _apply(warehouse_id, product_id, quantity, allow_negative=False):
+    use_capacity({warehouse_id: quantity})
+    bump_inventory([(warehouse_id, product_id)])
+    balance = Inventory.objects.filter(warehouse_id=warehouse_id, product_id=product_id)
+    if quantity < 0 and not allow_negative:
+        balance = balance.filter(quantity__gte=-quantity)
+    changes = {"quantity": F("quantity") + quantity, "updated_at": timezone.now()}
+    if balance.update(**changes):
+        return
+    if quantity < 0 and not allow_negative:
+        raise InsufficientStock(
+            f"Not enough stock of product {product_id} in warehouse {warehouse_id}"
+        )
+    try:
+        with transaction.atomic():
+            Inventory.objects.create(
+                warehouse_id=warehouse_id, product_id=product_id, quantity=quantity
+            )
+    except IntegrityError:
+        # Another transaction created the row since the update above.
+        if not balance.update(**changes):
+            raise
+
+
+def record_movement(
+    warehouse_id,
+    product_id,
+    kind,
+    quantity,
+    reference="",
+    note="",
+    allow_negative=False,
+):
+    """
+    Append a movement of signed ``quantity`` and apply it to the balance with
+    a single ``UPDATE ... SET quantity = quantity + n`` in the same
+    transaction, so concurrent movements never overwrite each other.
+    """
+    with transaction.atomic():
+        _apply(warehouse_id, product_id, quantity, allow_negative)
+        return StockMovement.objects.create(
+            warehouse_id=warehouse_id,
+            product_id=product_id,
+            kind=kind,
+            quantity=quantity,
+            reference=reference,
+            note=note,
+        )
+
+
+def lock_inventory(rows):
+    """
+    Lock the inventory ``rows`` for the rest of the transaction, in
+    (warehouse, product) order. Every caller takes its locks in the same
+    order, so two batches touching the same rows wait for each other instead
+    of deadlocking.
+    """
+    rows = rows.order_by("warehouse_id", "product_id", "id")
+    connection = transaction.get_connection()
+    if connection.features.has_select_for_update:
+        list(rows.select_for_update().values_list("id", flat=True))
+    elif getattr(connection, "transaction_mode", None) != "IMMEDIATE":
+        # SQLite has no row locks. Writing first takes the database write
+        # lock up front, instead of upgrading a read lock later, which fails
+        # straight away with "database is locked" under contention. BEGIN
+        # IMMEDIATE transactions hold it from the start already.
+        rows.update(quantity=F("quantity"))
+
+
+@contextmanager
+def write_transaction():
+    """
+    ``transaction.atomic()`` that on SQLite starts with BEGIN IMMEDIATE,
+    whatever the profile. Taking the write lock as the transaction begins
+    waits out the busy timeout; deferred transactions can instead fail at
+    once with "database is locked" when two of them race for it. Inside an
+    open transaction this is a plain savepoint.
+    """
+    connection = transaction.get_connection()
+    if connection.vendor != "sqlite" or connection.in_atomic_block:
+        with transaction.atomic():
+            yield
+        return
+    # Connecting sets transaction_mode from the settings, and it is only
+    # read when the outermost atomic() begins.
+    connection.ensure_connection()
+    mode = connection.transaction_mode
+    connection.transaction_mode = "IMMEDIATE"
+    try:
+        with transaction.atomic():
+            yield
+    finally:
+        connection.transaction_mode = mode
+
+
+def _lock_balances(pairs):
+    """Lock the inventory rows of ``pairs``; see ``lock_inventory``."""
+    if not pairs:
+        # An empty Q() would match, and lock, the whole table.
+        return
+    condition = Q()
+    for warehouse_id, product_id in pairs:
+        condition |= Q(warehouse_id=warehouse_id, product_id=product_id)
+    lock_inventory(Inventory.objects.filter(condition))
+
+
+def transfer(transfers, reference="", note=""):
+    """
+    Move stock between warehouses atomically. ``transfers`` is a list of
+    ``(product_id, from_warehouse_id, to_warehouse_id, quantity)`` tuples;
+    either all of them are applied or, if any source would go negative,
+    none are. Each transfer is logged as a pair of movements sharing
+    ``reference``.
+    """
+    reference = reference or uuid.uuid4().hex
+    movements = []
+    with write_transaction():
+        _lock_balances(
+            {(source, product) for product, source, _, _ in transfers}
+            | {(target, product) for product, _, target, _ in transfers}
+        )
+        for product_id, source_id, target_id, quantity in transfers:
+            _apply(source_id, product_id, -quantity)
+            _apply(target_id, product_id, quantity)
+            for warehouse_id, delta in ((source_id, -quantity), (target_id, quantity)):
+                movements.append(
+                    StockMovement(
+                        warehouse_id=warehouse_id,
+                        product_id=product_id,
+                        kind=StockMovement.TRANSFER,
+                        quantity=delta,
+                        reference=reference,
+                        note=note,
+                    )
+                )
+        StockMovement.objects.bulk_create(movements, batch_size=1000)
+    return reference
+
+
+def state(inventory):
+    return (inventory.warehouse_id, inventory.product_id, inventory.quantity)
+
+
+def record_changes(changes, kind=StockMovement.ADJUSTMENT, reference=""):
+    """
+    Write ledger entries and capacity usage for balances that were set to
+    absolute values, e.g. by forms, bulk API writes or imports. ``changes``
+    holds ``(before, after)`` pairs of ``(warehouse_id, product_id,
+    quantity)`` tuples, with ``None`` for a row that did not exist before or
+    no longer exists. Must run in the transaction that wrote the balances.
+    """
+    movements = []
+    usage = {}
+    for before, after in changes:
+        deltas = {}
+        if before:
+            deltas[before[:2]] = -before[2]
+        if after:
+            deltas[after[:2]] = deltas.get(after[:2], 0) + after[2]
+        for (warehouse_id, product_id), delta in deltas.items():
+            if not delta:
+                continue
+            usage[warehouse_id] = usage.get(warehouse_id, 0) + delta
+            movements.append(
+                StockMovement(
+                    warehouse_id=warehouse_id,
+                    product_id=product_id,
+                    kind=kind,
+                    quantity=delta,
+                    reference=reference,
+                )
+            )
+    use_capacity(usage)
+    bump_inventory((m.warehouse_id, m.product_id) for m in movements)
+    StockMovement.objects.bulk_create(movements, batch_size=1000)
+    return movements
+
+
+def record_opening_balances(connection=None):
+    """Give every inventory row an opening adjustment equal to its quantity."""
+    connection = connection or transaction.get_connection()
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote(StockMovement._meta.db_table)} "
+            "(warehouse_id, product_id, kind, quantity, reference, note, created_at) "
+            "SELECT warehouse_id, product_id, %s, quantity, %s, '', %s "
+            f"FROM {quote(Inventory._meta.db_table)} WHERE quantity != 0",
+            [StockMovement.ADJUSTMENT, "opening", timezone.now()],
+        )
+
+
+def ledger_total(**filters):
+    """
+    Correlated subquery summing the ledger for the outer inventory row,
+    optionally only over the movements matching ``filters``.
+    """
+    totals = (
+        StockMovement.objects.filter(
+            warehouse_id=OuterRef("warehouse_id"),
+            product_id=OuterRef("product_id"),
+            **filters,
+        )
+        .order_by()
+        .values("warehouse_id", "product_id")
+        .annotate(total=Sum("quantity"))
+        .values("total")
+    )
+    return Coalesce(Subquery(totals), 0)
+
+
+def reconcile(fix=False, chunk_size=5000):
+    """
+    Recompute balances from the ledger in SQL and compare them to
+    ``Inventory``. Returns ``(warehouse_id, product_id, balance, ledger)``
+    tuples for every pair that drifted; ``balance`` is ``None`` when the
+    ledger holds stock for a pair with no inventory row. With ``fix`` the
+    balances are overwritten with the ledger totals in chunked transactions.
+    """
+    drifted = (
+        Inventory.objects.annotate(ledger=ledger_total())
+        .exclude(quantity=F("ledger"))
+        .order_by("id")
+        .values_list("id", "warehouse_id", "product_id", "quantity", "ledger")
+    )
+    missing = (
+        StockMovement.objects.order_by()
+        .values("warehouse_id", "product_id")
+        .annotate(total=Sum("quantity"))
+        .exclude(total=0)
+        .exclude(
+            Exists(
+                Inventory.objects.filter(
+                    warehouse_id=OuterRef("warehouse_id"),
+                    product_id=OuterRef("product_id"),
+                )
+            )
+        )
+        .values_list("warehouse_id", "product_id", "total")
+    )
+
+    drift, ids = [], []
+    for pk, warehouse_id, product_id, quantity, total in drifted.iterator(
+        chunk_size=chunk_size
+    ):
+        drift.append((warehouse_id, product_id, quantity, total))
+        ids.append(pk)
+    missing = list(missing)
+    drift += [(w, p, None, total) for w, p, total in missing]
+
+    if fix:
+        for start in range(0, len(ids), chunk_size):
+            with transaction.atomic():
+                Inventory.objects.filter(id__in=ids[start : start + chunk_size]).update(
+                    quantity=ledger_total(), updated_at=timezone.now()
+                )
+        for start in range(0, len(missing), chunk_size):
+            with transaction.atomic():
+                Inventory.objects.bulk_create(
+                    [
+                        Inventory(warehouse_id=w, product_id=p, quantity=total)
+                        for w, p, total in missing[start : start + chunk_size]
+                    ]
+                )
+        with transaction.atomic():
+            recompute_usage()
+    return drift
+
+
+def merge_duplicates(model=Inventory, chunk_size=1000, dry_run=False):
+    """
+    Merge inventory rows sharing a (warehouse, product) pair into the oldest
+    one, summing their quantities. Each chunk of pairs is merged in its own
+    transaction with the sum taken at write time, so it is safe to run while
+    the app is up. ``model`` may be a historical model inside a migration.
+    Returns ``(pairs, rows removed)``.
+    """
+    duplicates = list(
+        model.objects.order_by()
+        .values("warehouse_id", "product_id")
+        .annotate(rows=Count("id"), keep=Min("id"))
+        .filter(rows__gt=1)
+        .values_list("warehouse_id", "product_id", "keep", "rows")
+    )
+    removed = sum(rows - 1 for _, _, _, rows in duplicates)
+    if dry_run:
+        return len(duplicates), removed
+
+    totals = (
+        model.objects.filter(
+            warehouse_id=OuterRef("warehouse_id"), product_id=OuterRef("product_id")
+        )
+        .order_by()
+        .values("warehouse_id", "product_id")
+        .annotate(total=Sum("quantity"))
+        .values("total")
+    )
+    removed = 0
+    for start in range(0, len(duplicates), chunk_size):
+        chunk = duplicates[start : start + chunk_size]
+        keep = {(w, p): pk for w, p, pk, _ in chunk}
+        with transaction.atomic():
+            model.objects.filter(id__in=keep.values()).update(
+                quantity=Subquery(totals), updated_at=timezone.now()
+            )
+            candidates = (
+                model.objects.filter(
+                    warehouse_id__in={w for w, _ in keep},
+                    product_id__in={p for _, p in keep},
+                )
+                .exclude(id__in=keep.values())
+                .values_list("id", "warehouse_id", "product_id")
+            )
+            ids = [pk for pk, w, p in candidates if (w, p) in keep]
+            model.objects.filter(id__in=ids).delete()
+            removed += len(ids)
+    return len(duplicates), removed
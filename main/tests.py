@@ -1,3 +1,1686 @@
-from django.test import TestCase
+import base64
+import gzip
+import io
+import json
+import random
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import brotli
+import msgpack
+import numpy as np
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2SHA1PasswordHasher, make_password
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError, connection, router
+from django.db.migrations.executor import MigrationExecutor
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .factories import InventoryFactory, ProductFactory, WarehouseFactory
+from . import (
+    caching,
+    forecast,
+    importer,
+    metrics,
+    renderers,
+    reorder,
+    routers,
+    snapshots,
+    stock,
+    tokens,
+)
+from .capacity import CapacityExceeded
+from .management.commands import benchmark_routes, setup_test_data
+from .models import (
+    ApiToken,
+    Inventory,
+    InventorySnapshot,
+    InventorySnapshotRow,
+    MyUser,
+    Product,
+    ReorderAlert,
+    StockMovement,
+    Warehouse,
+)
+from .views import InventoryViewSet, WarehouseListView
+
+
+class LoggedInTestCase(TestCase):
+    """A TestCase whose client is logged in as self.user."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = MyUser.objects.create_user("tester@example.com", "pass")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+)
+class QueryCountTests(LoggedInTestCase):
+    # Query counts include the session and user lookups done by the auth
+    # middleware, so they stay the same however many inventory rows exist.
+    # The page cache is off so the counts measure the uncached path. Detail
+    # pages spend one more query on their conditional GET validators, and
+    # warehouse and product pages one on the demand history for forecasts.
+
+    def setUp(self):
+        super().setUp()
+        self.warehouse = WarehouseFactory()
+        self.product = ProductFactory()
+
+    def add_rows(self, count):
+        for _ in range(count):
+            InventoryFactory(warehouse=self.warehouse, product=ProductFactory())
+            InventoryFactory(warehouse=WarehouseFactory(), product=self.product)
+
+    def assertConstantQueries(self, num, url):
+        for rows in (1, 20):
+            self.add_rows(rows)
+            with self.assertNumQueries(num):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+    def test_inventory_list(self):
+        # The filter dropdowns no longer load every warehouse and product.
+        self.assertConstantQueries(3, reverse("inventory_list"))
+
+    def test_warehouse_detail(self):
+        self.assertConstantQueries(
+            6, reverse("warehouse_detail", kwargs={"pk": self.warehouse.id})
+        )
+
+    def test_product_detail(self):
+        self.assertConstantQueries(
+            6, reverse("product_detail", kwargs={"pk": self.product.id})
+        )
+
+    def test_inventory_detail(self):
+        inventory = InventoryFactory(warehouse=self.warehouse, product=self.product)
+        self.assertConstantQueries(
+            4, reverse("inventory_detail", kwargs={"pk": inventory.id})
+        )
+
+
+class KeysetPaginationTests(LoggedInTestCase):
+    def test_walks_all_pages_with_filter(self):
+        for i in range(7):
+            WarehouseFactory(name=f"Depot {i % 3}", location="Zagreb")
+        WarehouseFactory(name="Depot 9", location="Split")
+
+        seen = []
+        params = {"location": "Zagreb", "page_size": 3}
+        url = reverse("warehouse-list")
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            seen += [(w["name"], w["id"]) for w in response.json()["results"]]
+            url, params = response.json()["next"], None
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(seen, sorted(seen))
+
+    @mock.patch.object(WarehouseListView, "paginate_by", 2)
+    def test_previous_cursor_returns_same_page(self):
+        for i in range(5):
+            WarehouseFactory(name=f"Depot {i}")
+        url = reverse("warehouse_list")
+        page1 = self.client.get(url).context["page_obj"]
+        page2 = self.client.get(url, {"cursor": page1.next_cursor}).context["page_obj"]
+        back = self.client.get(url, {"cursor": page2.previous_cursor})
+        self.assertEqual(
+            [w.id for w in back.context["warehouses"]],
+            [w.id for w in page1.object_list],
+        )
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse("warehouse_list"), {"cursor": "bogus"})
+        self.assertEqual(response.status_code, 404)
+
+
+class SearchTests(LoggedInTestCase):
+    def test_index_follows_save_and_delete(self):
+        drill = ProductFactory(name="Cordless drill", sku="DR-100")
+        ProductFactory(name="Hammer", description="Steel head, fits any drill bit")
+        response = self.client.get(reverse("search_api"), {"q": "dri"})
+        names = [hit["name"] for hit in response.json()["results"]]
+        self.assertEqual(names, ["Cordless drill", "Hammer"])
+
+        drill.name = "Impact driver"
+        drill.save()
+        response = self.client.get(reverse("product_list"), {"name": "drill"})
+        self.assertEqual(list(response.context["products"]), [])
+
+        drill.delete()
+        response = self.client.get(reverse("search_api"), {"q": "impact"})
+        self.assertEqual(response.json()["results"], [])
+
+    def test_limit_is_clamped_and_must_be_a_number(self):
+        for i in range(3):
+            ProductFactory(name=f"Drill {i}")
+        url = reverse("search_api")
+        for limit, count in (("-1", 1), ("0", 1), ("2", 2), ("1000", 3)):
+            response = self.client.get(url, {"q": "drill", "limit": limit})
+            self.assertEqual(len(response.json()["results"]), count)
+        for limit in ("abc", "1.5", ""):
+            response = self.client.get(url, {"q": "drill", "limit": limit})
+            self.assertEqual(response.status_code, 400)
+
+    def test_list_filters_use_index(self):
+        WarehouseFactory(name="Central depot", location="Zagreb")
+        WarehouseFactory(name="Coastal depot", location="Split")
+        response = self.client.get(
+            reverse("warehouse_list"), {"name": "depot", "location": "zag"}
+        )
+        self.assertEqual(
+            [w.name for w in response.context["warehouses"]], ["Central depot"]
+        )
+
+
+class BulkApiTests(LoggedInTestCase):
+    def test_product_upsert_by_sku(self):
+        ProductFactory(sku="A-1", name="Old name")
+        items = [
+            {"name": "New name", "description": "-", "price": "1.50", "sku": "A-1"},
+            {"name": "Widget", "description": "-", "price": "2.00", "sku": "B-2"},
+        ]
+        url = reverse("product-bulk") + "?upsert=true"
+        with self.assertNumQueries(8):
+            response = self.client.post(url, items, content_type="application/json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()["created"]), 1)
+        self.assertEqual(len(response.json()["updated"]), 1)
+        self.assertEqual(Product.objects.get(sku="A-1").name, "New name")
+
+    def test_inventory_errors_are_reported_per_item(self):
+        warehouse = WarehouseFactory()
+        product = ProductFactory()
+        items = [
+            {"warehouse": warehouse.id, "product": product.id, "quantity": 5},
+            {"warehouse": 999, "product": product.id, "quantity": 5},
+            {"warehouse": warehouse.id, "product": product.id, "quantity": "x"},
+        ]
+        response = self.client.post(
+            reverse("inventory-bulk"), items, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()["errors"]
+        self.assertEqual([e["index"] for e in errors], [1, 2])
+        self.assertIn("warehouse", errors[0])
+        self.assertIn("quantity", errors[1])
+        self.assertFalse(Inventory.objects.exists())
+
+    def test_warehouse_bulk_update_and_delete(self):
+        first, second = WarehouseFactory(), WarehouseFactory()
+        response = self.client.patch(
+            reverse("warehouse-bulk"),
+            [{"id": first.id, "capacity": 10}, {"id": second.id, "name": "Renamed"}],
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.capacity, second.name), (10, "Renamed"))
+
+        response = self.client.delete(
+            reverse("warehouse-bulk"),
+            {"ids": [first.id, second.id]},
+            content_type="application/json",
+        )
+        self.assertEqual(response.json(), {"deleted": 2})
+
+    def test_warehouse_bulk_update_keeps_capacity_above_usage(self):
+        full, empty = WarehouseFactory(capacity=100), WarehouseFactory(capacity=100)
+        Warehouse.objects.filter(id=full.id).update(used_capacity=40)
+        response = self.client.patch(
+            reverse("warehouse-bulk"),
+            [{"id": full.id, "capacity": 30}, {"id": empty.id, "capacity": 30}],
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()["errors"]
+        self.assertEqual([e["index"] for e in errors], [0])
+        self.assertIn("capacity", errors[0])
+        empty.refresh_from_db()
+        self.assertEqual(empty.capacity, 100)
+
+
+class ExportTests(LoggedInTestCase):
+    def test_inventory_csv_uses_list_filters(self):
+        warehouse = WarehouseFactory(name="Main")
+        product = ProductFactory(sku="S-1", name="Bolt")
+        InventoryFactory(warehouse=warehouse, product=product, quantity=3)
+        InventoryFactory()
+        response = self.client.get(
+            reverse("export_data", args=["inventory"]), {"warehouse": warehouse.id}
+        )
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            lines[0], "id,warehouse_id,warehouse,product_id,sku,product,quantity"
+        )
+        self.assertEqual(
+            lines[1].split(",")[2:], ["Main", str(product.id), "S-1", "Bolt", "3"]
+        )
+        self.assertEqual(len(lines), 2)
+
+    def test_gzip_ndjson(self):
+        WarehouseFactory(name="Main", location="Zagreb", capacity=10)
+        response = self.client.get(
+            reverse("export_data", args=["warehouses"]),
+            {"format": "ndjson", "gzip": "1"},
+        )
+        body = gzip.decompress(b"".join(response.streaming_content))
+        row = json.loads(body.decode().splitlines()[0])
+        self.assertEqual(row["location"], "Zagreb")
+
+    def test_invalid_filters_are_rejected_before_streaming(self):
+        for kind, params, field in (
+            ("products", {"min_price": "abc"}, "min_price"),
+            ("inventory", {"warehouse": "abc"}, "warehouse"),
+        ):
+            response = self.client.get(reverse("export_data", args=[kind]), params)
+            self.assertEqual(response.status_code, 400)
+            self.assertIn(field, response.json())
+
+
+class ImportTests(LoggedInTestCase):
+    def test_upsert_and_rejects(self):
+        warehouse = WarehouseFactory(name="Main")
+        product = ProductFactory(sku="S-1")
+        other = ProductFactory(sku="S-2")
+        InventoryFactory(warehouse=warehouse, product=product, quantity=1)
+        upload = SimpleUploadedFile(
+            "stock.csv",
+            b"sku,warehouse,quantity\n"
+            b"S-1,Main,10\n"
+            b"S-2,Main,4\n"
+            b"S-3,Main,4\n"
+            b"S-2,Nowhere,4\n"
+            b"S-2,Main,-1\n",
+        )
+        response = self.client.post(reverse("inventory-import-csv"), {"file": upload})
+        self.assertEqual(response.status_code, 200)
+        stats = response.json()["stats"]
+        self.assertEqual(
+            (stats["rows"], stats["created"], stats["updated"], stats["rejected"]),
+            (5, 1, 1, 3),
+        )
+        self.assertEqual(
+            [r["line"] for r in response.json()["rejected"]], [4, 5, 6]
+        )
+        self.assertEqual(
+            Inventory.objects.get(warehouse=warehouse, product=product).quantity, 10
+        )
+        self.assertEqual(
+            Inventory.objects.get(warehouse=warehouse, product=other).quantity, 4
+        )
+
+
+class StockLedgerTests(LoggedInTestCase):
+    def setUp(self):
+        super().setUp()
+        self.warehouse = WarehouseFactory()
+        self.product = ProductFactory()
+
+    def post_movement(self, kind, quantity):
+        return self.client.post(
+            reverse("stockmovement-list"),
+            {
+                "warehouse": self.warehouse.id,
+                "product": self.product.id,
+                "kind": kind,
+                "quantity": quantity,
+            },
+        )
+
+    def balance(self):
+        return Inventory.objects.get(
+            warehouse=self.warehouse, product=self.product
+        ).quantity
+
+    def test_movements_update_balance(self):
+        self.assertEqual(self.post_movement("receipt", 10).status_code, 201)
+        self.assertEqual(self.post_movement("shipment", 4).status_code, 201)
+        self.assertEqual(self.balance(), 6)
+        self.assertEqual(self.post_movement("shipment", 7).status_code, 400)
+        self.assertEqual(self.post_movement("adjustment", -1).status_code, 201)
+        self.assertEqual(self.balance(), 5)
+        self.assertEqual(stock.reconcile(), [])
+
+    def test_edit_form_is_recorded_and_drift_is_fixed(self):
+        self.post_movement("receipt", 10)
+        inventory = Inventory.objects.get()
+        self.client.post(
+            reverse("edit_inventory", args=[inventory.id]),
+            {
+                "warehouse": self.warehouse.id,
+                "product": self.product.id,
+                "quantity": 3,
+            },
+        )
+        self.assertEqual(
+            list(StockMovement.objects.values_list("quantity", flat=True)), [10, -7]
+        )
+        self.assertEqual(stock.reconcile(), [])
+
+        Inventory.objects.update(quantity=50)
+        drift = stock.reconcile(fix=True)
+        self.assertEqual(drift, [(self.warehouse.id, self.product.id, 50, 3)])
+        self.assertEqual(self.balance(), 3)
+
+    def test_filters_reject_ids_that_are_not_numbers(self):
+        self.post_movement("receipt", 10)
+        for url in (reverse("stockmovement-list"), reverse("inventory-list")):
+            response = self.client.get(url, {"warehouse": "abc"})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {"warehouse": ["Must be an id"]})
+        response = self.client.get(reverse("inventory_list"), {"product": "abc"})
+        self.assertEqual(response.status_code, 404)
+
+
+class TransferTests(LoggedInTestCase):
+    def setUp(self):
+        super().setUp()
+        self.source, self.target = WarehouseFactory(), WarehouseFactory()
+        self.product = ProductFactory()
+        stock.record_movement(
+            self.source.id, self.product.id, StockMovement.RECEIPT, 10
+        )
+
+    def transfer(self, *quantities):
+        return self.client.post(
+            reverse("transfer_api"),
+            [
+                {
+                    "product": self.product.id,
+                    "from_warehouse": self.source.id,
+                    "to_warehouse": self.target.id,
+                    "quantity": quantity,
+                }
+                for quantity in quantities
+            ],
+            content_type="application/json",
+        )
+
+    def test_batch_is_all_or_nothing(self):
+        response = self.transfer(4, 3)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            StockMovement.objects.filter(reference=response.json()["reference"]).count(),
+            4,
+        )
+        self.assertEqual(self.transfer(2, 2).status_code, 400)
+        balances = dict(Inventory.objects.values_list("warehouse_id", "quantity"))
+        self.assertEqual(balances, {self.source.id: 3, self.target.id: 7})
+
+    def test_empty_batch_is_rejected_without_locking(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.transfer().status_code, 400)
+            stock.transfer([])
+        updates = [q for q in queries.captured_queries if "UPDATE" in q["sql"]]
+        self.assertEqual(updates, [])
+
+    def test_lock_timeout_asks_the_client_to_retry(self):
+        locked = OperationalError("database is locked")
+        with mock.patch.object(stock, "transfer", side_effect=locked):
+            response = self.transfer(1)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+
+
+class TransferConcurrencyTests(TransactionTestCase):
+    threads = 8
+    transfers_per_thread = 25
+
+    def test_concurrent_transfers_keep_stock_consistent(self):
+        warehouses = [WarehouseFactory().id for _ in range(4)]
+        product = ProductFactory().id
+        for warehouse in warehouses:
+            stock.record_movement(warehouse, product, StockMovement.RECEIPT, 100)
+        errors = []
+
+        def worker(seed):
+            rng = random.Random(seed)
+            try:
+                for _ in range(self.transfers_per_thread):
+                    a, b = rng.sample(warehouses, 2)
+                    # Opposite directions in one batch would deadlock without
+                    # consistent lock ordering.
+                    batch = [
+                        (product, a, b, rng.randint(1, 40)),
+                        (product, b, a, rng.randint(1, 40)),
+                    ]
+                    try:
+                        stock.transfer(batch)
+                    except stock.InsufficientStock:
+                        pass
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        workers = [
+            threading.Thread(target=worker, args=(i,)) for i in range(self.threads)
+        ]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        quantities = list(Inventory.objects.values_list("quantity", flat=True))
+        self.assertEqual(sum(quantities), 400)
+        self.assertTrue(all(q >= 0 for q in quantities))
+        self.assertEqual(stock.reconcile(), [])
+
+    def test_transfers_take_the_write_lock_as_they_begin(self):
+        source, target = WarehouseFactory(), WarehouseFactory()
+        product = ProductFactory()
+        stock.record_movement(source.id, product.id, StockMovement.RECEIPT, 5)
+        connection.ensure_connection()
+        # As with the stock profile, whose transactions are deferred.
+        with mock.patch.object(connection, "transaction_mode", None):
+            with CaptureQueriesContext(connection) as queries:
+                stock.transfer([(product.id, source.id, target.id, 1)])
+            self.assertIsNone(connection.transaction_mode)
+        self.assertEqual(queries.captured_queries[0]["sql"], "BEGIN IMMEDIATE")
+
+
+class ImportConcurrencyTests(TransactionTestCase):
+    rounds = 30
+
+    def test_imports_racing_movements_keep_the_ledger_consistent(self):
+        warehouse = WarehouseFactory(name="Main", capacity=1_000_000)
+        product = ProductFactory(sku="S-1")
+        stock.record_movement(warehouse.id, product.id, StockMovement.RECEIPT, 1)
+        errors = []
+
+        def run(work):
+            try:
+                for i in range(self.rounds):
+                    work(i)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        def receive(i):
+            stock.record_movement(
+                warehouse.id, product.id, StockMovement.RECEIPT, 1
+            )
+
+        def load(i):
+            importer.import_inventory(["sku,warehouse,quantity", f"S-1,Main,{i}"])
+
+        workers = [
+            threading.Thread(target=run, args=(work,))
+            for work in (receive, receive, load, load)
+        ]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(stock.reconcile(), [])
+
+
+class BulkConcurrencyTests(TransactionTestCase):
+    rounds = 20
+
+    def test_bulk_writes_racing_movements_keep_the_ledger_consistent(self):
+        user = MyUser.objects.create_user("tester@example.com", "pass")
+        warehouse = WarehouseFactory(capacity=1_000_000)
+        product = ProductFactory()
+        stock.record_movement(warehouse.id, product.id, StockMovement.RECEIPT, 1)
+        inventory = Inventory.objects.get()
+        url = reverse("inventory-bulk")
+        errors = []
+
+        def run(work):
+            client = self.client_class()
+            client.force_login(user)
+            try:
+                for i in range(self.rounds):
+                    work(client, i)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        def receive(client, i):
+            stock.record_movement(warehouse.id, product.id, StockMovement.RECEIPT, 1)
+
+        def patch(client, i):
+            response = client.patch(
+                url, [{"id": inventory.id, "quantity": i}], "application/json"
+            )
+            assert response.status_code == 200, response.content
+
+        def upsert(client, i):
+            response = client.post(
+                url + "?upsert=1",
+                [{"warehouse": warehouse.id, "product": product.id, "quantity": i}],
+                "application/json",
+            )
+            assert response.status_code == 201, response.content
+
+        workers = [
+            threading.Thread(target=run, args=(work,))
+            for work in (receive, receive, patch, upsert)
+        ]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(stock.reconcile(), [])
+        warehouse.refresh_from_db()
+        self.assertEqual(warehouse.used_capacity, Inventory.objects.get().quantity)
+
+
+class CapacityTests(LoggedInTestCase):
+    def setUp(self):
+        super().setUp()
+        self.warehouse = WarehouseFactory(capacity=100)
+        self.product = ProductFactory()
+
+    def used(self):
+        self.warehouse.refresh_from_db()
+        return self.warehouse.used_capacity
+
+    def test_usage_follows_writes_and_capacity_is_enforced(self):
+        stock.record_movement(
+            self.warehouse.id, self.product.id, StockMovement.RECEIPT, 60
+        )
+        with self.assertRaises(CapacityExceeded):
+            stock.record_movement(
+                self.warehouse.id, ProductFactory().id, StockMovement.RECEIPT, 41
+            )
+        self.assertEqual(self.used(), 60)
+
+        inventory = Inventory.objects.get()
+        response = self.client.post(
+            reverse("edit_inventory", args=[inventory.id]),
+            {
+                "warehouse": self.warehouse.id,
+                "product": self.product.id,
+                "quantity": 101,
+            },
+        )
+        self.assertContains(response, "no room")
+        self.assertEqual(self.used(), 60)
+
+        self.product.delete()
+        self.assertEqual(self.used(), 0)
+
+    def test_warehouse_list_shows_utilization(self):
+        stock.record_movement(
+            self.warehouse.id, self.product.id, StockMovement.RECEIPT, 25
+        )
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("warehouse-list"))
+        self.assertEqual(response.json()["results"][0]["utilization"], 25.0)
+
+
+class CacheTests(LoggedInTestCase):
+    # Invalidation happens on commit, which TestCase only simulates inside
+    # captureOnCommitCallbacks().
+
+    def setUp(self):
+        cache.clear()
+        caching.reset_stats()
+        super().setUp()
+        self.inventory = InventoryFactory(
+            quantity=5, warehouse=WarehouseFactory(capacity=10000)
+        )
+
+    def test_list_page_is_cached_until_a_write(self):
+        url = reverse("warehouse_list")
+        self.client.get(url)
+        with self.assertNumQueries(2):
+            self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            WarehouseFactory(name="Aardvark depot")
+        self.assertContains(self.client.get(url), "Aardvark depot")
+        self.assertEqual(
+            caching.stats()["views"]["list.WarehouseListView"],
+            {"hits": 1, "misses": 2},
+        )
+
+    def test_detail_pages_follow_stock_movements(self):
+        urls = [
+            reverse("inventory_detail", args=[self.inventory.id]),
+            reverse("warehouse_detail", args=[self.inventory.warehouse_id]),
+            reverse("product_detail", args=[self.inventory.product_id]),
+        ]
+        for url in urls:
+            self.assertContains(self.client.get(url), "5")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            stock.record_movement(
+                self.inventory.warehouse_id,
+                self.inventory.product_id,
+                StockMovement.RECEIPT,
+                4032,
+            )
+        for url in urls:
+            self.assertContains(self.client.get(url), "4037")
+        self.assertEqual(caching.stats()["hits"], 0)
+
+    def test_stats_api(self):
+        url = reverse("product_list")
+        self.client.get(url)
+        self.client.get(url)
+        response = self.client.get(reverse("cache_stats_api"))
+        self.assertEqual(response.json()["hits"], 1)
+        self.assertEqual(response.json()["misses"], 1)
+
+
+class ConditionalGetTests(LoggedInTestCase):
+    def setUp(self):
+        super().setUp()
+        self.inventory = InventoryFactory(quantity=5)
+
+    def assertRevalidates(self, url, change):
+        response = self.client.get(url)
+        etag = response.headers["ETag"]
+        self.assertIn("Last-Modified", response.headers)
+
+        # Session, user and the validator query only.
+        with self.assertNumQueries(3):
+            response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers["ETag"], etag)
+
+        change()
+        response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+
+    def receive(self):
+        stock.record_movement(
+            self.inventory.warehouse_id,
+            self.inventory.product_id,
+            StockMovement.RECEIPT,
+            1,
+        )
+
+    def test_api_list_and_retrieve(self):
+        warehouse = self.inventory.warehouse
+        self.assertRevalidates(reverse("warehouse-list"), self.receive)
+        self.assertRevalidates(
+            reverse("warehouse-detail", args=[warehouse.id]),
+            lambda: self.client.patch(
+                reverse("warehouse-detail", args=[warehouse.id]),
+                {"location": "Elsewhere"},
+                content_type="application/json",
+            ),
+        )
+
+    def test_list_etag_changes_on_delete(self):
+        WarehouseFactory()
+        self.assertRevalidates(
+            reverse("warehouse-list"), lambda: self.inventory.warehouse.delete()
+        )
+
+    def test_detail_pages(self):
+        product = self.inventory.product
+        self.assertRevalidates(
+            reverse("inventory_detail", args=[self.inventory.id]), self.receive
+        )
+        self.assertRevalidates(
+            reverse("warehouse_detail", args=[self.inventory.warehouse_id]),
+            lambda: Product.objects.filter(id=product.id).update(
+                name="Renamed", updated_at=timezone.now()
+            ),
+        )
+        self.assertRevalidates(
+            reverse("product_detail", args=[product.id]),
+            lambda: self.inventory.delete(),
+        )
+
+    def test_etag_is_per_user(self):
+        url = reverse("product_detail", args=[self.inventory.product_id])
+        etag = self.client.get(url).headers["ETag"]
+        self.client.force_login(MyUser.objects.create_user("other@example.com"))
+        response = self.client.get(url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+
+
+class AutocompleteTests(LoggedInTestCase):
+    def setUp(self):
+        super().setUp()
+        self.warehouse = WarehouseFactory(name="Harbour")
+        self.products = [
+            ProductFactory(name=f"Widget {i:02d}", sku=f"WID-{i:02d}")
+            for i in range(25)
+        ]
+        ProductFactory(name="Gadget", sku="GAD-1")
+
+    def autocomplete(self, kind, **params):
+        response = self.client.get(reverse("autocomplete_api", args=[kind]), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_prefix_search_is_paged(self):
+        page = self.autocomplete("products", q="widg")
+        self.assertEqual(len(page["results"]), 20)
+        self.assertEqual(page["results"][0]["text"], "Widget 00 (WID-00)")
+        rest = self.client.get(page["next"]).json()
+        self.assertEqual(len(rest["results"]), 5)
+        self.assertIsNone(rest["next"])
+
+        self.assertEqual(
+            [r["text"] for r in self.autocomplete("products", q="gad")["results"]],
+            ["Gadget (GAD-1)"],
+        )
+        self.assertEqual(
+            self.autocomplete("warehouses", q="harb")["results"],
+            [{"id": self.warehouse.id, "text": "Harbour"}],
+        )
+        response = self.client.get(reverse("autocomplete_api", args=["users"]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_form_renders_only_the_selected_option(self):
+        inventory = InventoryFactory(
+            warehouse=self.warehouse, product=self.products[3], quantity=1
+        )
+        response = self.client.get(reverse("edit_inventory", args=[inventory.id]))
+        self.assertContains(response, 'data-autocomplete="/api/autocomplete/')
+        self.assertContains(response, "Widget 03 (WID-03)")
+        self.assertNotContains(response, "Widget 04")
+        self.assertContains(response, "autocomplete.js")
+
+    def test_submitted_ids_are_validated(self):
+        response = self.client.post(
+            reverse("add_inventory"),
+            {"warehouse": self.warehouse.id, "product": 0, "quantity": 1},
+        )
+        self.assertContains(response, "Select a valid choice")
+        self.assertFalse(Inventory.objects.exists())
+
+
+class DedupeTests(TransactionTestCase):
+    def migrate_to_old_schema(self):
+        old = [("main", "0006_updated_at")]
+        executor = MigrationExecutor(connection)
+        executor.migrate(old)
+        return executor.loader.project_state(old).apps
+
+    def migrate_to_latest(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes("main"))
+
+    def test_duplicates_are_merged_before_the_constraint(self):
+        apps = self.migrate_to_old_schema()
+        OldInventory = apps.get_model("main", "Inventory")
+        warehouse = apps.get_model("main", "Warehouse").objects.create(
+            name="A", location="B", capacity=100
+        )
+        Product = apps.get_model("main", "Product")
+        products = [
+            Product.objects.create(name="P", description="D", price=1, sku=sku)
+            for sku in ("1", "2")
+        ]
+        OldInventory.objects.bulk_create(
+            OldInventory(warehouse=warehouse, product=product, quantity=quantity)
+            for product, quantity in [
+                (products[0], 2),
+                (products[0], 3),
+                (products[0], 4),
+                (products[1], 5),
+                (products[1], 6),
+            ]
+        )
+
+        self.assertEqual(stock.merge_duplicates(OldInventory, dry_run=True), (2, 3))
+        self.assertEqual(stock.merge_duplicates(OldInventory, chunk_size=1), (2, 3))
+
+        self.migrate_to_latest()
+        self.assertEqual(
+            sorted(Inventory.objects.values_list("quantity", flat=True)), [9, 11]
+        )
+
+    def test_migration_merges_duplicates_left_behind(self):
+        apps = self.migrate_to_old_schema()
+        OldInventory = apps.get_model("main", "Inventory")
+        warehouse = apps.get_model("main", "Warehouse").objects.create(
+            name="A", location="B", capacity=100
+        )
+        product = apps.get_model("main", "Product").objects.create(
+            name="P", description="D", price=1, sku="1"
+        )
+        first = OldInventory.objects.create(
+            warehouse=warehouse, product=product, quantity=2
+        )
+        OldInventory.objects.create(warehouse=warehouse, product=product, quantity=3)
+
+        self.migrate_to_latest()
+        self.assertEqual(
+            list(Inventory.objects.values_list("id", "quantity")), [(first.id, 5)]
+        )
+
+
+class IndexBenchmarkTests(TransactionTestCase):
+    def test_old_schema_is_queried_through_historical_models(self):
+        InventoryFactory()
+        configured = connection.settings_dict["NAME"]
+        migrated = []
+        migrate = MigrationExecutor.migrate
+
+        def record(executor, *args, **kwargs):
+            migrated.append(executor.connection.settings_dict["NAME"])
+            return migrate(executor, *args, **kwargs)
+
+        out = io.StringIO()
+        with mock.patch.object(MigrationExecutor, "migrate", record):
+            call_command("benchmark_indexes", repeat=1, stdout=out)
+        self.assertEqual(out.getvalue().count("before:"), 5)
+        # Only a scratch copy is migrated back; the configured database keeps
+        # the current schema and its migration history.
+        self.assertEqual(len(migrated), 1)
+        self.assertNotEqual(migrated[0], configured)
+        self.assertEqual(connection.settings_dict["NAME"], configured)
+        self.assertEqual(Inventory.objects.get().reorder_point, 0)
+        applied = MigrationExecutor(connection).loader.applied_migrations
+        self.assertIn(("main", "0007_inventory_unique_and_indexes"), applied)
+
+
+class ReorderTests(LoggedInTestCase):
+    def setUp(self):
+        super().setUp()
+        self.warehouse = WarehouseFactory(capacity=10000)
+        self.product = ProductFactory(name="Bolts")
+        stock.record_movement(
+            self.warehouse.id, self.product.id, StockMovement.RECEIPT, 100
+        )
+        self.inventory = Inventory.objects.get()
+        self.inventory.reorder_point = 50
+        self.inventory.safety_stock = 10
+        self.inventory.save()
+
+    def ship(self, quantity, days_ago=0):
+        movement = stock.record_movement(
+            self.warehouse.id, self.product.id, StockMovement.SHIPMENT, -quantity
+        )
+        StockMovement.objects.filter(id=movement.id).update(
+            created_at=timezone.now() - timedelta(days=days_ago)
+        )
+
+    def test_suggestion_covers_recent_demand(self):
+        stock.record_movement(
+            self.warehouse.id, self.product.id, StockMovement.RECEIPT, 400
+        )
+        self.ship(400, days_ago=60)  # Outside the window, ignored.
+        self.ship(20, days_ago=20)
+        self.ship(41, days_ago=5)
+        self.assertEqual(reorder.evaluate(window_days=30, cover_days=30), 1)
+
+        alert = ReorderAlert.objects.get()
+        self.assertEqual(alert.quantity, 39)
+        self.assertAlmostEqual(alert.daily_demand, 61 / 30)
+        # 61 units of demand to cover, plus 10 safety stock, minus 39 on hand.
+        self.assertEqual(alert.suggested_quantity, 32)
+
+        # Never less than the reorder point when demand is low.
+        self.assertEqual(reorder.evaluate(window_days=30, cover_days=1), 1)
+        self.assertEqual(ReorderAlert.objects.get().suggested_quantity, 21)
+
+    def test_pairs_above_threshold_or_without_one_are_ignored(self):
+        self.ship(50)
+        InventoryFactory(quantity=0, reorder_point=0)
+        self.assertEqual(reorder.evaluate(), 1)
+        self.ship(1)
+        stock.record_movement(
+            self.warehouse.id, self.product.id, StockMovement.RECEIPT, 60
+        )
+        self.assertEqual(reorder.evaluate(), 0)
+        self.assertFalse(ReorderAlert.objects.exists())
+
+    def test_api_and_home(self):
+        self.ship(70)
+        response = self.client.post(reverse("reorderalert-evaluate"), {})
+        self.assertEqual(response.json(), {"alerts": 1})
+        results = self.client.get(reverse("reorderalert-list")).json()["results"]
+        self.assertEqual(results[0]["suggested_quantity"], 30)
+        response = self.client.get(reverse("reorderalert-list"), {"product": "x"})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(reverse("home"))
+        self.assertContains(response, "Low Stock (1)")
+        self.assertContains(response, "Bolts")
+
+    def test_setup_test_data_replaces_alerts_and_snapshots(self):
+        self.ship(70)
+        reorder.evaluate()
+        snapshot = snapshots.take(timezone.localdate() - timedelta(days=1))
+        InventorySnapshotRow.objects.create(
+            snapshot=snapshot,
+            warehouse=self.warehouse,
+            product=self.product,
+            quantity=30,
+        )
+        call_command(
+            "setup_test_data",
+            warehouses=2,
+            products=2,
+            inventories=3,
+            seed=1,
+            no_search_index=True,
+            stdout=io.StringIO(),
+        )
+        self.assertFalse(ReorderAlert.objects.exists())
+        self.assertFalse(InventorySnapshot.objects.exists())
+        self.assertEqual(Inventory.objects.count(), 3)
+        connection.check_constraints()
+
+    def test_setup_test_data_fills_reorder_levels(self):
+        call_command(
+            "setup_test_data",
+            warehouses=2,
+            products=3,
+            inventories=6,
+            seed=1,
+            no_search_index=True,
+            stdout=io.StringIO(),
+        )
+        levels = list(Inventory.objects.values_list("reorder_point", "safety_stock"))
+        self.assertEqual(len(levels), 6)
+        self.assertTrue(all(safety <= point for point, safety in levels))
+        reorder.evaluate()
+
+        # Columns the generator leaves out are written with model defaults.
+        command = setup_test_data.Command(stdout=io.StringIO())
+        command.create(
+            Inventory,
+            ["warehouse_id", "product_id", "quantity"],
+            1,
+            10,
+            lambda start, count: [(WarehouseFactory().id, ProductFactory().id, 5)],
+        )
+        self.assertEqual(
+            Inventory.objects.filter(quantity=5)
+            .values_list("reorder_point", "safety_stock")
+            .get(),
+            (0, 0),
+        )
+
+
+class ForecastTests(LoggedInTestCase):
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+
+    def test_statistics_match_a_plain_loop(self):
+        rng = np.random.default_rng(1)
+        demand = rng.integers(0, 10, (50, 40)).astype(np.float32)
+        quantity = rng.integers(0, 100, 50).astype(np.float32)
+        stats = forecast.compute(quantity, demand, alpha=0.2)
+
+        for i in range(50):
+            level = demand[i, 0]
+            for value in demand[i, 1:]:
+                level += 0.2 * (value - level)
+            self.assertAlmostEqual(stats["smoothed"][i], level, places=3)
+            self.assertAlmostEqual(stats["average_7"][i], demand[i, -7:].mean(), 5)
+            if level > 0:
+                cover = stats["days_of_cover"][i]
+                self.assertAlmostEqual(cover, quantity[i] / level, places=2)
+
+    def test_movements_are_matched_to_their_series(self):
+        rows = np.array([[10, 1, 5, 0], [11, 2, 5, 0], [12, 1, 6, 0]])
+        movements = np.array([[2, 5, 3, 7], [1, 6, 0, 4], [9, 9, 1, 1]])
+        demand = forecast.demand_matrix(rows, movements, 4)
+        self.assertEqual(demand.tolist(), [[0, 0, 0, 0], [0, 0, 0, 7], [4, 0, 0, 0]])
+
+    def test_api_and_detail_pages(self):
+        warehouse = WarehouseFactory(capacity=10000)
+        product = ProductFactory()
+        for quantity in (100, -7, -7):
+            kind = StockMovement.RECEIPT if quantity > 0 else StockMovement.SHIPMENT
+            stock.record_movement(warehouse.id, product.id, kind, quantity)
+
+        results = self.client.get(
+            reverse("forecast_api"), {"product": product.id}
+        ).json()["results"]
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]["quantity"], 86)
+        self.assertEqual(results[0]["average_7"], 2.0)
+        self.assertEqual(results[0]["smoothed"], 4.2)
+        self.assertEqual(results[0]["days_of_cover"], 20.5)
+        response = self.client.get(reverse("forecast_api"), {"warehouse": "abc"})
+        self.assertEqual(response.status_code, 400)
+
+        for url in (
+            reverse("warehouse_detail", args=[warehouse.id]),
+            reverse("product_detail", args=[product.id]),
+        ):
+            self.assertContains(self.client.get(url), "20.5 days")
+
+
+class SnapshotTests(LoggedInTestCase):
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        self.warehouse = WarehouseFactory(capacity=10000)
+        self.product = ProductFactory(name="Bolts")
+        self.today = timezone.localdate()
+        self.move(100, days_ago=10)
+        self.move(-30, days_ago=6)
+        self.move(-20, days_ago=2)
+        self.inventory = Inventory.objects.get()
+
+    def move(self, quantity, days_ago):
+        kind = StockMovement.RECEIPT if quantity > 0 else StockMovement.SHIPMENT
+        movement = stock.record_movement(
+            self.warehouse.id, self.product.id, kind, quantity
+        )
+        StockMovement.objects.filter(id=movement.id).update(
+            created_at=timezone.now() - timedelta(days=days_ago)
+        )
+
+    def balances(self, day):
+        moment = snapshots.close_of(self.today - timedelta(days=day))
+        return list(
+            snapshots.as_of(Inventory.objects.all(), moment).values_list(
+                "quantity_as_of", flat=True
+            )
+        )
+
+    def test_snapshots_agree_with_the_ledger(self):
+        expected = {day: self.balances(day) for day in range(12)}
+        self.assertEqual(expected[11], [])
+        self.assertEqual(expected[8], [100])
+        self.assertEqual(expected[4], [70])
+        self.assertEqual(expected[0], [50])
+
+        taken = list(
+            snapshots.take_range(
+                self.today - timedelta(days=9), self.today - timedelta(days=5)
+            )
+        )
+        self.assertEqual([s.row_count for s in taken], [1, 1, 1, 1, 1])
+        self.assertEqual(taken[-1].rows.get().quantity, 70)
+        for day in range(12):
+            self.assertEqual(self.balances(day), expected[day])
+
+        # Retaking a day replaces its snapshot.
+        snapshots.take(self.today - timedelta(days=7))
+        self.assertEqual(snapshots.InventorySnapshot.objects.count(), len(taken))
+        with self.assertRaises(ValueError):
+            snapshots.take(self.today)
+
+    def test_views_accept_as_of(self):
+        snapshots.take(self.today - timedelta(days=5))
+        as_of = str(self.today - timedelta(days=4))
+
+        response = self.client.get(reverse("inventory-list"), {"as_of": as_of})
+        self.assertEqual(
+            response.json()["results"],
+            [
+                {
+                    "id": self.inventory.id,
+                    "warehouse": self.warehouse.id,
+                    "product": self.product.id,
+                    "quantity": 70,
+                }
+            ],
+        )
+        self.assertEqual(
+            self.client.get(reverse("inventory-list")).json()["results"][0][
+                "quantity"
+            ],
+            50,
+        )
+        response = self.client.get(reverse("inventory-list"), {"as_of": "soon"})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(reverse("inventory_list"), {"as_of": as_of})
+        self.assertContains(response, "Quantity: 70")
+        response = self.client.get(
+            reverse("warehouse_detail", args=[self.warehouse.id]), {"as_of": as_of}
+        )
+        self.assertContains(response, "Quantity: 70")
+        response = self.client.get(
+            reverse("warehouse_detail", args=[self.warehouse.id]),
+            {"as_of": str(self.today - timedelta(days=11))},
+        )
+        self.assertContains(response, "No inventories.")
+        response = self.client.get(reverse("inventory_list"), {"as_of": "soon"})
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+)
+class AsyncViewTests(LoggedInTestCase):
+    def setUp(self):
+        super().setUp()
+        self.warehouse = WarehouseFactory(name="Central", capacity=10000)
+        self.product = ProductFactory(name="Bolts")
+        self.inventory = InventoryFactory(
+            warehouse=self.warehouse, product=self.product, quantity=5
+        )
+
+    async def test_api_matches_sync_api(self):
+        await self.async_client.aforce_login(self.user)
+        for async_name, sync_name in (
+            ("async_api_warehouse_list", "warehouse-list"),
+            ("async_api_warehouse_detail", "warehouse-detail"),
+        ):
+            kwargs = {"pk": self.warehouse.id} if "detail" in sync_name else {}
+            expected = await sync_to_async(self.client.get)(
+                reverse(sync_name, kwargs=kwargs)
+            )
+            response = await self.async_client.get(reverse(async_name, kwargs=kwargs))
+            self.assertEqual(response.json(), expected.json())
+
+        for name in ("Anchors", "Washers"):
+            await sync_to_async(ProductFactory)(name=name)
+        expected = await sync_to_async(self.client.get)(
+            reverse("product-list"), {"page_size": 2}
+        )
+        response = await self.async_client.get(
+            reverse("async_api_product_list"), {"page_size": 2}
+        )
+        self.assertEqual(response.json()["results"], expected.json()["results"])
+        self.assertEqual(
+            [row["name"] for row in response.json()["results"]], ["Anchors", "Bolts"]
+        )
+        for name, params in (
+            ("async_api_product_list", {"min_price": "abc"}),
+            ("async_api_inventory_list", {"warehouse": "abc"}),
+        ):
+            response = await self.async_client.get(reverse(name), params)
+            self.assertEqual(response.status_code, 400)
+
+        response = await self.async_client.get(
+            reverse("async_api_inventory_list"), {"page_size": 1}
+        )
+        self.assertEqual(
+            response.json()["results"],
+            [
+                {
+                    "id": self.inventory.id,
+                    "warehouse": self.warehouse.id,
+                    "product": self.product.id,
+                    "quantity": 5,
+                    "reorder_point": 0,
+                    "safety_stock": 0,
+                }
+            ],
+        )
+        response = await self.async_client.get(
+            reverse("async_api_product_detail", kwargs={"pk": 0})
+        )
+        self.assertEqual(response.status_code, 404)
+        response = await self.async_client.get(
+            reverse("async_api_inventory_list"), {"as_of": "soon"}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    async def test_pages(self):
+        await self.async_client.aforce_login(self.user)
+        for name, kwargs, text in (
+            ("async_warehouse_list", {}, "Central"),
+            ("async_product_list", {}, "Bolts"),
+            ("async_inventory_list", {}, "Bolts"),
+            ("async_warehouse_detail", {"pk": self.warehouse.id}, "Bolts"),
+            ("async_product_detail", {"pk": self.product.id}, "Central"),
+            ("async_inventory_detail", {"pk": self.inventory.id}, "Central"),
+        ):
+            response = await self.async_client.get(reverse(name, kwargs=kwargs))
+            self.assertContains(response, text)
+            self.assertContains(response, "tester@example.com")
+
+    async def test_login_required(self):
+        response = await self.async_client.get(reverse("async_warehouse_list"))
+        self.assertEqual(response.status_code, 302)
+        response = await self.async_client.get(reverse("async_api_product_list"))
+        expected = await sync_to_async(self.client_class().get)(
+            reverse("product-list")
+        )
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response["WWW-Authenticate"], expected["WWW-Authenticate"])
+
+    async def test_api_accepts_basic_and_token_auth(self):
+        _, key = await sync_to_async(tokens.issue)(self.user)
+        basic = base64.b64encode(b"tester@example.com:pass").decode()
+        url = reverse("async_api_product_list")
+        for authorization, status in (
+            (f"Token {key}", 200),
+            (f"Basic {basic}", 200),
+            ("Token wrong", 401),
+        ):
+            response = await self.async_client.get(
+                url, headers={"Authorization": authorization}
+            )
+            self.assertEqual(response.status_code, status, authorization)
+
+
+class SqliteProfileTests(TestCase):
+    def test_tuned_profile_is_applied(self):
+        if settings.SQLITE_PROFILE != "tuned":
+            self.skipTest("Runs with the tuned SQLite profile")
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], "wal")
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+        self.assertEqual(connection.transaction_mode, "IMMEDIATE")
+        self.assertEqual(connection.settings_dict["CONN_MAX_AGE"], 600)
+
+    def test_benchmark_refuses_to_write_to_the_configured_database(self):
+        with self.assertRaisesMessage(CommandError, "needs --database"):
+            call_command("benchmark_sqlite", run=True)
+        with self.assertRaisesMessage(CommandError, "Refusing"):
+            call_command(
+                "benchmark_sqlite",
+                run=True,
+                database=str(settings.DATABASES["default"]["NAME"]),
+            )
+
+
+@override_settings(
+    DATABASE_ROUTERS=["main.routers.ReplicaRouter"],
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}},
+)
+class ReplicaRoutingTests(LoggedInTestCase):
+    # Two SQLite files: rows written straight to the replica stand in for
+    # data replicated there, and differ from the primary's on purpose.
+    databases = {"default", "replica"}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = MyUser.objects.create_user(
+            "tester@example.com", "pass", is_admin=True
+        )
+
+    def setUp(self):
+        super().setUp()
+        Warehouse.objects.create(name="Primary", location="A", capacity=10)
+        Warehouse.objects.using("replica").create(
+            name="Replica", location="B", capacity=10
+        )
+
+    def test_reads_go_to_the_replica(self):
+        for url in (reverse("warehouse_list"), reverse("async_warehouse_list")):
+            response = self.client.get(url)
+            self.assertContains(response, "Replica")
+            self.assertNotContains(response, "Primary")
+        results = self.client.get(reverse("warehouse-list")).json()["results"]
+        self.assertEqual([w["name"] for w in results], ["Replica"])
+        self.assertEqual(router.db_for_read(Warehouse), "default")
+        self.assertEqual(router.db_for_read(MyUser), "default")
+
+    def test_writes_pin_reads_to_the_primary(self):
+        response = self.client.post(
+            reverse("add_warehouse"),
+            {"name": "New", "location": "C", "capacity": 5},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Warehouse.objects.filter(name="New").exists())
+        self.assertFalse(
+            Warehouse.objects.using("replica").filter(name="New").exists()
+        )
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+
+        response = self.client.get(reverse("warehouse_list"))
+        self.assertContains(response, "New")
+        self.assertContains(response, "Primary")
+        self.assertNotContains(response, "Replica")
+
+        del self.client.cookies[routers.PIN_COOKIE]
+        self.assertContains(self.client.get(reverse("warehouse_list")), "Replica")
+
+    @override_settings(
+        CACHES={
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        }
+    )
+    def test_pinned_reads_skip_pages_cached_from_the_replica(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse("add_warehouse"),
+                {"name": "New", "location": "C", "capacity": 5},
+            )
+        pin = self.client.cookies[routers.PIN_COOKIE]
+        # An unpinned read caches the lagging replica's page at the new version.
+        del self.client.cookies[routers.PIN_COOKIE]
+        self.assertNotContains(self.client.get(reverse("warehouse_list")), "New")
+        self.client.cookies[routers.PIN_COOKIE] = pin
+        self.assertContains(self.client.get(reverse("warehouse_list")), "New")
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+)
+class MetricsTests(LoggedInTestCase):
+    def setUp(self):
+        metrics.registry.clear()
+        super().setUp()
+        WarehouseFactory(name="Central")
+
+    def test_server_timing_counts_queries(self):
+        for url in (reverse("warehouse_list"), reverse("async_api_warehouse_list")):
+            timing = self.client.get(url)["Server-Timing"]
+            self.assertRegex(timing, r"^total;dur=[\d.]+, db;dur=[\d.]+;desc=")
+            self.assertNotIn('desc="0 queries', timing)
+
+    def test_duplicates(self):
+        collector = metrics.Collector()
+        collector.add("SELECT 1 WHERE id = %s", (1,), 0.1)
+        collector.add("SELECT 1 WHERE id = %s", (2,), 0.1)
+        collector.add("SELECT 1 WHERE id = %s", (1,), 0.1)
+        self.assertEqual(collector.duplicates, 1)
+        self.assertAlmostEqual(collector.db_time, 0.3)
+
+    def test_only_the_slowest_queries_are_kept(self):
+        collector = metrics.Collector()
+        for i in range(1000):
+            collector.add("SELECT %s", [i] * 1000, i / 1000)
+        collector.add("INSERT %s", iter([(1,), (2,)]), 2, many=True)
+        self.assertEqual(collector.count, 1001)
+        self.assertEqual(collector.duplicates, 0)
+        self.assertEqual(len(collector.slowest), metrics.LOGGED_QUERIES)
+        kept = sorted(collector.slowest, reverse=True)
+        self.assertEqual(kept[0][3], "(executemany)")
+        self.assertEqual(kept[1][0], 0.999)
+        self.assertLessEqual(len(kept[1][3]), metrics.LOGGED_PARAMS + 3)
+
+    def test_prometheus_endpoint(self):
+        self.client.get(reverse("warehouse_list"))
+        self.client.get(reverse("warehouse_list"))
+        body = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn("# TYPE http_request_duration_seconds histogram", body)
+        self.assertIn(
+            'http_request_duration_seconds_count{view="warehouse_list"} 2', body
+        )
+        self.assertIn(
+            'http_request_duration_seconds_bucket{view="warehouse_list",le="+Inf"} 2',
+            body,
+        )
+        self.assertRegex(body, r'db_queries_total\{view="warehouse_list"\} [1-9]')
+        response = self.client.get(reverse("metrics"), REMOTE_ADDR="10.0.0.1")
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(SLOW_REQUEST_MS=0, SLOW_REQUEST_SAMPLE_RATE=1)
+    def test_slow_requests_are_logged_with_sql(self):
+        with self.assertLogs("main.metrics", "WARNING") as logs:
+            self.client.get(reverse("warehouse_list"))
+        self.assertIn("(warehouse_list)", logs.output[0])
+        self.assertIn('FROM "main_warehouse"', logs.output[0])
+
+
+class BenchmarkRoutesTests(TestCase):
+    def compare(self, before, now, threshold=0.25):
+        def results(case):
+            return {"scales": {"1k": {"cases": {"home": case}}}}
+
+        with tempfile.NamedTemporaryFile("w", suffix=".json") as baseline:
+            json.dump(results(before), baseline)
+            baseline.flush()
+            benchmark_routes.Command(stdout=io.StringIO()).compare(
+                results(now), {"baseline": baseline.name, "threshold": threshold}
+            )
+
+    def test_within_threshold(self):
+        self.compare({"p50_ms": 10, "queries": 4}, {"p50_ms": 12, "queries": 3})
+        # Sub-millisecond changes are noise whatever their ratio.
+        self.compare({"p50_ms": 0.2, "queries": 4}, {"p50_ms": 0.9, "queries": 4})
+
+    def test_regressions_fail(self):
+        with self.assertRaisesMessage(CommandError, "p50 10.00 -> 13.00 ms"):
+            self.compare({"p50_ms": 10, "queries": 4}, {"p50_ms": 13, "queries": 4})
+        with self.assertRaisesMessage(CommandError, "4 -> 5 queries"):
+            self.compare({"p50_ms": 10, "queries": 4}, {"p50_ms": 10, "queries": 5})
+
+
+class ResourceApiTests(LoggedInTestCase):
+    def setUp(self):
+        super().setUp()
+        self.warehouse = WarehouseFactory(capacity=1000)
+        for price in (5, 50, 500):
+            InventoryFactory(
+                warehouse=self.warehouse, product=ProductFactory(price=price)
+            )
+
+    def test_product_filters_match_the_list_page(self):
+        response = self.client.get(reverse("product-list"), {"min_price": "40"})
+        self.assertEqual(
+            sorted(float(p["price"]) for p in response.json()["results"]), [50, 500]
+        )
+        response = self.client.get(reverse("product-list"), {"min_price": "cheap"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("min_price", response.json())
+
+    def test_sparse_fields_narrow_the_select(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("product-list"), {"fields": "sku"})
+        self.assertEqual(set(response.json()["results"][0]), {"sku"})
+        select = next(q["sql"] for q in queries if 'FROM "main_product"' in q["sql"])
+        self.assertNotIn('"description"', select)
+        self.assertNotIn('"price"', select)
+
+        product = Product.objects.first()
+        response = self.client.get(
+            reverse("product-detail", args=[product.id]), {"fields": "id,price"}
+        )
+        self.assertEqual(
+            response.json(), {"id": product.id, "price": f"{product.price}"}
+        )
+
+        response = self.client.get(reverse("product-list"), {"fields": "secret"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_expansion_joins_instead_of_querying_per_row(self):
+        url = reverse("inventory-list")
+        params = {"expand": "warehouse,product"}
+        # Session, user, the conditional GET state, then one joined SELECT.
+        with self.assertNumQueries(4):
+            response = self.client.get(url, params)
+        for _ in range(3):
+            InventoryFactory(warehouse=self.warehouse)
+        with self.assertNumQueries(4):
+            response = self.client.get(url, params)
+        row = response.json()["results"][0]
+        self.assertEqual(row["warehouse"]["name"], self.warehouse.name)
+        self.assertEqual(row["warehouse"]["utilization"], self.warehouse.utilization)
+        self.assertIn("sku", row["product"])
+
+    def test_expanded_relations_change_the_validators(self):
+        product = Inventory.objects.first().product
+        for url in (
+            reverse("inventory-list"),
+            reverse("inventory-detail", args=[Inventory.objects.first().id]),
+        ):
+            response = self.client.get(url, {"expand": "product"})
+            product.name = f"Renamed {url}"
+            product.save()
+            response = self.client.get(
+                url, {"expand": "product"}, HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+            self.assertContains(response, f"Renamed {url}")
+
+    def test_fast_list_matches_model_serializer(self):
+        for params in ({}, {"expand": "warehouse,product"}, {"fields": "id,product"}):
+            fast = self.client.get(reverse("inventory-list"), params).json()
+            with mock.patch.object(InventoryViewSet, "fast_list", False):
+                slow = self.client.get(reverse("inventory-list"), params).json()
+            self.assertEqual(fast, slow)
+
+    def test_inventory_writes_go_through_the_ledger(self):
+        product = ProductFactory()
+        response = self.client.post(
+            reverse("inventory-list"),
+            {"warehouse": self.warehouse.id, "product": product.id, "quantity": 7},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        url = reverse("inventory-detail", args=[response.json()["id"]])
+        self.client.patch(url, {"quantity": 4}, content_type="application/json")
+        response = self.client.patch(
+            url, {"quantity": 10_000}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+        movements = StockMovement.objects.filter(product=product)
+        self.assertEqual(sum(movements.values_list("quantity", flat=True)), 4)
+        self.client.delete(url)
+        self.assertEqual(sum(movements.values_list("quantity", flat=True)), 0)
+
+
+class FormatTests(LoggedInTestCase):
+    def setUp(self):
+        super().setUp()
+        self.warehouse = WarehouseFactory(capacity=10_000)
+        InventoryFactory.create_batch(30, warehouse=self.warehouse)
+
+    def test_msgpack_matches_json(self):
+        url = reverse("inventory-list")
+        expected = self.client.get(url).json()
+        response = self.client.get(url, HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(response["Content-Type"], "application/msgpack")
+        self.assertEqual(msgpack.unpackb(response.content), expected)
+
+        body = msgpack.packb(
+            {"name": "Bolt", "description": "-", "price": "0.10", "sku": "B-1"}
+        )
+        response = self.client.post(
+            reverse("product-list"), body, content_type="application/msgpack"
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Product.objects.filter(sku="B-1").exists())
+
+    def test_columnar_round_trip(self):
+        params = {"expand": "warehouse", "format": "columnar"}
+        rows = self.client.get(reverse("inventory-list"), {"expand": "warehouse"})
+        rows = rows.json()["results"]
+        columns = self.client.get(reverse("inventory-list"), params).json()["results"]
+        self.assertEqual(columns["quantity"], [row["quantity"] for row in rows])
+        self.assertEqual(columns["warehouse"]["name"], [self.warehouse.name] * 30)
+        self.assertEqual(renderers.to_rows(columns), rows)
+
+        body = {
+            "name": ["Nut", "Washer"],
+            "description": ["-", "-"],
+            "price": ["0.05", "0.02"],
+            "sku": ["N-1", "W-1"],
+        }
+        response = self.client.post(
+            reverse("product-bulk"),
+            json.dumps(body),
+            content_type="application/vnd.columnar+json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Product.objects.filter(sku__in=["N-1", "W-1"]).count(), 2)
+
+    def test_compression_negotiation(self):
+        url = reverse("inventory-list")
+        plain = self.client.get(url).content
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(brotli.decompress(response.content), plain)
+        self.assertEqual(response["Vary"], "Accept, Cookie, Accept-Encoding")
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="br;q=0, gzip")
+        self.assertEqual(gzip.decompress(response.content), plain)
+        # BREACH: HTML pages stay on gzip with its randomised header.
+        response = self.client.get(reverse("warehouse_list"), HTTP_ACCEPT_ENCODING="br")
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_streaming_compression(self):
+        url = reverse("export_data", args=["inventory"])
+        plain = b"".join(self.client.get(url).streaming_content)
+        for encoding, decompress in (
+            ("br", brotli.decompress),
+            ("gzip", gzip.decompress),
+        ):
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING=encoding)
+            self.assertEqual(response["Content-Encoding"], encoding)
+            self.assertEqual(decompress(b"".join(response.streaming_content)), plain)
+
+
+class TokenAuthTests(TestCase):
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        tokens.verified.clear()
+        self.user = MyUser.objects.create_user("scanner@example.com", "pass")
+
+    def get(self, key):
+        return self.client.get(reverse("api-root"), HTTP_AUTHORIZATION=f"Token {key}")
+
+    def test_verified_tokens_are_cached_until_revoked(self):
+        token, key = tokens.issue(self.user, "scanner")
+        self.assertEqual(token.digest, tokens.digest(key))
+        self.assertNotIn(key, token.digest)
+        self.assertEqual(self.get(key).status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(key).status_code, 200)
+
+        self.client.force_login(self.user)
+        response = self.client.delete(reverse("apitoken-detail", args=[token.id]))
+        self.assertEqual(response.status_code, 204)
+        self.client.logout()
+        self.assertEqual(self.get(key).status_code, 401)
+        self.assertEqual(self.get("made-up").status_code, 401)
+
+    def test_expired_and_deactivated(self):
+        _, expired = tokens.issue(
+            self.user, expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(self.get(expired).status_code, 401)
+        _, key = tokens.issue(self.user)
+        self.assertEqual(self.get(key).status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get(key).status_code, 401)
+
+    def test_lru_eviction(self):
+        cache = tokens.VerifiedTokens(size=2, ttl=60)
+        issued = [tokens.issue(self.user)[0] for _ in range(3)]
+        for token in issued:
+            cache.put(token.digest, self.user, token)
+        self.assertIsNone(cache.get(issued[0].digest))
+        self.assertEqual(cache.get(issued[2].digest), (self.user, issued[2].id))
+
+    def test_issue_through_the_api(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse("apitoken-list"), {"name": "scanner"})
+        self.assertEqual(response.status_code, 201)
+        self.client.logout()
+        self.assertEqual(self.get(response.json()["key"]).status_code, 200)
+
+    @override_settings(DATABASE_ROUTERS=["main.routers.ReplicaRouter"])
+    def test_tokens_are_read_from_the_primary(self):
+        # The replica has not caught up: it holds neither token.
+        revoked, old_key = tokens.issue(self.user)
+        tokens.revoke(revoked)
+        _, new_key = tokens.issue(self.user)
+        self.assertFalse(ApiToken.objects.using("replica").exists())
+        self.assertEqual(self.get(new_key).status_code, 200)
+        self.assertEqual(self.get(old_key).status_code, 401)
+
+    def test_login_rehashes_legacy_passwords(self):
+        self.user.password = make_password("pass", hasher=PBKDF2SHA1PasswordHasher())
+        self.user.save()
+        response = self.client.post(
+            reverse("login"), {"email": "scanner@example.com", "password": "pass"}
+        )
+        self.assertRedirects(response, reverse("home"), fetch_redirect_response=False)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$"))
@@ -0,0 +1,129 @@
+# tokens.py
+# Token authentication for the API. BasicAuthentication runs the full
+# password hash on every request; a token costs one SHA-256 and an indexed
+# lookup, and recently verified tokens are kept in a small in-process LRU
+# cache so most requests need no query at all. Revoking a token, or
+# changing its user, evicts it here at once; other processes drop their
+# copy within API_TOKEN_CACHE_TTL seconds.
+import copy
+import hashlib
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+
+from .models import ApiToken
+
+KEYWORD = "Token"
+
+
+def digest(key):
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def issue(user, name="", expires_at=None):
+    """Create a token for ``user``. Returns it with its key, shown only once."""
+    key = secrets.token_urlsafe(32)
+    token = ApiToken.objects.create(
+        user=user,
+        name=name,
+        digest=digest(key),
+        prefix=key[:8],
+        expires_at=expires_at,
+    )
+    return token, key
+
+
+def revoke(token):
+    token.revoked_at = timezone.now()
+    token.save(update_fields=["revoked_at"])
+
+
+class VerifiedTokens:
+    """LRU cache of verified token digests, each kept for at most ``ttl``."""
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key_digest):
+        with self.lock:
+            entry = self.entries.get(key_digest)
+            if entry is None:
+                return None
+            user, token_id, expires = entry
+            if expires <= time.monotonic():
+                del self.entries[key_digest]
+                return None
+            self.entries.move_to_end(key_digest)
+            return user, token_id
+
+    def put(self, key_digest, user, token):
+        expires = time.monotonic() + self.ttl
+        if token.expires_at is not None:
+            left = (token.expires_at - timezone.now()).total_seconds()
+            expires = min(expires, time.monotonic() + left)
+        with self.lock:
+            self.entries[key_digest] = (user, token.id, expires)
+            self.entries.move_to_end(key_digest)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def evict(self, token_id=None, user_id=None):
+        with self.lock:
+            for key_digest, (user, cached_id, _) in list(self.entries.items()):
+                if cached_id == token_id or user.pk == user_id:
+                    del self.entries[key_digest]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+verified = VerifiedTokens(settings.API_TOKEN_CACHE_SIZE, settings.API_TOKEN_CACHE_TTL)
+
+
+class TokenAuthentication(BaseAuthentication):
+    """``Authorization: Token <key>``, checked against the stored digests."""
+
+    def authenticate(self, request):
+        parts = get_authorization_header(request).split()
+        if not parts or parts[0].lower() != KEYWORD.lower().encode():
+            return None
+        if len(parts) != 2:
+            raise AuthenticationFailed("Invalid token header")
+        try:
+            key = parts[1].decode()
+        except UnicodeError:
+            raise AuthenticationFailed("Invalid token header")
+
+        key_digest = digest(key)
+        cached = verified.get(key_digest)
+        if cached is not None:
+            user, token_id = cached
+            # Each request gets its own copy to set attributes on.
+            return copy.copy(user), token_id
+
+        token = (
+            ApiToken.objects.select_related("user")
+            .filter(digest=key_digest, revoked_at__isnull=True)
+            .first()
+        )
+        if token is None or (
+            token.expires_at is not None and token.expires_at <= timezone.now()
+        ):
+            raise AuthenticationFailed("Invalid token")
+        if not token.user.is_active:
+            raise AuthenticationFailed("User inactive or deleted")
+        verified.put(key_digest, token.user, token)
+        return copy.copy(token.user), token.id
+
+    def authenticate_header(self, request):
+        return KEYWORD
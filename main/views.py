@@ -1,8 +1,18 @@
 # views.py
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.db import OperationalError, transaction
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
-from .models import MyUser, Warehouse, Product, Inventory
+from .models import (
+    ApiToken,
+    MyUser,
+    Warehouse,
+    Product,
+    Inventory,
+    ReorderAlert,
+    StockMovement,
+)
 from .forms import (
     InventoryFilterForm,
     ProductFilterForm,
@@ -18,8 +28,67 @@ from .forms import (
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import ListView
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import viewsets
-from .serializers import WarehouseSerializer
+from .serializers import (
+    ApiTokenSerializer,
+    EvaluateReorderSerializer,
+    ForecastParamsSerializer,
+    InventoryAsOfSerializer,
+    InventorySerializer,
+    ProductSerializer,
+    ReorderAlertSerializer,
+    StockMovementSerializer,
+    TransferSerializer,
+    WarehouseSerializer,
+)
+from .bulk import (
+    BulkMixin,
+    InventoryBulkHandler,
+    ProductBulkHandler,
+    WarehouseBulkHandler,
+)
+from .pagination import (
+    AutocompletePagination,
+    KeysetPagination,
+    KeysetPaginationMixin,
+    ProductKeysetPagination,
+    WarehouseKeysetPagination,
+)
+from . import (
+    autocomplete,
+    caching,
+    export,
+    forecast,
+    importer,
+    reorder,
+    search,
+    snapshots,
+    stock,
+    tokens,
+)
+from .caching import CachedPageMixin
+from .conditional import (
+    ConditionalDetailMixin,
+    ConditionalViewSetMixin,
+    related_state,
+)
+from .capacity import CapacityExceeded
+from .fields import SparseFieldsMixin
+from .filters import (
+    InvalidFilter,
+    filter_inventory,
+    filter_products,
+    filter_users,
+    filter_warehouses,
+)
+from .renderers import PARSER_CLASSES, RENDERER_CLASSES
+
+
+def as_of_param(params):
+    """The moment asked for with ``?as_of=``, or ``None`` for the present."""
+    value = params.get("as_of")
+    return snapshots.parse_as_of(value) if value else None
 
 
 def register(request):
@@ -55,27 +124,40 @@ def user_logout(request):
     return redirect("login")
 
 
+HOME_ALERTS = 10
+
+
 @login_required
 def home(request):
-    return render(request, "home.html")
+    alerts = ReorderAlert.objects.select_related("warehouse", "product").only(
+        "quantity",
+        "reorder_point",
+        "suggested_quantity",
+        "warehouse__name",
+        "product__name",
+    )
+    return render(
+        request,
+        "home.html",
+        {
+            "alerts": alerts.order_by("-suggested_quantity", "id")[:HOME_ALERTS],
+            "alert_count": ReorderAlert.objects.count(),
+        },
+    )
 
 
 # views.py
-class WarehouseListView(LoginRequiredMixin, ListView):
+class WarehouseListView(
+    LoginRequiredMixin, CachedPageMixin, KeysetPaginationMixin, ListView
+):
     model = Warehouse
     template_name = "warehouse_list.html"
     context_object_name = "warehouses"
+    sort_key = "name"
+    cache_dependencies = ("warehouse", "warehouse_usage")
 
     def get_queryset(self):
-        queryset = super().get_queryset()
-        name = self.request.GET.get("name")
-        location = self.request.GET.get("location")
-
-        if name:
-            queryset = queryset.filter(name__icontains=name)
-        if location:
-            queryset = queryset.filter(location__icontains=location)
-        return queryset
+        return filter_warehouses(super().get_queryset(), self.request.GET)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -83,21 +165,17 @@ class WarehouseListView(LoginRequiredMixin, ListView):
         return context
 
 
-class ProductListView(LoginRequiredMixin, ListView):
+class ProductListView(
+    LoginRequiredMixin, CachedPageMixin, KeysetPaginationMixin, ListView
+):
     model = Product
     template_name = "product_list.html"
     context_object_name = "products"
+    sort_key = "name"
+    cache_dependencies = ("product",)
 
     def get_queryset(self):
-        queryset = super().get_queryset()
-        name = self.request.GET.get("name")
-        min_price = self.request.GET.get("min_price")
-
-        if name:
-            queryset = queryset.filter(name__icontains=name)
-        if min_price:
-            queryset = queryset.filter(price__gte=min_price)
-        return queryset
+        return filter_products(super().get_queryset(), self.request.GET)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -105,43 +183,42 @@ class ProductListView(LoginRequiredMixin, ListView):
         return context
 
 
-class InventoryListView(LoginRequiredMixin, ListView):
+class InventoryListView(
+    LoginRequiredMixin, CachedPageMixin, KeysetPaginationMixin, ListView
+):
     model = Inventory
     template_name = "inventory_list.html"
     context_object_name = "inventories"
+    sort_key = "id"
+    cache_dependencies = ("inventory", "warehouse", "product")
 
     def get_queryset(self):
-        queryset = super().get_queryset()
-        warehouse = self.request.GET.get("warehouse")
-        product = self.request.GET.get("product")
-
-        if warehouse:
-            queryset = queryset.filter(warehouse=warehouse)
-        if product:
-            queryset = queryset.filter(product=product)
+        try:
+            queryset = filter_inventory(
+                Inventory.objects.list_projection(), self.request.GET
+            )
+            self.as_of = as_of_param(self.request.GET)
+        except ValueError as e:
+            raise Http404(str(e))
+        if self.as_of:
+            queryset = snapshots.as_of(queryset, self.as_of)
         return queryset
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["filter_form"] = InventoryFilterForm(self.request.GET)
+        context["as_of"] = self.as_of
         return context
 
 
-class UserListView(LoginRequiredMixin, ListView):
+class UserListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = MyUser
     template_name = "user_list.html"
     context_object_name = "users"
+    sort_key = "email"
 
     def get_queryset(self):
-        queryset = super().get_queryset()
-        email = self.request.GET.get("email")
-        is_admin = self.request.GET.get("is_admin")
-
-        if email:
-            queryset = queryset.filter(email__icontains=email)
-        if is_admin:
-            queryset = queryset.filter(is_admin=True)
-        return queryset
+        return filter_users(super().get_queryset(), self.request.GET)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -262,8 +339,14 @@ def add_inventory(request):
     if request.method == "POST":
         form = InventoryForm(request.POST)
         if form.is_valid():
-            form.save()
-            return redirect("inventory_list")
+            try:
+                with transaction.atomic():
+                    inventory = form.save()
+                    stock.record_changes([(None, stock.state(inventory))])
+            except CapacityExceeded as e:
+                form.add_error("quantity", str(e))
+            else:
+                return redirect("inventory_list")
     else:
         form = InventoryForm()
     return render(request, "add_inventory.html", {"form": form})
@@ -275,8 +358,21 @@ def edit_inventory(request, inventory_id):
     if request.method == "POST":
         form = InventoryForm(request.POST, instance=inventory)
         if form.is_valid():
-            form.save()
-            return redirect(reverse("inventory_detail", kwargs={"pk": inventory.id}))
+            try:
+                with transaction.atomic():
+                    before = (
+                        Inventory.objects.select_for_update()
+                        .values_list("warehouse_id", "product_id", "quantity")
+                        .get(id=inventory.id)
+                    )
+                    form.save()
+                    stock.record_changes([(before, stock.state(inventory))])
+            except CapacityExceeded as e:
+                form.add_error("quantity", str(e))
+            else:
+                return redirect(
+                    reverse("inventory_detail", kwargs={"pk": inventory.id})
+                )
     else:
         form = InventoryForm(instance=inventory)
     return render(request, "edit_inventory.html", {"form": form})
@@ -284,13 +380,42 @@ def edit_inventory(request, inventory_id):
 
 @login_required
 def delete_inventory(request, inventory_id):
-    inventory = get_object_or_404(Inventory, id=inventory_id)
     if request.method == "POST":
-        inventory.delete()
+        with transaction.atomic():
+            inventory = get_object_or_404(
+                Inventory.objects.select_for_update(), id=inventory_id
+            )
+            before = stock.state(inventory)
+            inventory.delete()
+            stock.record_changes([(before, None)])
         return redirect("inventory_list")
+    inventory = get_object_or_404(
+        Inventory.objects.list_projection(), id=inventory_id
+    )
     return render(request, "delete_inventory.html", {"inventory": inventory})
 
 
+@login_required
+def export_data(request, kind):
+    fmt = request.GET.get("format", "csv")
+    compress = request.GET.get("gzip") in ("1", "true")
+    if kind not in export.EXPORTS or fmt not in export.FORMATS:
+        raise Http404("Unknown export")
+
+    try:
+        content = export.stream(kind, request.GET, fmt, compress)
+    except InvalidFilter as e:
+        return JsonResponse(e.errors, status=400)
+    response = StreamingHttpResponse(
+        content,
+        content_type="application/gzip" if compress else export.FORMATS[fmt][0],
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="{export.filename(kind, fmt, compress)}"'
+    )
+    return response
+
+
 # views.py
 from django.views.generic import DetailView
 
@@ -301,42 +426,136 @@ class UserDetailView(LoginRequiredMixin, DetailView):
     context_object_name = "user_detail"
 
 
-class WarehouseDetailView(LoginRequiredMixin, DetailView):
+class WarehouseDetailView(LoginRequiredMixin, ConditionalDetailMixin, DetailView):
     model = Warehouse
     template_name = "warehouse_detail.html"
     context_object_name = "warehouse"
 
+    def conditional_state(self):
+        state = related_state(
+            Warehouse.objects, self.kwargs["pk"], "inventory", "inventory__product"
+        )
+        # Forecasts move on with the date even when no row changed.
+        return state and (*state, timezone.localdate())
+
+    def get_object(self, queryset=None):
+        # Product names appear in the inventory rows, so renames invalidate too.
+        pk = self.kwargs["pk"]
+        try:
+            self.as_of = as_of_param(self.request.GET)
+        except ValueError as e:
+            raise Http404(str(e))
+        warehouse, self.inventories = caching.read_through(
+            "warehouse_detail",
+            (pk, self.as_of),
+            [("warehouse", pk), ("product", None)],
+            lambda: self.load(queryset),
+        )
+        return warehouse
+
+    def load(self, queryset):
+        warehouse = super().get_object(queryset)
+        inventories = Inventory.objects.list_projection().filter(warehouse=warehouse)
+        if self.as_of:
+            # Past balances come without forecasts, which look ahead from today.
+            return warehouse, list(snapshots.as_of(inventories, self.as_of))
+        return warehouse, forecast.attach(list(inventories))
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["inventories"] = Inventory.objects.filter(warehouse=self.object)
+        context["inventories"] = self.inventories
+        context["as_of"] = self.as_of
         return context
 
 
-class ProductDetailView(LoginRequiredMixin, DetailView):
+class ProductDetailView(LoginRequiredMixin, ConditionalDetailMixin, DetailView):
     model = Product
     template_name = "product_detail.html"
     context_object_name = "product"
 
+    def conditional_state(self):
+        state = related_state(
+            Product.objects, self.kwargs["pk"], "inventory", "inventory__warehouse"
+        )
+        return state and (*state, timezone.localdate())
+
+    def get_object(self, queryset=None):
+        pk = self.kwargs["pk"]
+        product, self.inventories = caching.read_through(
+            "product_detail",
+            pk,
+            [("product", pk), ("warehouse", None)],
+            lambda: self.load(queryset),
+        )
+        return product
+
+    def load(self, queryset):
+        product = super().get_object(queryset)
+        inventories = Inventory.objects.list_projection().filter(product=product)
+        return product, forecast.attach(list(inventories))
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["inventories"] = Inventory.objects.filter(product=self.object)
+        context["inventories"] = self.inventories
         return context
 
 
-class InventoryDetailView(LoginRequiredMixin, DetailView):
+class InventoryDetailView(LoginRequiredMixin, ConditionalDetailMixin, DetailView):
     model = Inventory
+    queryset = Inventory.objects.detail_projection()
     template_name = "inventory_detail.html"
     context_object_name = "inventory"
 
-from rest_framework import viewsets, status
+    def conditional_state(self):
+        return related_state(
+            Inventory.objects, self.kwargs["pk"], "warehouse", "product"
+        )
+
+    def get_object(self, queryset=None):
+        # The row's warehouse and product are only known once it is loaded;
+        # every balance change bumps both of them.
+        return caching.read_through(
+            "inventory_detail",
+            self.kwargs["pk"],
+            [],
+            lambda: super(InventoryDetailView, self).get_object(queryset),
+            extra_deps=lambda inventory: [
+                ("warehouse", inventory.warehouse_id),
+                ("product", inventory.product_id),
+            ],
+        )
+
+import io
+
+from rest_framework import mixins, viewsets, status
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.permissions import IsAuthenticated
 
-class WarehouseViewSet(viewsets.ModelViewSet):
+
+def api_filter(filter_queryset, queryset, params):
+    """Apply one of the shared filters, answering bad values with a 400."""
+    try:
+        return filter_queryset(queryset, params)
+    except InvalidFilter as e:
+        raise ValidationError(e.errors)
+
+
+class WarehouseViewSet(
+    ConditionalViewSetMixin, SparseFieldsMixin, BulkMixin, viewsets.ModelViewSet
+):
     queryset = Warehouse.objects.all()
     serializer_class = WarehouseSerializer
     permission_classes = [IsAuthenticated]
+    renderer_classes = RENDERER_CLASSES
+    parser_classes = PARSER_CLASSES
+    pagination_class = WarehouseKeysetPagination
+    bulk_handler_class = WarehouseBulkHandler
+
+    def get_queryset(self):
+        return filter_warehouses(super().get_queryset(), self.request.query_params)
 
     def get_object(self):
         try:
@@ -382,4 +601,333 @@ class WarehouseViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        return super().create(request, *args, **kwargs)
\ No newline at end of file
+        return super().create(request, *args, **kwargs)
+
+
+class ProductViewSet(
+    ConditionalViewSetMixin, SparseFieldsMixin, BulkMixin, viewsets.ModelViewSet
+):
+    queryset = Product.objects.all()
+    serializer_class = ProductSerializer
+    permission_classes = [IsAuthenticated]
+    renderer_classes = RENDERER_CLASSES
+    parser_classes = PARSER_CLASSES
+    pagination_class = ProductKeysetPagination
+    bulk_handler_class = ProductBulkHandler
+
+    def get_queryset(self):
+        # Same filters, and the same validation, as the product list page.
+        form = ProductFilterForm(self.request.query_params)
+        if not form.is_valid():
+            raise ValidationError(form.errors)
+        return filter_products(super().get_queryset(), self.request.query_params)
+
+
+class InventoryViewSet(
+    ConditionalViewSetMixin, SparseFieldsMixin, BulkMixin, viewsets.ModelViewSet
+):
+    queryset = Inventory.objects.all()
+    serializer_class = InventorySerializer
+    permission_classes = [IsAuthenticated]
+    renderer_classes = RENDERER_CLASSES
+    parser_classes = PARSER_CLASSES
+    pagination_class = KeysetPagination
+    bulk_handler_class = InventoryBulkHandler
+    max_reported_rejects = 1000
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Parsed first: the serializer, and so the columns loaded, depend on it.
+        try:
+            self.as_of = as_of_param(request.query_params)
+        except ValueError as e:
+            raise ValidationError({"as_of": str(e)})
+
+    def get_queryset(self):
+        queryset = api_filter(
+            filter_inventory, super().get_queryset(), self.request.query_params
+        )
+        if getattr(self, "as_of", None):
+            queryset = snapshots.as_of(queryset, self.as_of)
+        return queryset
+
+    def get_serializer_class(self):
+        if getattr(self, "as_of", None):
+            return InventoryAsOfSerializer
+        return super().get_serializer_class()
+
+    # Writes go through the stock ledger like the inventory forms do.
+    def perform_create(self, serializer):
+        try:
+            with transaction.atomic():
+                inventory = serializer.save()
+                stock.record_changes([(None, stock.state(inventory))])
+        except CapacityExceeded as e:
+            raise ValidationError({"quantity": str(e)})
+
+    def perform_update(self, serializer):
+        try:
+            with transaction.atomic():
+                before = (
+                    Inventory.objects.select_for_update()
+                    .values_list("warehouse_id", "product_id", "quantity")
+                    .get(id=serializer.instance.id)
+                )
+                inventory = serializer.save()
+                stock.record_changes([(before, stock.state(inventory))])
+        except CapacityExceeded as e:
+            raise ValidationError({"quantity": str(e)})
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            before = (
+                Inventory.objects.select_for_update()
+                .values_list("warehouse_id", "product_id", "quantity")
+                .get(id=instance.id)
+            )
+            instance.delete()
+            stock.record_changes([(before, None)])
+
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="import",
+        parser_classes=[MultiPartParser],
+    )
+    def import_csv(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            raise ValidationError({"file": "A CSV file is required"})
+
+        rejected = []
+
+        def on_reject(line_number, row, reason):
+            if len(rejected) < self.max_reported_rejects:
+                rejected.append({"line": line_number, "row": row, "reason": reason})
+
+        lines = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+        try:
+            stats = importer.import_inventory(lines, on_reject=on_reject)
+        except ValueError as e:
+            raise ValidationError({"file": str(e)})
+        return Response({"stats": stats, "rejected": rejected})
+
+
+class StockMovementViewSet(
+    mixins.CreateModelMixin,
+    mixins.ListModelMixin,
+    mixins.RetrieveModelMixin,
+    viewsets.GenericViewSet,
+):
+    # Append-only: no update or destroy routes.
+    queryset = StockMovement.objects.all()
+    serializer_class = StockMovementSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        return api_filter(
+            filter_inventory, super().get_queryset(), self.request.query_params
+        )
+
+    def perform_create(self, serializer):
+        data = serializer.validated_data
+        try:
+            serializer.instance = stock.record_movement(
+                data["warehouse"].id,
+                data["product"].id,
+                data["kind"],
+                data["quantity"],
+                reference=data.get("reference", ""),
+                note=data.get("note", ""),
+                allow_negative=data["kind"] == StockMovement.ADJUSTMENT,
+            )
+        except (stock.InsufficientStock, CapacityExceeded) as e:
+            raise ValidationError({"quantity": str(e)})
+
+
+class ApiTokenViewSet(
+    mixins.ListModelMixin,
+    mixins.CreateModelMixin,
+    mixins.DestroyModelMixin,
+    viewsets.GenericViewSet,
+):
+    # Users manage their own tokens. Deleting revokes, keeping the record.
+    queryset = ApiToken.objects.all()
+    serializer_class = ApiTokenSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        return super().get_queryset().filter(user=self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        token, key = tokens.issue(request.user, **serializer.validated_data)
+        # The key is only ever shown in this response.
+        return Response(
+            {**self.get_serializer(token).data, "key": key},
+            status=status.HTTP_201_CREATED,
+        )
+
+    def perform_destroy(self, instance):
+        tokens.revoke(instance)
+
+
+class ReorderAlertViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
+    queryset = ReorderAlert.objects.all()
+    serializer_class = ReorderAlertSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        return api_filter(
+            filter_inventory, super().get_queryset(), self.request.query_params
+        )
+
+    @action(detail=False, methods=["post"])
+    def evaluate(self, request):
+        serializer = EvaluateReorderSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        count = reorder.evaluate(**serializer.validated_data)
+        return Response({"alerts": count})
+
+
+from rest_framework.decorators import api_view, permission_classes
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def search_api(request):
+    query = request.query_params.get("q", "")
+    kind = request.query_params.get("type")
+    if kind and kind not in search.KINDS:
+        raise ValidationError({"type": f"Must be one of {', '.join(search.KINDS)}"})
+    try:
+        # LIMIT -1 means no limit to SQLite.
+        limit = max(1, min(int(request.query_params.get("limit", 20)), 100))
+    except ValueError:
+        raise ValidationError({"limit": "Must be a number"})
+
+    hits = search.search(query, kind=kind, limit=limit)
+    models = {"product": Product, "warehouse": Warehouse}
+    objects = {
+        k: models[k].objects.only("id", "name").in_bulk(
+            [pk for hit_kind, pk, _ in hits if hit_kind == k]
+        )
+        for k in {hit[0] for hit in hits}
+    }
+    results = [
+        {"type": k, "id": pk, "name": objects[k][pk].name, "score": -score}
+        for k, pk, score in hits
+        if pk in objects[k]
+    ]
+    return Response({"results": results})
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def forecast_api(request):
+    serializer = ForecastParamsSerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    paginator = KeysetPagination()
+    rows = paginator.paginate_queryset(
+        api_filter(
+            filter_inventory,
+            Inventory.objects.only("id", "warehouse_id", "product_id", "quantity"),
+            request.query_params,
+        ),
+        request,
+    )
+    forecast.attach(rows, **serializer.validated_data)
+    return paginator.get_paginated_response(
+        [
+            {
+                "inventory": row.id,
+                "warehouse": row.warehouse_id,
+                "product": row.product_id,
+                "quantity": row.quantity,
+                **row.forecast,
+            }
+            for row in rows
+        ]
+    )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def autocomplete_api(request, kind):
+    if kind not in autocomplete.SOURCES:
+        raise NotFound(f"Unknown kind {kind}")
+    paginator = AutocompletePagination()
+    objects = paginator.paginate_queryset(
+        autocomplete.choices(kind, request.query_params.get("q", "")), request
+    )
+    return paginator.get_paginated_response(
+        [{"id": obj.id, "text": autocomplete.label(obj)} for obj in objects]
+    )
+
+
+MAX_TRANSFERS = 1000
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def transfer_api(request):
+    data = request.data if isinstance(request.data, list) else [request.data]
+    if len(data) > MAX_TRANSFERS:
+        raise ValidationError(
+            {"error": f"At most {MAX_TRANSFERS} transfers per request"}
+        )
+    serializer = TransferSerializer(data=data, many=True, allow_empty=False)
+    serializer.is_valid(raise_exception=True)
+    transfers = serializer.validated_data
+
+    warehouse_ids = {t["from_warehouse"] for t in transfers}
+    warehouse_ids |= {t["to_warehouse"] for t in transfers}
+    product_ids = {t["product"] for t in transfers}
+    missing_warehouses = warehouse_ids - set(
+        Warehouse.objects.filter(id__in=warehouse_ids).values_list("id", flat=True)
+    )
+    missing_products = product_ids - set(
+        Product.objects.filter(id__in=product_ids).values_list("id", flat=True)
+    )
+    if missing_warehouses or missing_products:
+        raise ValidationError(
+            {
+                "warehouses": sorted(missing_warehouses),
+                "products": sorted(missing_products),
+                "error": "Unknown warehouses or products",
+            }
+        )
+
+    try:
+        reference = stock.transfer(
+            [
+                (t["product"], t["from_warehouse"], t["to_warehouse"], t["quantity"])
+                for t in transfers
+            ],
+            reference=request.query_params.get("reference", ""),
+        )
+    except (stock.InsufficientStock, CapacityExceeded) as e:
+        raise ValidationError({"quantity": str(e)})
+    except OperationalError as e:
+        # SQLite gave up waiting for the write lock; nothing was applied.
+        if "locked" not in str(e):
+            raise
+        return Response(
+            {"error": "The database is busy, retry the transfer"},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": "1"},
+        )
+    return Response(
+        {"reference": reference, "transfers": len(transfers)},
+        status=status.HTTP_201_CREATED,
+    )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def cache_stats_api(request):
+    return Response(caching.stats())